@@ -0,0 +1,100 @@
+# Representative inputs for the hot path benchmarks - see `benchmarks.hot_paths`
+
+###### Reactions ######
+
+# small inorganic reactions in a neutral solution
+SMALL_INORGANIC = [
+    "h2+o2=h2o",
+    "fe+o2=>fe2o3",
+    "zn+hcl=zncl2+h2",
+    "al+cuso4=al2(so4)3+cu",
+    "ca(oh)2+h3po4=ca3(po4)2+h2o",
+    "cu+hno3=cu(no3)2+no+h2o",
+    "nh3+o2=no+h2o",
+    "kmno4+hcl=kcl+mncl2+h2o+cl2",
+    "na^++cl^-=>nacl",
+    "caco3=cao+co2",
+    "fe2o3+co=fe+co2",
+    "agno3+nacl=agcl+nano3",
+    "c3h8+o2=co2+h2o",
+    "c6h12o6(s)+o2(g)=co2(g)+h2o(l)",
+    "na+h2o=naoh+h2",
+    "pb(no3)2+ki=pbi2+kno3",
+]
+
+# half reactions that need H^+/H2O (acidic, 3) or OH^-/H2O (alkaline, 2) - (reaction, reaction_solution)
+REDOX = [
+    ("mno4^-+fe^2+=>mn^2++fe^3+", 3),
+    ("cr2o7^2-+fe^2+=>cr^3++fe^3+", 3),
+    ("mno4^-+c2o4^2-=>mn^2++co2", 3),
+    ("cu+no3^-=>cu^2++no", 3),
+    ("mno4^-+i^-=>mno2+i2", 2),
+    ("cro4^2-+fe(oh)2=>cr(oh)3+fe(oh)3", 2),
+    ("clo^-+cr(oh)4^-=>cl^-+cro4^2-", 2),
+    ("mno4^-+so3^2-=>mno2+so4^2-", 2),
+]
+
+# the largest example in the package - (reaction, reaction_solution)
+CR_COMPLEX = [
+    ("cr7n66h96c42o24+mno4^-=>cr2o7^2-+mn^2++co2+no3^-", 3),
+    ("[Cr(N2H4CO)6]4[Cr(CN)6]3+KMnO4+H2SO4=K2Cr2O7+MnSO4+CO2+KNO3+K2SO4+H2O", 1),
+]
+
+# unformatted reactions for `format_full_reaction`
+UNFORMATTED = [
+    "cr7n66h96c42o24+mno4^-+h2o=>cr2o7^2-+mn^2++co2+no3^-+h3o^+",
+    "[Cr(N2H4CO)6]4[Cr(CN)6]3(S)+MnO4^-(AQ)+H2O=Cr2O7^2-(AQ)+CO2(G)+NO3^-(AQ)+Mn^2+(AQ)+H^+",
+    "c6h12o6(s)+o2(g)=co2(g)+h2o(l)",
+    "Na^+ +   Cl^- =>  NaCl  ",
+    "2h2 + o2 = 2h2o",
+    "fe^3+ + 3oh^- => fe(oh)3(s)",
+    "ch3cooh(aq) + h2o(l) => ch3coo^-(aq) + h3o^+(aq)",
+    "kmno4+hcl=kcl+mncl2+h2o+cl2",
+]
+
+# reactions with states of matter for `equillibrium_constant`
+EQUILLIBRIA = [
+    "C6H12O6(aq) + 6O2(g) => 6CO2(g) + 6H2O(l)",
+    "CH3COOH(aq) + H2O(l) => CH3COO^-(aq) + H3O^+(aq)",
+    "H2O(l) + H2O(l) => H3O^+(aq) + OH^-(aq)",
+    "CaCO3(s) => CaO(s) + CO2(g)",
+    "I2(aq) => I2(oktan-1-ol)",
+    "2NO2(g) => N2O4(g)",
+    "AgCl(s) => Ag^+(aq) + Cl^-(aq)",
+    "N2(g) + 3H2(g) => 2NH3(g)",
+]
+
+
+###### pH ######
+
+# mixes of polyprotic acids and bases - each entry is a list of species for `System`
+def polyprotic_mixtures():
+    from pH.pH_calculator import Acid, Base, NonReactive
+
+    return [
+        [Acid(pKa=[2.148, 7.198, 12.375], charge=0, conc=1e-3)],
+        [Acid(pKa=[3.13, 4.76, 6.40], charge=0, conc=0.02), NonReactive(charge=1, conc=0.03)],
+        [Acid(pKa=[6.35, 10.33], charge=-2, conc=0.05), NonReactive(charge=1, conc=0.1)],
+        [Acid(pKa=[2.148, 7.198, 12.375], charge=0, conc=0.01), Base(pKb=[4.75], charge=0, conc=0.02),
+         NonReactive(charge=-1, conc=0.005)],
+        [Acid(pKa=[1.25, 4.14], charge=0, conc=0.01), Acid(pKa=[3.13, 4.76, 6.40], charge=0, conc=0.01),
+         Acid(pKa=[6.35, 10.33], charge=0, conc=0.01), Base(pKb=[4.75], charge=0, conc=0.05)],
+        [Acid(pKa=[-3., 1.99], charge=0, conc=0.005), Acid(pKa=4.76, charge=-1, conc=0.1), NonReactive(charge=1, conc=0.1)],
+    ]
+
+# temperatures in K for `System.solve_temperatures` - 5 to 90 C
+def temperature_grid(n=256):
+    import numpy as np
+    
+    return np.linspace(278.15, 363.15, n)
+
+# (analytes, titrants, titrant_end_conc) for `titration_curve`
+def titrations():
+    from pH.pH_calculator import Acid, Base, NonReactive
+
+    return [
+        ([Acid(pKa=4.76, charge=0, conc=0.1)], [NonReactive(charge=1, conc=0.)], 0.2),
+        ([Acid(pKa=[2.148, 7.198, 12.375], charge=0, conc=0.05)], [NonReactive(charge=1, conc=0.)], 0.2),
+        ([Base(pKb=4.75, charge=0, conc=0.1)], [NonReactive(charge=-1, conc=0.)], 0.2),
+        ([Acid(pKa=[3.13, 4.76, 6.40], charge=0, conc=0.02)], [NonReactive(charge=1, conc=0.)], 0.08),
+    ]
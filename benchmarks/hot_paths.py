@@ -0,0 +1,208 @@
+# Hot path benchmark - throughput, latency percentiles and peak memory of the balancer, formatter,
+# equillibrium constant and pH solver, compared against a saved JSON baseline
+#
+# Usage (from the root of the repository):
+#     python -m benchmarks.hot_paths --save benchmarks/baselines/hot_paths.json
+#     python -m benchmarks.hot_paths --compare benchmarks/baselines/hot_paths.json --threshold 0.25
+#     python -m benchmarks.hot_paths balance.cr_complex ph.titration --min-time 2
+#
+# The caches (compounds, capitalizations) are warm, since that's the steady state of a long running process
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks import corpora
+
+# a benchmark fails if it gets slower or uses more memory than this fraction of its baseline
+REGRESSION_THRESHOLD = 0.2
+
+# Every benchmark returns a list of zero argument operations - one operation is timed at a time
+def _balance_small_inorganic():
+    from stoichiometry.balancer import balance_reaction
+    return [lambda reaction=reaction: balance_reaction(reaction) for reaction in corpora.SMALL_INORGANIC]
+
+def _balance_redox():
+    from stoichiometry.balancer import balance_reaction
+    return [lambda reaction=reaction, solution=solution: balance_reaction(reaction, solution)
+            for reaction, solution in corpora.REDOX]
+
+def _balance_cr_complex():
+    from stoichiometry.balancer import balance_reaction
+    return [lambda reaction=reaction, solution=solution: balance_reaction(reaction, solution)
+            for reaction, solution in corpora.CR_COMPLEX]
+
+def _balance_batch():
+    from stoichiometry.balancer import balance_reactions
+    reactions = corpora.SMALL_INORGANIC * 16
+    return [lambda: list(balance_reactions(reactions))]
+
+def _format_full_reaction():
+    from utils.formatter_utils import format_full_reaction
+    return [lambda reaction=reaction: format_full_reaction(reaction) for reaction in corpora.UNFORMATTED]
+
+def _equillibrium_constant():
+    from equillibrium.eq_const import equillibrium_constant
+    return [lambda reaction=reaction: equillibrium_constant(reaction) for reaction in corpora.EQUILLIBRIA]
+
+def _ph_polyprotic():
+    from pH.pH_calculator import System
+    return [lambda system=System(species): system.pHsolve() for species in corpora.polyprotic_mixtures()]
+
+def _ph_polyprotic_davies():
+    from pH.pH_calculator import System
+    return [lambda system=System(species, activity="davies"): system.pHsolve() for species in corpora.polyprotic_mixtures()]
+
+def _ph_temperature_grid():
+    from pH.pH_calculator import System
+    temperatures = corpora.temperature_grid()
+    return [lambda system=System(species): system.solve_temperatures(temperatures) for species in corpora.polyprotic_mixtures()]
+
+def _ph_sensitivities():
+    from pH.pH_calculator import System
+    return [lambda system=System(species): system.sensitivities() for species in corpora.polyprotic_mixtures()]
+
+def _ph_titration():
+    from pH.pH_titration import titration_curve
+    return [lambda analytes=analytes, titrants=titrants, end=end: titration_curve(analytes, titrants, end)
+            for analytes, titrants, end in corpora.titrations()]
+
+def _ph_titration_davies():
+    from pH.pH_titration import titration_curve
+    return [lambda analytes=analytes, titrants=titrants, end=end: titration_curve(analytes, titrants, end, activity="davies")
+            for analytes, titrants, end in corpora.titrations()]
+
+BENCHMARKS = {
+    "balance.small_inorganic": _balance_small_inorganic,
+    "balance.redox": _balance_redox,
+    "balance.cr_complex": _balance_cr_complex,
+    "balance.batch": _balance_batch,
+    "format.full_reaction": _format_full_reaction,
+    "equillibrium.constant": _equillibrium_constant,
+    "ph.polyprotic": _ph_polyprotic,
+    "ph.polyprotic_davies": _ph_polyprotic_davies,
+    "ph.temperature_grid": _ph_temperature_grid,
+    "ph.sensitivities": _ph_sensitivities,
+    "ph.titration": _ph_titration,
+    "ph.titration_davies": _ph_titration_davies,
+}
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100. * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_benchmark(name, min_time=1., min_rounds=5):
+    """
+    Args:
+        name (str) - a key of `BENCHMARKS`
+        min_time (float) - the operations are repeated for at least this many seconds
+        min_rounds (int) - and at least this many times through the corpus
+
+    Returns (dict):
+        ops_per_second, the p50/p90/p99 latency in microseconds, the number of operations and the
+        peak memory in KiB allocated by a single pass through the corpus
+    """
+    operations = BENCHMARKS[name]()
+
+    # warm up - imports and caches
+    for operation in operations:
+        operation()
+
+    latencies = []
+    rounds = 0
+    start = time.perf_counter()
+    while rounds < min_rounds or time.perf_counter() - start < min_time:
+        for operation in operations:
+            operation_start = time.perf_counter_ns()
+            operation()
+            latencies += [time.perf_counter_ns() - operation_start]
+        rounds += 1
+
+    # tracemalloc slows everything down, so the memory is measured in a separate pass
+    tracemalloc.start()
+    for operation in operations:
+        operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {"ops_per_second": len(latencies) / (sum(latencies) * 1e-9), "operations": len(latencies),
+            "p50_us": _percentile(latencies, 50) / 1000., "p90_us": _percentile(latencies, 90) / 1000.,
+            "p99_us": _percentile(latencies, 99) / 1000., "mean_us": statistics.fmean(latencies) / 1000.,
+            "peak_memory_kib": peak / 1024.}
+
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Args:
+        results (dict) - {name: result of `run_benchmark`}
+        baseline (dict) - the same, from an earlier run
+        threshold (float) - allowed relative loss of throughput and growth of peak memory
+
+    Returns (dict):
+        {name: description} of every benchmark that got worse than the threshold - benchmarks missing from the
+        baseline are skipped
+    """
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        problems = []
+        throughput_ratio = result["ops_per_second"] / baseline[name]["ops_per_second"]
+        if throughput_ratio < 1. - threshold:
+            problems += [f"{(1. - throughput_ratio) * 100.:.0f}% fewer ops/sec"]
+
+        # small absolute changes in memory are just noise
+        memory_growth = result["peak_memory_kib"] - baseline[name]["peak_memory_kib"]
+        if memory_growth > threshold * baseline[name]["peak_memory_kib"] and memory_growth > 64.:
+            problems += [f"{memory_growth:.0f} KiB more peak memory"]
+
+        if len(problems) > 0:
+            regressions[name] = ", ".join(problems)
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the hot paths and checks them against a baseline")
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS), help="the benchmarks to run")
+    parser.add_argument("--min-time", type=float, default=1., help="seconds each benchmark runs for at least")
+    parser.add_argument("--save", default=None, help="write the results to this JSON file as the new baseline")
+    parser.add_argument("--compare", default=None, help="fail if the results are worse than this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed relative regression - 0.2 is 20%% slower or 20%% more memory")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if len(unknown) > 0:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)} - choose from {', '.join(BENCHMARKS)}")
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)["benchmarks"]
+
+    results = {}
+    for name in args.benchmarks:
+        results[name] = result = run_benchmark(name, args.min_time)
+
+        print(f"{name:<24} {result['ops_per_second']:10.1f} ops/s  p50 {result['p50_us']:9.1f} us  "
+              f"p90 {result['p90_us']:9.1f} us  p99 {result['p99_us']:9.1f} us  peak {result['peak_memory_kib']:8.1f} KiB")
+
+    if args.save is not None:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, "w") as file:
+            json.dump({"python": sys.version.split()[0], "benchmarks": results}, file, indent=2)
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, description in regressions.items():
+        print(f"REGRESSION {name}: {description}")
+
+    return 1 if len(regressions) > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
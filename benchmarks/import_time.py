@@ -0,0 +1,83 @@
+# Import time benchmark - fails when importing a package takes longer than its budget or pulls in a heavy dependency
+#
+# Usage (from the root of the repository):
+#     python -m benchmarks.import_time
+#     python -m benchmarks.import_time --budget-ms 30 --repeat 20 stoichiometry.balancer
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# the packages and how long they may take to import, in milliseconds
+IMPORT_BUDGETS_MS = {
+    "stoichiometry": 50.,
+    "stoichiometry.balancer": 50.,
+    "pH.pH_calculator": 50.,
+    "pH.pH_plotters": 50.,
+    "utils.plotter_utils": 50.,
+}
+
+# these should only be imported the first time they're used
+HEAVY_DEPENDENCIES = ["numpy", "scipy", "matplotlib"]
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in a fresh interpreter, so nothing is imported beforehand
+MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+def measure_import_time(module, repeat=10):
+    """
+    Args:
+        module (str) - the module to import
+        repeat (int) - number of fresh interpreters the import is timed in
+        
+    Returns (dict):
+        median_ms, min_ms and max_ms of the import time and the heavy dependencies that were imported
+    """
+    times = []
+    heavy_dependencies = set()
+    
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT.format(module=module)], cwd=REPOSITORY_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times += [result["seconds"] * 1000.]
+        heavy_dependencies.update(name for name in result["modules"] if name.split(".")[0] in HEAVY_DEPENDENCIES)
+    
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "max_ms": max(times),
+            "heavy_dependencies": sorted(set(name.split(".")[0] for name in heavy_dependencies))}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checks that importing the packages stays within its time budget")
+    parser.add_argument("modules", nargs="*", default=list(IMPORT_BUDGETS_MS), help="the modules to import")
+    parser.add_argument("--budget-ms", type=float, default=None, help="budget for every module - overrides the defaults")
+    parser.add_argument("--repeat", type=int, default=10, help="number of fresh interpreters per module")
+    args = parser.parse_args(argv)
+    
+    failed = False
+    for module in args.modules:
+        budget = args.budget_ms if args.budget_ms is not None else IMPORT_BUDGETS_MS.get(module, 50.)
+        result = measure_import_time(module, args.repeat)
+        
+        status = "ok"
+        if result["median_ms"] > budget:
+            status = "FAIL - over budget"
+        elif len(result["heavy_dependencies"]) > 0:
+            status = "FAIL - imports " + ", ".join(result["heavy_dependencies"])
+        failed = failed or status != "ok"
+        
+        print(f"{module:<28} median {result['median_ms']:7.2f} ms  (min {result['min_ms']:.2f}, max {result['max_ms']:.2f})"
+              f"  budget {budget:.0f} ms  {status}")
+    
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
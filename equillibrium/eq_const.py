@@ -1,12 +1,11 @@
 # Equillibrium constant formatter
-from utils.reaction_info_utils import (reaction_splitter, separate_states_of_matter, 
-                                       separate_coefficients)
+from utils.reaction_info_utils import as_reaction
 
 
 def equillibrium_constant(reaction, specified_constant="INFER"):
     """
     Args:
-        reaction (str) - formatted reaction **with states of matter**
+        reaction (str or Reaction) - formatted reaction **with states of matter** - or a parsed reaction, see `Reaction`
         specified_constant (str) - the symbol to use for the equillibrium constant
             - if `specified_constant='INFER'`, then the symbol to use is inferred from the states of matter in the reaction
         
@@ -15,18 +14,21 @@ def equillibrium_constant(reaction, specified_constant="INFER"):
     """
     
     infered_constant = "K"
-
-    reactant_list = reaction.split(" => ")[0]
-    product_list = reaction.split(" => ")[1]
     
-    reactant_list = reaction_splitter(reactant_list)
-    product_list = reaction_splitter(product_list)
-    # the 'separate_states_of_matter' function is definitly one of the functions that should change based on the above
-    reactant_list, states_of_matter_list_reactants = separate_states_of_matter(reactant_list)
-    product_list, states_of_matter_list_products = separate_states_of_matter(product_list)
-    # the code assumes the states of matter is split correctly        
-    reactant_list, reactant_coefficients = separate_coefficients(reactant_list)
-    product_list, product_coefficients = separate_coefficients(product_list)
+    reaction = as_reaction(reaction)
+    
+    # the compounds are used as they were written - e.g. already latex formatted
+    reactants = [compound for compound in reaction.compounds if not compound.is_product]
+    products = [compound for compound in reaction.compounds if compound.is_product]
+    
+    reactant_list = [compound.formula for compound in reactants]
+    product_list = [compound.formula for compound in products]
+    states_of_matter_list_reactants = [compound.state for compound in reactants]
+    states_of_matter_list_products = [compound.state for compound in products]
+    reactant_coefficients = [compound.coefficient or "1" for compound in reactants]
+    product_coefficients = [compound.coefficient or "1" for compound in products]
+    
+    reaction = reaction.text
     
     
     # the standard fraction
@@ -5,7 +5,7 @@ PTABLENAME = ["H","He","Li","Be","B","C","N","O","F","Ne","Na","Mg","Al","Si","P
               "Ca","Sc","Ti","V","Cr","Mn","Fe","Co","Ni","Cu","Zn","Ga","Ge","As","Se","Br","Kr",
               "Rb","Sr","Y","Zr","Nb","Mo","Tc","Ru","Rh","Pd","Ag","Cd","In","Sn","Sb","Te","I","Xe",
               "Cs","Ba","La","Ce","Pr","Nd","Pm","Sm","Eu","Gd","Tb","Dy","Ho","Er","Tm","Yb","Lu","Hf",
-              "Ta","W","Re","Os","Ir","Pt","Au","Hg","Ti","Pb","Bi","Po","At","Rn","Fr","Ra","Ac","Th",
+              "Ta","W","Re","Os","Ir","Pt","Au","Hg","Tl","Pb","Bi","Po","At","Rn","Fr","Ra","Ac","Th",
               "Pa","U","Np","Pu","Am","Cm","Bk","Cf","Es","Fm","Md","No","Lr","Rf","Db","Sg","Bh","Hs",
               "Mt","Ds","Rg","Cn","Nh","Fl","Mc","Lv","Ts","Og"]
 
@@ -18,14 +18,54 @@ MODIFIEDPTABLENAME = ["H","He","Li","Be","B","C","N","O","F","Ne","Na","Mg","Al"
                       "Ar","K", "Ca","Sc","Ti","V","Cr","Mn","Fe","Ni","Cu","Zn","Ga","Ge","As","Se","Br","Kr",
                       "Rb","Sr","Y","Zr","Nb","Mo","Tc","Ru","Rh","Pd","Ag","Cd","In","Sn","Sb","Te","I","Xe",
                       "Cs","Ba","La","Ce","Pr","Nd","Pm","Sm","Eu","Gd","Tb","Dy","Ho","Er","Tm","Yb","Lu","Hf",
-                      "Ta","W","Re","Os","Ir","Pt","Au","Hg","Ti","Pb","Bi","At","Rn","Fr","Ra","Ac","Th",
+                      "Ta","W","Re","Os","Ir","Pt","Au","Hg","Tl","Pb","Bi","At","Rn","Fr","Ra","Ac","Th",
                       "Pa","U","Np","Pu","Am","Cm","Bk","Es","Fm","Md","Lr","Rf","Db","Sg","Bh","Hs",
                       "Mt","Ds","Rg","Fl","Mc","Lv","Ts","Og"]
 
 MODIFIEDPTABLENAMELOWER = [element.lower() for element in MODIFIEDPTABLENAME]
 
+# the symbols removed above - "co" is far more often C + O than Co
+AMBIGUOUSPTABLENAME = [element for element in PTABLENAME if element not in MODIFIEDPTABLENAME]
+
 LIST_OF_EQUILIBRIUM_CONSTANTS_FORMATTED = ["K_c", "K_F", "K_p", "k_o", "K_K", "K_s", "K_b", "K_w", "K_H"]
 LIST_OF_EQUILIBRIUM_CONSTANTS_LOWER_NOT_FORMATTED = ["kc", "kf", "kp", "ko", "kk", "ka", "kb", "kw", "kh"]
 
 START_PARENTHESES_TYPES = ["(", "[", "{"]
 END_PARENTHESES_TYPES = [")", "]", "}"]
+
+
+###### Indexes ######
+
+# symbol -> atomic number
+ATOMIC_NUMBERS = {symbol: i + 1 for i, symbol in enumerate(PTABLENAME)}
+
+# lowercase symbol -> symbol
+CANONICAL_SYMBOLS = {symbol.lower(): symbol for symbol in PTABLENAME}
+
+PTABLENAMESET = frozenset(PTABLENAME)
+PTABLENAMELOWERSET = frozenset(PTABLENAMELOWER)
+MODIFIEDPTABLENAMELOWERSET = frozenset(MODIFIEDPTABLENAMELOWER)
+
+# Nested dicts keyed by lowercase letters - the symbol ending at a node is stored under ""
+def build_symbol_trie(symbols):
+    """
+    Args:
+        symbols (list) - element symbols with correct capitalization
+        
+    Returns (dict):
+        trie of the lowercase symbols
+        
+    Example:
+        >>>build_symbol_trie(["C", "Co", "O"])
+        {'c': {'': 'C', 'o': {'': 'Co'}}, 'o': {'': 'O'}}
+    """
+    trie = {}
+    for symbol in symbols:
+        node = trie
+        for char in symbol.lower():
+            node = node.setdefault(char, {})
+        node[""] = symbol
+    return trie
+
+PTABLETRIE = build_symbol_trie(PTABLENAME)
+MODIFIEDPTABLETRIE = build_symbol_trie(MODIFIEDPTABLENAME)
@@ -0,0 +1,150 @@
+#### Activity coefficients of ions - log10(gamma) from the ionic strength and the charge, for water at 25 C ####
+from utils.import_utils import lazy_import
+
+np = lazy_import("numpy")
+
+
+# A and B of the Debye-Hückel equation - (L/mol)^(1/2) and 1/(Å (mol/L)^(1/2))
+DEBYE_HUCKEL_A = 0.509
+DEBYE_HUCKEL_B = 0.328
+# the ion size of the extended Debye-Hückel equation when no other is given - in Å
+ION_SIZE = 4.
+# the linear term of the Davies equation
+DAVIES_COEFFICIENT = 0.3
+
+# the ionic strength fixed point stops when it changes less than this, relative to the ionic strength
+IONIC_STRENGTH_TOLERANCE = 1e-10
+IONIC_STRENGTH_MAX_ITERATIONS = 50
+
+
+###### Activity models ######
+
+# Every model is a function of (ionic_strength, charge) that broadcasts like a numpy ufunc
+def debye_huckel(ionic_strength, charge):
+    """
+    The limiting law - only good below an ionic strength of about 0.005 M
+
+    Args:
+        ionic_strength (float or np.array) - in mol/L
+        charge (float or np.array) - charge of the ion
+
+    Returns (float or np.array):
+        log10 of the activity coefficient
+
+    Example:
+        >>>round(10**debye_huckel(0.01, 2), 3)
+        0.626
+    """
+    return -DEBYE_HUCKEL_A * charge**2 * np.sqrt(ionic_strength)
+
+def extended_debye_huckel(ionic_strength, charge, ion_size=ION_SIZE):
+    """
+    Good up to an ionic strength of about 0.1 M
+
+    Args:
+        ionic_strength (float or np.array) - in mol/L
+        charge (float or np.array) - charge of the ion
+        ion_size (float) - the effective diameter of the hydrated ion in Å
+
+    Returns (float or np.array):
+        log10 of the activity coefficient
+
+    Example:
+        >>>round(10**extended_debye_huckel(0.01, 2), 3)
+        0.661
+    """
+    root = np.sqrt(ionic_strength)
+    return -DEBYE_HUCKEL_A * charge**2 * root / (1. + DEBYE_HUCKEL_B * ion_size * root)
+
+def davies(ionic_strength, charge):
+    """
+    Good up to an ionic strength of about 0.5 M - needs no ion size
+
+    Args:
+        ionic_strength (float or np.array) - in mol/L
+        charge (float or np.array) - charge of the ion
+
+    Returns (float or np.array):
+        log10 of the activity coefficient
+
+    Example:
+        >>>round(10**davies(0.01, 2), 3)
+        0.662
+    """
+    root = np.sqrt(ionic_strength)
+    return -DEBYE_HUCKEL_A * charge**2 * (root / (1. + root) - DAVIES_COEFFICIENT * ionic_strength)
+
+ACTIVITY_MODELS = {
+    "debye-huckel": debye_huckel,
+    "extended-debye-huckel": extended_debye_huckel,
+    "davies": davies,
+}
+
+def activity_model(model):
+    """
+    Args:
+        model (str or function) - a key of `ACTIVITY_MODELS`, a function of (ionic_strength, charge) returning
+            log10 of the activity coefficient, or None for an ideal solution
+
+    Returns (function or None):
+        the activity model
+    """
+    if model is None or callable(model):
+        return model
+
+    if model not in ACTIVITY_MODELS:
+        raise ValueError(f"Unknown activity model: {model} - use {', '.join(map(repr, ACTIVITY_MODELS))} or a function")
+    return ACTIVITY_MODELS[model]
+
+
+###### Ionic strength ######
+
+# The ionic strength changes the activity coefficients, which change the pH, which changes the ionic strength - every
+# scenario is iterated to its own fixed point, with secant steps on `update(I) - I` once there are two iterates
+def ionic_strength_fixed_point(update, n, tol=IONIC_STRENGTH_TOLERANCE, maxiter=IONIC_STRENGTH_MAX_ITERATIONS):
+    """
+    Args:
+        update (function) - update(ionic_strength, active) is the ionic strength of the solved system when the activity
+            coefficients are those at `ionic_strength`, for the scenarios with the indices `active`
+        n (int) - number of scenarios - every scenario starts as an ideal solution, at an ionic strength of 0
+        tol (float) - relative tolerance of the ionic strength
+        maxiter (int) - maximum number of updates
+
+    Returns (tuple):
+        ionic_strength (np.array) - the fixed point of every scenario
+        nit (int) - number of updates
+        converged (np.array) - if the ionic strength of each scenario is within `tol`
+    """
+    ionic_strength = np.zeros(n)
+    previous = np.full(n, np.nan)
+    previous_residual = np.full(n, np.nan)
+    converged = np.zeros(n, dtype=bool)
+    active = np.arange(n)
+
+    iteration = 0
+    for iteration in range(1, maxiter + 1):
+        current = ionic_strength[active]
+        residual = update(current, active) - current
+
+        # a scenario that can't be solved, e.g. a charge balance without a root, drops out unconverged
+        is_converged = np.abs(residual) <= tol * np.maximum(current + residual, 1e-14)
+        converged[active[is_converged]] = True
+        done = is_converged | ~np.isfinite(residual)
+
+        # secant step, or a plain fixed point step when there is no previous iterate or the secant is flat
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = (residual - previous_residual[active]) / (current - previous[active])
+        is_secant = np.isfinite(slope) & (slope < 0.)
+        step = np.where(is_secant, -residual / np.where(is_secant, slope, 1.), residual)
+
+        previous[active] = current
+        previous_residual[active] = residual
+        # the ionic strength is never negative - a secant step past 0 falls back to the fixed point step
+        ionic_strength[active] = np.where(current + step >= 0., current + step, current + residual)
+        ionic_strength[active[done]] = current[done] + residual[done]
+
+        active = active[~done]
+        if len(active) == 0:
+            break
+
+    return ionic_strength, iteration, converged
@@ -1,6 +1,49 @@
 #### NOTE: This method and a lot of the code is inspired by: https://github.com/rnelsonchem/pHcalc ####
-import numpy as np
-import scipy.optimize as spo
+from utils.import_utils import lazy_import
+from pH.activity import activity_model, ionic_strength_fixed_point
+from pH.temperature import REFERENCE_TEMPERATURE, GAS_CONSTANT, log10_Kw_change
+
+np = lazy_import("numpy")
+spo = lazy_import("scipy.optimize")
+
+
+# the charge balance root is searched for in this pH interval first
+PH_BRACKET = (-2., 16.)
+# ... and the interval is widened up to these limits if needed
+PH_BRACKET_LIMIT = (-30., 44.)
+# with an activity model, the solve at each new ionic strength searches this far around the extrapolated pH first
+WARM_PH_BRACKET = 0.5
+# ... and the batched newton steps from it, which aren't bracketed at first, are at most this long
+MAX_WARM_PH_STEP = 1.
+
+# The pH at the next ionic strength of each scenario, extrapolated through the last two solves - shape (2, n) histories
+# of ionic strengths and pH, oldest first - nan where there is no solve yet
+def _extrapolated_pH(ionic_strength_history, pH_history, ionic_strength):
+    (previous_ionic_strength, last_ionic_strength), (previous_pH, last_pH) = ionic_strength_history, pH_history
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (last_pH - previous_pH) / (last_ionic_strength - previous_ionic_strength)
+    
+    return np.where(np.isfinite(slope), last_pH + slope * (ionic_strength - last_ionic_strength), last_pH)
+
+# One enthalpy for every equillibrium constant - a single value is used for all of them
+def _step_enthalpies(dH, constants):
+    dH = np.array(dH, dtype=float).flatten()
+    if len(dH) == 1:
+        return np.full(len(constants), dH[0])
+    if len(dH) != len(constants):
+        raise ValueError(f"Got {len(dH)} enthalpies for {len(constants)} equillibrium constants")
+    return dH
+
+# Normalizes the terms along the first axis in log space, so nothing underflows at extreme pH
+def _fractions_from_log_terms(log_terms):
+    terms = 10.**(log_terms - log_terms.max(axis=0))
+    
+    return terms / terms.sum(axis=0)
+
+# d(alpha)/d(pH) when d(log10 term)/d(pH) is `slope` for each term
+def _fraction_derivatives(alpha, slope):
+    return np.log(10.) * alpha * (slope - (slope * alpha).sum(axis=0))
 
 
 class Acid():
@@ -10,29 +53,58 @@ class Acid():
         pKa (list) - list of pKa values for the acid
         charge (int) - the charge of the acid in the form it's added
         conc (float) - the initial concentration of the acid
+        dH (float or list) - the standard enthalpy of each dissociation step in J/mol, in the same order as Ka or pKa -
+            the constants are at 25 C, and only change with the temperature if this is given - see `pH.temperature`
     """
-    def __init__(self, Ka=None, pKa=None, charge=None, conc=None, Kw=10.**(-14.)):
-        if Ka == None:
+    def __init__(self, Ka=None, pKa=None, charge=None, conc=None, Kw=10.**(-14.), dH=0.):
+        if Ka is None:
             Ka = 10.**((-1.) * np.array([pKa], dtype=float))
         
         Ka = np.array([Ka], dtype=float).flatten()
-        Ka.sort() # smallest first
-        self.Ka = np.array(Ka, dtype=float)[::-1] # largest first
+        dH = _step_enthalpies(dH, Ka)
+        order = np.argsort(-Ka, kind="stable") # largest first
+        self.Ka = Ka[order]
+        self.dH = dH[order]
         self.conc = np.array(conc, dtype=float)
         self.charge = np.arange(charge, charge - len(self.Ka) - 1, -1, dtype=float)
         
+        # log10 of the products Ka[0]*...*Ka[m-1] - computed once, since they're needed at every pH
+        self.log_cumulative_Ka = np.concatenate(([0.], np.cumsum(np.log10(self.Ka))))
+        # ... and the enthalpies of the same products
+        self.cumulative_dH = np.concatenate(([0.], np.cumsum(self.dH)))
+        
     def alpha(self, pH):
         """
         Args: 
-            pH (float) - the pH at which the 'DOD' is calculated
+            pH (float or np.array) - the pH(s) at which the 'DOD' is calculated - any shape
+            
+        Returns (np.array):
+            the fraction of each species, from the most protonated to the least - shape (len(Ka) + 1, *pH.shape)
         """
-        pH = np.array([pH], dtype=float)
-        h3o = 10.**((-1.) * pH)
+        pH = np.asarray(pH, dtype=float)
         n = len(self.Ka)
+        m = np.arange(n + 1).reshape((n + 1,) + (1,) * pH.ndim)
         
-        l = np.array([h3o**(n - m) * np.prod(self.Ka[:m]) for m in range(n + 1)])
-
-        return (l / l.sum()).flatten()
+        # log10 of h3o**(n - m) * Ka[0]*...*Ka[m-1]
+        log_terms = (n - m) * (-pH) + self.log_cumulative_Ka.reshape(m.shape)
+        
+        return _fractions_from_log_terms(log_terms)
+    
+    def alpha_derivative(self, pH):
+        """
+        Args: 
+            pH (float or np.array) - the pH(s) at which the derivative is calculated - any shape
+            
+        Returns (np.array):
+            d(alpha)/d(pH) - same shape as `alpha(pH)`
+        """
+        pH = np.asarray(pH, dtype=float)
+        n = len(self.Ka)
+        
+        # d(log10 term)/d(pH) for each species
+        slope = -(n - np.arange(n + 1)).reshape((n + 1,) + (1,) * pH.ndim)
+        
+        return _fraction_derivatives(self.alpha(pH), slope)
     
     def __repr__(self):
         return f"Acid: \n\tKa={self.Ka} \n\tcharge={self.charge} \n\tinitial concentration={self.conc}"
@@ -45,29 +117,59 @@ class Base():
         pKb (list) - list of pKb values for the acid
         charge (int) - the charge of the acid in the form it's added
         conc (float) - the initial concentration of the acid
+        dH (float or list) - the standard enthalpy of each protonation step in J/mol, in the same order as Kb or pKb -
+            the constants are at 25 C, and only change with the temperature if this is given - see `pH.temperature`
     """
-    def __init__(self, Kb=None, pKb=None, charge=None, conc=None, Kw=10.**(-14.)):
-        if Kb == None:
+    def __init__(self, Kb=None, pKb=None, charge=None, conc=None, Kw=10.**(-14.), dH=0.):
+        if Kb is None:
             Kb = 10.**((-1.) * np.array([pKb], dtype=float))
         
         Kb = np.array([Kb], dtype=float).flatten()
-        Kb.sort() # smallest first
-        self.Kb = np.array(Kb, dtype=float)[::-1] # largest first
+        dH = _step_enthalpies(dH, Kb)
+        order = np.argsort(-Kb, kind="stable") # largest first
+        self.Kb = Kb[order]
+        self.dH = dH[order]
         self.Kw = np.array(Kw, dtype=float)
         self.conc = np.array(conc, dtype=float)
         self.charge = np.arange(charge, charge + len(self.Kb) + 1, 1, dtype=float)
         
+        # log10 of the products Kb[0]*...*Kb[m-1] - computed once, since they're needed at every pH
+        self.log_cumulative_Kb = np.concatenate(([0.], np.cumsum(np.log10(self.Kb))))
+        # ... and the enthalpies of the same products
+        self.cumulative_dH = np.concatenate(([0.], np.cumsum(self.dH)))
+        
     def alpha(self, pH):
         """
-        Input: pH - single value
+        Args: 
+            pH (float or np.array) - the pH(s) at which the 'DOD' is calculated - any shape
+            
+        Returns (np.array):
+            the fraction of each species, from the least protonated to the most - shape (len(Kb) + 1, *pH.shape)
         """
-        pH = np.array([pH], dtype=float)
-        oh = 10.**(np.log10(self.Kw) + pH)
+        pH = np.asarray(pH, dtype=float)
         n = len(self.Kb)
+        m = np.arange(n + 1).reshape((n + 1,) + (1,) * pH.ndim)
         
-        l = np.array([oh**(n - m) * np.prod(self.Kb[:m]) for m in range(n + 1)])
-
-        return (l / l.sum()).flatten()
+        # log10 of oh**(n - m) * Kb[0]*...*Kb[m-1]
+        log_terms = (n - m) * (np.log10(self.Kw) + pH) + self.log_cumulative_Kb.reshape(m.shape)
+        
+        return _fractions_from_log_terms(log_terms)
+    
+    def alpha_derivative(self, pH):
+        """
+        Args: 
+            pH (float or np.array) - the pH(s) at which the derivative is calculated - any shape
+            
+        Returns (np.array):
+            d(alpha)/d(pH) - same shape as `alpha(pH)`
+        """
+        pH = np.asarray(pH, dtype=float)
+        n = len(self.Kb)
+        
+        # d(log10 term)/d(pH) for each species
+        slope = (n - np.arange(n + 1)).reshape((n + 1,) + (1,) * pH.ndim)
+        
+        return _fraction_derivatives(self.alpha(pH), slope)
 
     
     def __repr__(self):
@@ -89,53 +191,761 @@ class NonReactive():
         The model just assumes that the actual concentration of the ions are known
         or that all nonreactive ions dissociate fully which is ofc a bit naive, 
         but it should be pretty easy to add an option to provide a K_o of the salt
+        
+        Returns (np.array):
+            ones of shape (1, *pH.shape)
         """
         
-        return np.array(1, dtype=float)
+        return np.ones((1,) + np.shape(pH), dtype=float)
+    
+    def alpha_derivative(self, pH):
+        """
+        Returns (np.array):
+            zeros of shape (1, *pH.shape) - the fraction doesn't depend on the pH
+        """
+        
+        return np.zeros((1,) + np.shape(pH), dtype=float)
+
+
+
+# The values of the scenarios `indices` - None stays None
+def _rows(values, indices):
+    return None if values is None else values[indices]
+
+# One value for every pH, flattened like the pH - from one value for all or one per pH
+def _flat_per_pH(values, pH):
+    flat_values = np.asarray(values, dtype=float).reshape(-1)
+    if flat_values.size != pH.size:
+        flat_values = np.broadcast_to(np.asarray(values, dtype=float), pH.shape).reshape(-1)
+    return flat_values
+
+# log10 of the term of every form of a species is `slope * pH + intercept` - see `Acid.alpha` and `Base.alpha` - and
+# away from 25 C the intercept changes with the van't Hoff equation for the enthalpy and with Kw to the power
+def _species_terms(s):
+    if isinstance(s, Acid):
+        n = len(s.Ka)
+        return s.charge, -(n - np.arange(n + 1.)), s.log_cumulative_Ka, s.cumulative_dH, np.zeros(n + 1)
+    
+    if isinstance(s, Base):
+        n = len(s.Kb)
+        exponents = n - np.arange(n + 1.)
+        return s.charge, exponents, exponents * np.log10(s.Kw) + s.log_cumulative_Kb, s.cumulative_dH, exponents
+    
+    # NonReactive - a single form that is always there
+    return np.reshape(s.charge, (1,)), np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1)
+
+# The values a species is compiled from - species with equal fingerprints compile to the same arrays
+def _species_fingerprint(s):
+    names = ("conc", "charge", "log_cumulative_Ka", "log_cumulative_Kb", "cumulative_dH", "Kw")
+    values = [getattr(s, name) for name in names if hasattr(s, name)]
+    return (type(s),) + tuple(np.asarray(value, dtype=float).tobytes() for value in values)
+
+
+class CompiledSystem():
+    """
+    The species of a `System` as padded arrays (struct of arrays), so the charge balance of every species
+    at every pH is one vectorized expression instead of a python loop over the species.
+    
+    Species with fewer forms are padded with an intercept of -inf, so the padded forms have a fraction of 0.
+    
+    The equillibrium constants are in activities and the pH is -log10 of the activity of H3O^+, so with an activity model
+    log10 of the activity coefficient of each form is subtracted from its log10 term - see `pH.activity`.
+    
+    Args:
+        species (list) - Acid, Base and NonReactive instances
+        Kw (float) - waters ion product constant
+        activity (str or function) - the activity model, see `pH.activity.activity_model` - None for an ideal solution
+        
+    Attributes:
+        conc (np.array) - shape (S,) - the concentration of each species
+        charge (np.array) - shape (S, J) - the charge of each form of each species
+        slope (np.array) - shape (S, J) - d(log10 term)/d(pH) of each form
+        intercept (np.array) - shape (S, J) - log10 term at pH 0 of each form, at 25 C
+        dH (np.array) - shape (S, J) - the enthalpy of the equillibrium constants in the intercept of each form
+        Kw_power (np.array) - shape (S, J) - the power of Kw in the intercept of each form
+        weights (np.array) - shape (4, S, J) - 1, charge, slope and charge * slope
+    """
+    def __init__(self, species, Kw=10.**(-14), activity=None):
+        terms = [_species_terms(s) for s in species]
+        number_of_forms = max([len(charge) for charge, *_ in terms], default=1)
+        
+        self.Kw = Kw
+        self.activity = activity_model(activity)
+        self.conc = np.array([float(np.asarray(s.conc, dtype=float)) for s in species], dtype=float)
+        self.charge = np.zeros((len(species), number_of_forms))
+        self.slope = np.zeros((len(species), number_of_forms))
+        self.intercept = np.full((len(species), number_of_forms), -np.inf)
+        self.dH = np.zeros((len(species), number_of_forms))
+        self.Kw_power = np.zeros((len(species), number_of_forms))
+        
+        for i, (charge, slope, intercept, dH, Kw_power) in enumerate(terms):
+            self.charge[i, :len(charge)] = charge
+            self.slope[i, :len(slope)] = slope
+            self.intercept[i, :len(intercept)] = intercept
+            self.dH[i, :len(dH)] = dH
+            self.Kw_power[i, :len(Kw_power)] = Kw_power
+        
+        # the sums over the forms that are needed, weighted by 1, charge, slope and charge * slope - see `mean_charges`
+        self.weights = np.stack((np.ones_like(self.charge), self.charge, self.slope, self.charge * self.slope))
+        
+        # every charge the activity model is needed for - every form, then H3O^+ and OH^-
+        self._activity_charges = np.append(self.charge.reshape(-1), [1., -1.])[:, None]
+        
+        # which of the (S, J - 1) equillibrium constants each species has - the padding has none
+        self.has_constant = np.arange(number_of_forms - 1) < np.array([len(charge) - 1 for charge, *_ in terms])[:, None]
+    
+    # The conditions of every pH - see `_log_activity_coefficients` and `_temperature_changes`
+    def _conditions(self, pH, ionic_strength=None, temperature=None):
+        return self._log_activity_coefficients(pH, ionic_strength), self._temperature_changes(pH, temperature)
+    
+    # log10 of the activity coefficients at the ionic strength of each pH, from a single call of the activity model -
+    # None for an ideal solution, otherwise those of the forms, shape (S, J, P), and of H3O^+ and OH^-, shape (P,)
+    def _log_activity_coefficients(self, pH, ionic_strength):
+        if self.activity is None or ionic_strength is None:
+            return None
+        
+        log_coefficients = self.activity(_flat_per_pH(ionic_strength, pH), self._activity_charges)
+        
+        return log_coefficients[:-2].reshape(self.charge.shape + (-1,)), log_coefficients[-2], log_coefficients[-1]
+    
+    # The change of the log10 terms of the forms, shape (S, J, P), and of log10(Kw), shape (P,), from 25 C to the
+    # temperature of each pH - None at 25 C
+    def _temperature_changes(self, pH, temperature):
+        if temperature is None:
+            return None
+        
+        flat_temperature = _flat_per_pH(temperature, pH)
+        log_Kw_change = log10_Kw_change(flat_temperature)
+        
+        # van't Hoff for the equillibrium constants and the correlation for Kw - see `pH.temperature`
+        inverse_temperature_change = 1. / flat_temperature - 1. / REFERENCE_TEMPERATURE
+        intercept_change = (-self.dH[:, :, None] / (GAS_CONSTANT * np.log(10.)) * inverse_temperature_change
+                            + self.Kw_power[:, :, None] * log_Kw_change)
+        
+        return intercept_change, log_Kw_change
+    
+    # The terms of every form at every pH, normalized in log space so nothing underflows at extreme pH - shape (S, J, P)
+    def _terms(self, pH, conditions=(None, None)):
+        log_coefficients, temperature_changes = conditions
+        
+        # the pH axis goes last, so the sums over the forms run over whole arrays of pH at a time
+        flat_pH = pH.reshape(-1)
+        log_terms = self.slope[:, :, None] * flat_pH + self.intercept[:, :, None]
+        
+        if temperature_changes is not None:
+            log_terms = log_terms + temperature_changes[0]
+        if log_coefficients is not None:
+            log_terms = log_terms - log_coefficients[0]
+        
+        return np.exp(np.log(10.) * (log_terms - log_terms.max(axis=1)[:, None]))
+    
+    # The concentrations of H3O^+ and OH^- - the pH and Kw are in activities
+    def _water_ions(self, pH, conditions=(None, None)):
+        log_coefficients, temperature_changes = conditions
+        
+        h3o = 10.**(-pH)
+        oh = self.Kw/h3o
+        
+        if temperature_changes is not None:
+            oh = oh * 10.**temperature_changes[1].reshape(pH.shape)
+        if log_coefficients is not None:
+            h3o = h3o / 10.**log_coefficients[1].reshape(pH.shape)
+            oh = oh / 10.**log_coefficients[2].reshape(pH.shape)
+        
+        return h3o, oh
+    
+    def mean_charges(self, pH, ionic_strength=None, temperature=None):
+        """
+        Args:
+            pH (float or np.array) - any shape
+            ionic_strength (float or np.array) - the activity coefficients are computed at this ionic strength - one for
+                all or one per pH - ignored without an activity model, and None is an ideal solution
+            temperature (float or np.array) - in K - one for all or one per pH - None is 25 C
+            
+        Returns (tuple):
+            mean_charges (np.array) - the mean charge of each species - shape (S, *pH.shape)
+            mean_charge_derivatives (np.array) - d(mean_charges)/d(pH) at a fixed ionic strength - shape (S, *pH.shape)
+        """
+        pH = np.asarray(pH, dtype=float)
+        return self._mean_charges(pH, self._conditions(pH, ionic_strength, temperature))
+    
+    def _mean_charges(self, pH, conditions):
+        terms = self._terms(pH, conditions)
+        
+        # every sum over the forms in one contraction - alpha = terms / total
+        total, charge_sum, slope_sum, charge_slope_sum = np.einsum("ksj,sjp->ksp", self.weights, terms)
+        mean_charges = charge_sum / total
+        
+        # sum(charge * d(alpha)/d(pH)) - see `_fraction_derivatives`
+        mean_charge_derivatives = np.log(10.) * (charge_slope_sum - mean_charges * slope_sum) / total
+        
+        shape = (len(self.conc),) + pH.shape
+        return mean_charges.reshape(shape), mean_charge_derivatives.reshape(shape)
+    
+    # the species axis goes first - see `mean_charges`
+    def _species_first(self, conc, pH):
+        conc = self.conc if conc is None else np.asarray(conc, dtype=float)
+        if conc.ndim > 1:
+            return np.moveaxis(conc, -1, 0)
+        return conc.reshape(conc.shape + (1,) * pH.ndim)
+    
+    def charge_balance(self, pH, conc=None, ionic_strength=None, temperature=None):
+        """
+        Args:
+            pH (float or np.array) - any shape
+            conc (np.array) - concentrations of the species, shape (*pH.shape, S) for one set per pH, or (S,) -
+                `self.conc` if None
+            ionic_strength (float or np.array) - see `mean_charges`
+            temperature (float or np.array) - see `mean_charges`
+            
+        Returns (tuple):
+            diff (np.array) - the signed charge balance, positive charges minus negative charges - shape pH.shape
+            derivative (np.array) - d(diff)/d(pH) at a fixed ionic strength - always negative
+        """
+        pH = np.asarray(pH, dtype=float)
+        conc = self._species_first(conc, pH)
+        
+        conditions = self._conditions(pH, ionic_strength, temperature)
+        h3o, oh = self._water_ions(pH, conditions)
+        mean_charges, mean_charge_derivatives = self._mean_charges(pH, conditions)
+        
+        diff = h3o - oh + (conc * mean_charges).sum(axis=0)
+        derivative = -np.log(10.) * (h3o + oh) + (conc * mean_charge_derivatives).sum(axis=0)
+        
+        return diff, derivative
+    
+    def solution_ionic_strength(self, pH, conc=None, ionic_strength=None, temperature=None):
+        """
+        Args:
+            pH (float or np.array) - any shape
+            conc (np.array) - see `charge_balance`
+            ionic_strength (float or np.array) - the ionic strength the activity coefficients are computed at,
+                see `mean_charges`
+            temperature (float or np.array) - see `mean_charges`
+            
+        Returns (np.array):
+            the ionic strength of the solution, 1/2 * sum(concentration * charge**2) over every form of every
+            species and H3O^+ and OH^- - shape pH.shape
+        """
+        pH = np.asarray(pH, dtype=float)
+        conc = self._species_first(conc, pH)
+        
+        conditions = self._conditions(pH, ionic_strength, temperature)
+        terms = self._terms(pH, conditions)
+        total, squared_charge_sum = np.einsum("ksj,sjp->ksp", np.stack((self.weights[0], self.charge**2)), terms)
+        mean_squared_charges = (squared_charge_sum / total).reshape((len(self.conc),) + pH.shape)
+        
+        h3o, oh = self._water_ions(pH, conditions)
+        return 0.5 * (h3o + oh + (conc * mean_squared_charges).sum(axis=0))
+    
+    def sensitivities(self, pH, conc=None, ionic_strength=None, temperature=None):
+        """
+        The implicit function theorem on the charge balance at its root - d(pH)/d(x) = -(d(diff)/d(x)) / (d(diff)/d(pH)).
+        With an activity model the ionic strength is solved for together with the pH, so it's on the charge balance and
+        on the ionic strength, I = solution_ionic_strength(pH, I), at once - a 2x2 system for every pH.
+        
+        Args:
+            pH (float or np.array) - the solved pH - any shape
+            conc (np.array) - see `charge_balance`
+            ionic_strength (float or np.array) - the solved ionic strength at each pH - see `mean_charges`
+            temperature (float or np.array) - see `mean_charges`
+            
+        Returns (tuple):
+            dpH_dconc (np.array) - d(pH)/d(concentration) of every species - shape (*pH.shape, S)
+            dpH_dpK (np.array) - d(pH)/d(pKa) of the acids and d(pH)/d(pKb) of the bases, in the order of `Ka` and `Kb`
+                of each species - shape (*pH.shape, S, J - 1), nan where a species has no such constant
+        """
+        pH = np.asarray(pH, dtype=float)
+        conc = np.broadcast_to(self._species_first(conc, pH), (len(self.conc),) + pH.shape).reshape(len(self.conc), -1)
+        
+        conditions = self._conditions(pH, ionic_strength, temperature)
+        terms = self._terms(pH, conditions)
+        alpha = terms / terms.sum(axis=1)[:, None]
+        h3o, oh = (ions.reshape(-1) for ions in self._water_ions(pH, conditions))
+        
+        charge = self.charge[:, :, None]
+        squared_charge = charge**2
+        mean_charges = (alpha * charge).sum(axis=1)
+        mean_squared_charges = (alpha * squared_charge).sum(axis=1)
+        
+        # d(mean of x)/d(...) of each species when the log10 terms change with `log_term_derivative`, shape (S, P)
+        def mean_derivative(x, mean_x, log_term_derivative):
+            return np.log(10.) * ((alpha * x * log_term_derivative).sum(axis=1)
+                                  - mean_x * (alpha * log_term_derivative).sum(axis=1))
+        
+        # pK[i] is in the log10 term of every form past the i'th with a factor of -1, so the sums are over the tails
+        def pK_derivative(x, mean_x):
+            tails = np.cumsum((alpha * x)[:, ::-1], axis=1)[:, ::-1][:, 1:]
+            tail_fractions = np.cumsum(alpha[:, ::-1], axis=1)[:, ::-1][:, 1:]
+            return -np.log(10.) * conc[:, None] * (tails - mean_x[:, None] * tail_fractions)
+        
+        # the charge balance - d(diff)/d(pH), d(diff)/d(conc) and d(diff)/d(pK)
+        diff_pH = -np.log(10.) * (h3o + oh) + (conc * mean_derivative(charge, mean_charges, self.slope[:, :, None])).sum(axis=0)
+        diff_conc = mean_charges
+        diff_pK = pK_derivative(charge, mean_charges)
+        
+        if conditions[0] is None:
+            dpH_dconc = -diff_conc / diff_pH
+            dpH_dpK = -diff_pK / diff_pH
+        
+        else:
+            flat_ionic_strength = _flat_per_pH(ionic_strength, pH)
+            
+            # d(log10 activity coefficient)/d(ionic strength) - central differences, since the model is any function
+            step = 1e-4 * flat_ionic_strength
+            log_coefficient_derivatives = (self.activity(flat_ionic_strength + step, self._activity_charges)
+                                           - self.activity(flat_ionic_strength - step, self._activity_charges)) / (2. * step)
+            log_term_derivative = -log_coefficient_derivatives[:-2].reshape(self.charge.shape + (-1,))
+            h3o_derivative = -np.log(10.) * h3o * log_coefficient_derivatives[-2]
+            oh_derivative = -np.log(10.) * oh * log_coefficient_derivatives[-1]
+            
+            diff_ionic_strength = (h3o_derivative - oh_derivative
+                                   + (conc * mean_derivative(charge, mean_charges, log_term_derivative)).sum(axis=0))
+            
+            # the ionic strength equation, I - solution_ionic_strength(pH, I) = 0, and its derivatives
+            ionic_pH = -0.5 * (np.log(10.) * (oh - h3o)
+                               + (conc * mean_derivative(squared_charge, mean_squared_charges, self.slope[:, :, None])).sum(axis=0))
+            ionic_ionic_strength = 1. - 0.5 * (h3o_derivative + oh_derivative
+                                               + (conc * mean_derivative(squared_charge, mean_squared_charges,
+                                                                         log_term_derivative)).sum(axis=0))
+            ionic_conc = -0.5 * mean_squared_charges
+            ionic_pK = -0.5 * pK_derivative(squared_charge, mean_squared_charges)
+            
+            # cramer's rule on [[diff_pH, diff_ionic_strength], [ionic_pH, ionic_ionic_strength]]
+            determinant = diff_pH * ionic_ionic_strength - diff_ionic_strength * ionic_pH
+            dpH_dconc = -(diff_conc * ionic_ionic_strength - diff_ionic_strength * ionic_conc) / determinant
+            dpH_dpK = -(diff_pK * ionic_ionic_strength - diff_ionic_strength * ionic_pK) / determinant
+        
+        dpH_dpK = np.where(self.has_constant[:, :, None], dpH_dpK, np.nan)
+        
+        return (np.moveaxis(dpH_dconc, 0, -1).reshape(pH.shape + (len(self.conc),)),
+                np.moveaxis(dpH_dpK, (0, 1), (-2, -1)).reshape(pH.shape + self.has_constant.shape))
+    
+    def __repr__(self):
+        return f"CompiledSystem: \n\tspecies={len(self.conc)} \n\tforms={self.charge.shape[1]}"
     
     
 class System():
     """
     A list of species (Acid, NonReactive or Base instances) representing the system.
+    
+    The species are compiled into arrays once and reused by every solve - changing the species, e.g. their `conc`, or
+    `Kw` or `activity` compiles them again at the next solve - see `compiled`.
+    
+    Example:
+        >>>s = System([Acid(pKa=4.76, charge=0, conc=0.1), NonReactive(charge=1, conc=0.1)], activity="davies")
+        >>>round(s.pHsolve(), 3), round(s.pHsolution.ionic_strength, 4)
+        (8.773, 0.1)
     """
     
-    def __init__(self, species, Kw=10.**(-14)):
+    def __init__(self, species, Kw=10.**(-14), activity=None, temperature=None):
         """
         Args:
-            Kw (float) - waters ion product constant
+            Kw (float) - waters ion product constant at 25 C
             species - the species that determine the system
+            activity (str or function) - "debye-huckel", "extended-debye-huckel", "davies" or a function of
+                (ionic_strength, charge) returning log10 of the activity coefficient - None for an ideal solution.
+                With an activity model the pH is -log10 of the activity of H3O^+ and the ionic strength is solved for
+                together with it - see `pH.activity`
+            temperature (float) - in K - the equillibrium constants of the species change with their enthalpies and Kw
+                with a correlation, see `pH.temperature` - None is 25 C. It can be changed without compiling again
         """
         self.species = species
         self.Kw = Kw
+        self.activity = activity
+        self.temperature = temperature
+        self._compiled = None
+        self._compiled_fingerprint = None
+    
+    # The values the system is compiled from - see `_species_fingerprint`
+    def _fingerprint(self):
+        return self.Kw, self.activity, tuple(_species_fingerprint(s) for s in self.species)
+    
+    def compile(self):
+        """
+        Returns (CompiledSystem):
+            the species as padded arrays
+        """
+        self._compiled_fingerprint = self._fingerprint()
+        self._compiled = CompiledSystem(self.species, self.Kw, self.activity)
+        return self._compiled
+    
+    # The solves get the compiled species here once, so the fingerprint isn't compared at every charge balance
+    @property
+    def compiled(self):
+        """
+        Returns (CompiledSystem):
+            the compiled species - see `compile` - compiled again if the species, `Kw` or `activity` changed since
+        """
+        if self._compiled is None or self._fingerprint() != self._compiled_fingerprint:
+            return self.compile()
+        return self._compiled
+        
+    def signed_charge_balance(self, pH, ionic_strength=None):
+        """
+        Args: 
+            pH (float or np.array) - the pH(s) at which the charge balance is calculated
+            ionic_strength (float or np.array) - the activity coefficients are computed at this ionic strength - 
+                ignored without an activity model, and None is an ideal solution
         
-    def charge_balance(self, pH):
+        Returns (float or np.array): 
+            the charge balance difference - positive charges minus negative charges - it decreases with the pH
+        """
+        
+        return self.compiled.charge_balance(pH, ionic_strength=ionic_strength, temperature=self.temperature)[0]
+    
+    def charge_balance(self, pH, ionic_strength=None):
         """
         Args: 
             pH (float) - single value
+            ionic_strength (float) - see `signed_charge_balance`
         
         Returns (float): 
             absolute value of the charge balance difference
         """
         
-        pH = np.array([pH], dtype=float)
+        return np.abs(self.signed_charge_balance(pH, ionic_strength))
+    
+    # `signed_charge_balance` with the species compiled at the start of the solve - see `compiled`
+    def _signed_charge_balance(self, pH, ionic_strength=None):
+        return self._compiled.charge_balance(pH, ionic_strength=ionic_strength, temperature=self.temperature)[0]
+    
+    def charge_balance_derivative(self, pH, ionic_strength=None):
+        """
+        Args: 
+            pH (float or np.array) - the pH(s) at which the derivative is calculated
+            ionic_strength (float or np.array) - see `signed_charge_balance`
         
-        h3o = 10.**(-pH)
-        oh = self.Kw/h3o
-        diff = (h3o - oh)
+        Returns (float or np.array): 
+            d(signed_charge_balance)/d(pH) at a fixed ionic strength - always negative
+        """
         
-        for s in self.species:
-            diff += (s.conc * s.charge * s.alpha(pH)).sum()
+        return self.compiled.charge_balance(pH, ionic_strength=ionic_strength, temperature=self.temperature)[1]
+    
+    # Finds a pH interval where the charge balance changes sign - it's monotonic, so there is exactly one root
+    def _bracket(self, lower=PH_BRACKET[0], upper=PH_BRACKET[1], ionic_strength=None):
+        f_lower = float(self._signed_charge_balance(lower, ionic_strength))
+        f_upper = float(self._signed_charge_balance(upper, ionic_strength))
+        nfev = 2
+        
+        while f_lower < 0 and lower > PH_BRACKET_LIMIT[0]:
+            lower, f_lower = lower - 4., float(self._signed_charge_balance(lower - 4., ionic_strength))
+            nfev += 1
+        while f_upper > 0 and upper < PH_BRACKET_LIMIT[1]:
+            upper, f_upper = upper + 4., float(self._signed_charge_balance(upper + 4., ionic_strength))
+            nfev += 1
+        
+        if f_lower < 0 or f_upper > 0:
+            raise ValueError("The charge balance has no root - check the concentrations of the species")
+        
+        return lower, upper, f_lower, f_upper, nfev
+    
+    def _newton_solve(self, guess, tol, maxiter=100, ionic_strength=None, bracket=PH_BRACKET):
+        lower, upper, f_lower, f_upper, nfev = self._bracket(*bracket, ionic_strength)
+        pH = min(max(float(guess), lower), upper)
+        
+        for iteration in range(1, maxiter + 1):
+            f, derivative = self._compiled.charge_balance(pH, ionic_strength=ionic_strength, temperature=self.temperature)
+            f = float(f)
+            nfev += 1
             
-        return np.abs(diff)
+            if f == 0:
+                return pH, iteration, nfev, True
+            
+            # shrink the bracket - the charge balance decreases with the pH
+            if f > 0:
+                lower = pH
+            else:
+                upper = pH
+            
+            step = f / float(derivative)
+            new_pH = pH - step
+            
+            if abs(step) < tol:
+                return new_pH, iteration, nfev, True
+            
+            # fall back to bisection if newton leaves the bracket
+            if not (lower < new_pH < upper):
+                new_pH = 0.5 * (lower + upper)
+            
+            if (upper - lower) < tol:
+                return new_pH, iteration, nfev, True
+            
+            pH = new_pH
+        
+        return pH, maxiter, nfev, False
     
-    def pHsolve(self, guess=7, mehtod="Nelder-Mead", tol=1e-5):
+    def pHsolve(self, guess=7, method="brentq", tol=1e-5):
+        """
+        Args:
+            guess (float) - starting point - only used by the `newton` and `Nelder-Mead` methods
+            method (str) - the solver
+                - "brentq" - Brent's method on the signed charge balance, bracketed on [-2, 16]
+                - "newton" - newton steps with the analytic derivative, safeguarded by bisection on [-2, 16]
+                - "Nelder-Mead" - minimizes the absolute charge balance
+            tol (float) - tolerance of the pH
+            
+        Returns (float):
+            the pH of the system - the solver result, including the number of iterations (`nit`),
+            charge balance evaluations (`nfev`) and derivative evaluations (`njev`), is stored in `self.pHsolution` -
+            with an activity model it also has the `ionic_strength` and the number of ionic strength updates (`ionic_nit`),
+            and `nit`, `nfev` and `njev` are of the last solve - the current values of the species are used, see
+            `compiled`
+        """
         
-        self.pHsolution = spo.minimize(self.charge_balance, guess, method='Nelder-Mead', tol=1e-5)
+        compiled = self.compiled
+        if compiled.activity is None:
+            self.pHsolution = self._pHsolve_at(guess, method, tol)
+        
+        else:
+            # every solve after the first starts from the pH extrapolated from the last two
+            ionic_strength_history = np.full((2, 1), np.nan)
+            pH_history = np.full((2, 1), np.nan)
+            
+            def update(ionic_strength, active):
+                start = _extrapolated_pH(ionic_strength_history, pH_history, ionic_strength)[0]
+                bracket = PH_BRACKET if np.isnan(start) else (start - WARM_PH_BRACKET, start + WARM_PH_BRACKET)
+                
+                self.pHsolution = self._pHsolve_at(guess if np.isnan(start) else start, method, tol, ionic_strength[0], bracket)
+                ionic_strength_history[:, 0] = ionic_strength_history[1, 0], ionic_strength[0]
+                pH_history[:, 0] = pH_history[1, 0], self.pHsolution.x[0]
                 
+                return compiled.solution_ionic_strength(self.pHsolution.x, ionic_strength=ionic_strength,
+                                                        temperature=self.temperature)
+            
+            # a relative error of the ionic strength changes the log10 activity coefficients less than that
+            ionic_strength, nit, converged = ionic_strength_fixed_point(update, 1, tol)
+            self.pHsolution.ionic_strength = ionic_strength[0]
+            self.pHsolution.ionic_nit = nit
+            self.pHsolution.success = bool(self.pHsolution.success and converged[0])
+        
         if len(self.pHsolution.x) == 1:
             self.pH = self.pHsolution.x[0]
             return self.pH
     
+    # One solve with the activity coefficients at a fixed ionic strength - see `pHsolve`
+    def _pHsolve_at(self, guess, method, tol, ionic_strength=None, bracket=PH_BRACKET):
+        if method == "brentq":
+            lower, upper, _, _, nfev = self._bracket(*bracket, ionic_strength)
+            root, result = spo.brentq(self._signed_charge_balance, lower, upper, args=(ionic_strength,), xtol=tol,
+                                      full_output=True)
+            return spo.OptimizeResult(x=np.array([root]), nit=result.iterations, nfev=result.function_calls + nfev,
+                                      success=result.converged, method=method)
+        
+        if method == "newton":
+            root, nit, nfev, success = self._newton_solve(guess, tol, ionic_strength=ionic_strength, bracket=bracket)
+            return spo.OptimizeResult(x=np.array([root]), nit=nit, nfev=nfev, njev=nit, success=success, method=method)
+        
+        if method == "Nelder-Mead":
+            return spo.minimize(lambda pH, ionic_strength: np.abs(self._signed_charge_balance(pH, ionic_strength)), guess,
+                                args=(ionic_strength,), method='Nelder-Mead', tol=tol)
+        
+        raise ValueError(f"Unknown method: {method} - use 'brentq', 'newton' or 'Nelder-Mead'")
+    
+    # The signed charge balance and its derivative for one pH per row of `concentrations`
+    def _many_charge_balances(self, pH, concentrations, ionic_strength=None, temperature=None):
+        return self._compiled.charge_balance(pH, concentrations, ionic_strength, temperature)
+    
+    def solve_many(self, concentrations, guess=7., tol=1e-10, maxiter=100, temperature=None):
+        """
+        Args:
+            concentrations (np.array) - shape (number of scenarios, number of species) - one row per scenario and
+                one column per species in `self.species`
+            guess (float or np.array) - starting point of the newton steps - one for all or one per scenario
+            tol (float) - tolerance of the pH
+            maxiter (int) - maximum number of newton steps
+            temperature (float or np.array) - in K - one for all or one per scenario - `self.temperature` if None
+            
+        Returns (np.array):
+            the pH of each scenario - `nan` where the charge balance has no root - with an activity model the ionic
+            strength of every scenario is iterated together, see `pH.activity.ionic_strength_fixed_point`
+            
+        Example:
+            >>>s = System([Acid(pKa=4.76, charge=0, conc=0.1), NonReactive(charge=1, conc=0.)])
+            >>>s.solve_many(np.array([[0.1, 0.], [0.1, 0.05], [0.1, 0.1]]))
+            array([2.88286254, 4.76030167, 8.88002126])
+        """
+        
+        concentrations = np.asarray(concentrations, dtype=float)
+        if concentrations.ndim != 2 or concentrations.shape[1] != len(self.species):
+            raise ValueError(f"concentrations must have shape (number of scenarios, {len(self.species)})")
+        
+        n = len(concentrations)
+        temperature = self.temperature if temperature is None else temperature
+        if temperature is not None:
+            temperature = np.broadcast_to(np.asarray(temperature, dtype=float), (n,))
+        
+        compiled = self.compiled
+        if compiled.activity is None:
+            return self._solve_many_at(concentrations, guess, tol, maxiter, temperature=temperature)
+        
+        # every solve after the first starts from the pH extrapolated from the last two - scenarios without a root
+        # are nan and drop out
+        guess = np.broadcast_to(np.asarray(guess, dtype=float), (n,))
+        pH = np.full(n, np.nan)
+        ionic_strength_history = np.full((2, n), np.nan)
+        pH_history = np.full((2, n), np.nan)
+        
+        def update(ionic_strength, active):
+            start = _extrapolated_pH(ionic_strength_history[:, active], pH_history[:, active], ionic_strength)
+            
+            # the first solve has no pH to start from - the later ones start next to the root, so they skip the bracket
+            # search and build the bracket up from the newton steps, and a scenario without a root stays without one
+            if np.isnan(start).all():
+                pH[active] = self._solve_many_at(concentrations[active], guess[active], tol, maxiter, ionic_strength,
+                                                 _rows(temperature, active))
+            else:
+                pH[active] = self._newton_many(concentrations[active], start, np.full(len(active), -np.inf),
+                                               np.full(len(active), np.inf), tol, maxiter, ionic_strength,
+                                               _rows(temperature, active), MAX_WARM_PH_STEP)
+            
+            ionic_strength_history[:, active] = ionic_strength_history[1, active], ionic_strength
+            pH_history[:, active] = pH_history[1, active], pH[active]
+            
+            return compiled.solution_ionic_strength(pH[active], concentrations[active], ionic_strength,
+                                                    _rows(temperature, active))
+        
+        # a relative error of the ionic strength changes the log10 activity coefficients less than that
+        ionic_strength_fixed_point(update, n, tol)
+        
+        return pH
+    
+    def solve_temperatures(self, temperatures, guess=7., tol=1e-10, maxiter=100):
+        """
+        Args:
+            temperatures (float or np.array) - in K - any shape
+            guess (float or np.array) - see `solve_many`
+            tol (float) - tolerance of the pH
+            maxiter (int) - maximum number of newton steps
+            
+        Returns (np.array):
+            the pH of the system at each temperature, in one vectorized solve - shape temperatures.shape
+            
+        Example:
+            >>>water = System([NonReactive(charge=1, conc=0.)])
+            >>>water.solve_temperatures(np.array([278.15, 298.15, 363.15]))
+            array([7.36852543, 7.        , 6.21240772])
+        """
+        temperatures = np.asarray(temperatures, dtype=float)
+        concentrations = np.broadcast_to(self.compiled.conc, (temperatures.size, len(self.species)))
+        
+        pH = self.solve_many(concentrations, guess, tol, maxiter, temperatures.reshape(-1))
+        return pH.reshape(temperatures.shape)
+    
+    def sensitivities(self, pH=None, concentrations=None, temperature=None):
+        """
+        Analytic sensitivities at the solved pH of every scenario, from the implicit function theorem on the charge
+        balance - no solves beyond the one for the pH - see `CompiledSystem.sensitivities`
+        
+        Args:
+            pH (float or np.array) - the solved pH of each scenario - solved with `solve_many` if None
+            concentrations (np.array) - shape (number of scenarios, number of species) - see `solve_many` - the
+                concentrations of `self.species` as a single scenario if None
+            temperature (float or np.array) - see `solve_many`
+            
+        Returns (tuple):
+            dpH_dconc (np.array) - d(pH)/d(concentration) of every species - shape (number of scenarios, S)
+            dpH_dpK (np.array) - d(pH)/d(pKa) of the acids and d(pH)/d(pKb) of the bases, in the order of `Ka` and `Kb`
+                of each species (largest constant first) - shape (number of scenarios, S, most constants of a species),
+                nan where a species has fewer constants
+            
+        Example:
+            >>>s = System([Acid(pKa=4.76, charge=0, conc=0.1), NonReactive(charge=1, conc=0.05)])
+            >>>dpH_dconc, dpH_dpK = s.sensitivities()
+            >>>dpH_dconc.round(2)
+            array([[-8.68, 17.36]])
+            >>>dpH_dpK[..., 0].round(3)
+            array([[0.999,   nan]])
+        """
+        compiled = self.compiled
+        concentrations = compiled.conc[None] if concentrations is None else np.asarray(concentrations, dtype=float)
+        if concentrations.ndim != 2 or concentrations.shape[1] != len(self.species):
+            raise ValueError(f"concentrations must have shape (number of scenarios, {len(self.species)})")
+        
+        n = len(concentrations)
+        temperature = self.temperature if temperature is None else temperature
+        if temperature is not None:
+            temperature = np.broadcast_to(np.asarray(temperature, dtype=float), (n,))
+        
+        pH = self.solve_many(concentrations, temperature=temperature) if pH is None else pH
+        pH = np.broadcast_to(np.asarray(pH, dtype=float), (n,))
+        
+        # the ionic strength the pH was solved at - the fixed point at the solved pH
+        ionic_strength = None
+        if compiled.activity is not None:
+            ionic_strength = ionic_strength_fixed_point(
+                lambda ionic_strength, active: compiled.solution_ionic_strength(pH[active], concentrations[active],
+                                                                                ionic_strength, _rows(temperature, active)),
+                n)[0]
+        
+        return compiled.sensitivities(pH, concentrations, ionic_strength, temperature)
+    
+    # `solve_many` with the activity coefficients of each scenario at a fixed ionic strength
+    def _solve_many_at(self, concentrations, guess, tol, maxiter, ionic_strength=None, temperature=None):
+        n = len(concentrations)
+        
+        # a bracket for every scenario - the charge balance decreases with the pH
+        lower = np.full(n, PH_BRACKET[0])
+        upper = np.full(n, PH_BRACKET[1])
+        f_lower, _ = self._many_charge_balances(lower, concentrations, ionic_strength, temperature)
+        f_upper, _ = self._many_charge_balances(upper, concentrations, ionic_strength, temperature)
+        
+        while True:
+            widen_lower = (f_lower < 0) & (lower > PH_BRACKET_LIMIT[0])
+            widen_upper = (f_upper > 0) & (upper < PH_BRACKET_LIMIT[1])
+            if not (widen_lower.any() or widen_upper.any()):
+                break
+            
+            lower[widen_lower] -= 4.
+            upper[widen_upper] += 4.
+            f_lower[widen_lower], _ = self._many_charge_balances(lower[widen_lower], concentrations[widen_lower],
+                                                                 _rows(ionic_strength, widen_lower),
+                                                                 _rows(temperature, widen_lower))
+            f_upper[widen_upper], _ = self._many_charge_balances(upper[widen_upper], concentrations[widen_upper],
+                                                                 _rows(ionic_strength, widen_upper),
+                                                                 _rows(temperature, widen_upper))
+        
+        is_bracketed = (f_lower >= 0) & (f_upper <= 0)
+        
+        pH = np.clip(np.broadcast_to(np.asarray(guess, dtype=float), (n,)), lower, upper)
+        pH[~is_bracketed] = np.nan
+        
+        return self._newton_many(concentrations, pH, lower, upper, tol, maxiter, ionic_strength, temperature)
+    
+    # Newton steps, safeguarded by bisection once the root is bracketed - only on the scenarios that haven't converged,
+    # and the nan pH are left as they are. The current pH is always one end of the bracket, so a step can only leave it
+    # through the other end when that end is finite
+    def _newton_many(self, concentrations, pH, lower, upper, tol, maxiter, ionic_strength=None, temperature=None,
+                     max_step=None):
+        # a default of np.inf would load numpy when the module is imported
+        max_step = np.inf if max_step is None else max_step
+        active = np.nonzero(~np.isnan(pH))[0]
+        
+        for _ in range(maxiter):
+            if len(active) == 0:
+                break
+            
+            current_pH = pH[active]
+            f, derivative = self._many_charge_balances(current_pH, concentrations[active], _rows(ionic_strength, active),
+                                                       _rows(temperature, active))
+            
+            lower[active] = np.where(f > 0, current_pH, lower[active])
+            upper[active] = np.where(f < 0, current_pH, upper[active])
+            
+            step = np.clip(f / derivative, -max_step, max_step)
+            new_pH = current_pH - step
+            converged = (np.abs(step) < tol) | (f == 0)
+            
+            outside = ~((lower[active] < new_pH) & (new_pH < upper[active]))
+            with np.errstate(invalid="ignore"):
+                new_pH = np.where(outside & ~converged, 0.5 * (lower[active] + upper[active]), new_pH)
+            converged |= (upper[active] - lower[active]) < tol
+            
+            pH[active] = new_pH
+            active = active[~converged]
+        
+        return pH
+    
     def __repr__(self):
         representation_str = ""
         for s in self.species:
@@ -1,8 +1,27 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from pH.pH_calculator import System
+from utils.import_utils import lazy_import
+from pH.pH_titration import titration_curve
+from utils.plotter_utils import figure_and_axes, finish_figure
 
-def bjerrum_plotter(reactant, start_pH=0, end_pH=14, show=True):
+np = lazy_import("numpy")
+
+def bjerrum_data(reactant, start_pH=0, end_pH=14, n_points=1000):
+    """
+    Args: 
+        reactant (Acid, Base or Neutral) - a single reactant
+        start_pH (int) - starting point for the numerical calculations
+        end_pH (int) - ending point for the numerical calculation
+        n_points (int) - number of pH values
+        
+    Returns (tuple):
+        pH_list (np.array) - the pH values
+        alpha_list (np.array) - the fraction of each species at each pH - shape (number of species, n_points)
+    """
+    
+    pH_list = np.linspace(start_pH, end_pH, n_points)
+    
+    return pH_list, reactant.alpha(pH_list)
+
+def bjerrum_plotter(reactant, start_pH=0, end_pH=14, show=True, ax=None, fmt=None, return_figure=False):
     """
     Args: 
         reactant (Acid, Base or Neutral) - a single reactant
@@ -10,64 +29,49 @@ def bjerrum_plotter(reactant, start_pH=0, end_pH=14, show=True):
         end_pH (int) - ending point for the numerical calculation
         show (bool) - whether to do plt.show() immediately
             - default = `True`
+            - if `False` the plot is left on the current pyplot figure, so more can be drawn on it before plt.show()
+        ax (matplotlib.axes.Axes) - plot on these axes instead
+        fmt (str) - render the plot to bytes in this format, e.g. "png" or "svg", and return them
+        return_figure (bool) - return the figure without using pyplot
         
     Returns:
-        Bjerrum plot of reactant
+        Bjerrum plot of reactant - see `finish_figure`
         
     Example:
         >>>bjerrum_plotter_func(Acid(pKa=[2.148, 7.198, 12.375], charge=0, conc=1.e-3))
         **a bjerrum plot**
+        >>>bjerrum_plotter(Acid(pKa=[2.148, 7.198, 12.375], charge=0, conc=1.e-3), fmt="svg")[:5]
+        b'<?xml'
     """
     
-    pH_list = np.linspace(start_pH, end_pH, 1000)
-
-    alpha_list = []
-
-    for pH in pH_list:
-        alpha_list.append(reactant.alpha(pH))
-
-    alpha_list = np.array(alpha_list)
+    pH_list, alpha_list = bjerrum_data(reactant, start_pH, end_pH)
 
-    for i in range(len(alpha_list[0])):
-        plt.plot(pH_list, alpha_list[:,i])
+    figure, ax = figure_and_axes(ax, fmt, return_figure=return_figure)
+    for alpha in alpha_list:
+        ax.plot(pH_list, alpha)
         
-    if show:
-        plt.show()
+    return finish_figure(figure, show, fmt, return_figure=return_figure)
 
-# Note - this function is pretty slow, but could be optimized quite a lot by adding guess_est as an argument to the system function
-# just like it is done in the official github implementation `PHCALC`
-def titration_curve_plotter(analyte_system_list, titrant_system_list, titrant_end_conc, titrant_start_conc=0., show=True):
+def titration_curve_plotter(analyte_system_list, titrant_system_list, titrant_end_conc, titrant_start_conc=0., show=True,
+                            ax=None, fmt=None, return_figure=False):
     """
     Args: 
         analyte_system_list (list) - list of analytes
         titrant_system_list (list) - list of titrants
         titrant_end_conc (float) - the final concentration of the titrant
         titrant_start_conc (float) - the initial concentration of the titrant
-        show (bool) - whether to do plt.show() immediately
+        show (bool) - whether to do plt.show() immediately - if `False` the plot is left on the current pyplot figure
+        ax (matplotlib.axes.Axes) - plot on these axes instead
+        fmt (str) - render the plot to bytes in this format, e.g. "png" or "svg", and return them
+        return_figure (bool) - return the figure without using pyplot
         
     Returns:
-        Titration curve of the described titration
+        Titration curve of the described titration - see `finish_figure` - the curve itself is calculated by `titration_curve`
     """
     
-    titrant_concs = np.linspace(titrant_start_conc, titrant_end_conc, 1000)
-
-    # pH-list
-    phs = []
-
-    for conc in titrant_concs:
-        # create the titrant
-        titrant_list = []
-        for titrant in titrant_system_list:
-            titrant.conc = conc
-            titrant_list.append(titrant)
-
-        # Define the system and solve for the pH
-        s = System(analyte_system_list + titrant_list)
-        s.pHsolve()
-        phs.append(s.pH)
-    plt.plot(titrant_concs, phs)
-    if show:
-        plt.show()
+    titrant_concs, phs = titration_curve(analyte_system_list, titrant_system_list, titrant_end_conc, titrant_start_conc)
     
+    figure, ax = figure_and_axes(ax, fmt, return_figure=return_figure)
+    ax.plot(titrant_concs, phs)
     
-    
\ No newline at end of file
+    return finish_figure(figure, show, fmt, return_figure=return_figure)
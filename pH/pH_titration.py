@@ -0,0 +1,69 @@
+from utils.import_utils import lazy_import
+from pH.pH_calculator import System
+
+np = lazy_import("numpy")
+
+# the titrant concentrations are refined until no step in the pH is larger than this
+MAX_PH_STEP = 0.05
+
+def titration_curve(analyte_system_list, titrant_system_list, titrant_end_conc, titrant_start_conc=0., n_points=200,
+                    max_pH_step=MAX_PH_STEP, max_points=5000, tol=1e-10, activity=None,
+                    temperature=None):
+    """
+    Args: 
+        analyte_system_list (list) - list of analytes
+        titrant_system_list (list) - list of titrants - every titrant gets the same concentration at each point
+        titrant_end_conc (float) - the final concentration of the titrant
+        titrant_start_conc (float) - the initial concentration of the titrant - may be larger than `titrant_end_conc`
+            for a back-titration
+        n_points (int) - number of evenly spaced titrant concentrations the curve starts from - they're solved in one
+            batch from pH 7, not warm-started, since seeding them from their neighbours takes a second batch that costs
+            more than the newton steps it saves
+        max_pH_step (float) - points are added between neighbours whose pH differ by more than this,
+            so the curve gets its resolution near the equivalence points - each starts from its neighbours' mean pH
+        max_points (int) - the refinement stops at this number of points
+        tol (float) - tolerance of the pH
+        activity (str or function) - the activity model - see `System`
+        temperature (float) - in K - see `System`
+        
+    Returns (tuple):
+        titrant_concs (np.array) - the titrant concentrations in order from `titrant_start_conc` to `titrant_end_conc`
+        pHs (np.array) - the pH at each titrant concentration
+        
+    Example:
+        >>>titrant_concs, pHs = titration_curve([Acid(pKa=4.76, charge=0, conc=0.1)], [NonReactive(charge=1, conc=0.)], 0.2)
+        >>>pHs[0], pHs[-1]
+        (2.8828625361350446, 13.000000002499538)
+    """
+    
+    system = System(analyte_system_list + titrant_system_list, activity=activity, temperature=temperature)
+    
+    # the analytes keep their concentration - only the titrant columns change
+    analyte_concs = np.array([np.asarray(s.conc, dtype=float) for s in analyte_system_list], dtype=float)
+    
+    def concentrations(titrant_concs):
+        return np.concatenate((np.broadcast_to(analyte_concs, (len(titrant_concs), len(analyte_concs))),
+                               np.repeat(titrant_concs[:, None], len(titrant_system_list), axis=1)), axis=1)
+    
+    # the evenly spaced points are solved cold - see `n_points`
+    titrant_concs = np.linspace(titrant_start_conc, titrant_end_conc, n_points)
+    pHs = system.solve_many(concentrations(titrant_concs), tol=tol)
+    
+    # the smallest interval that is still split
+    min_spacing = abs(titrant_end_conc - titrant_start_conc) * 1e-12
+    
+    # adaptive refinement - every new point is warm-started from the solution of its neighbours
+    while len(titrant_concs) < max_points:
+        is_jump = (np.abs(np.diff(pHs)) > max_pH_step) & (np.abs(np.diff(titrant_concs)) > min_spacing)
+        jumps = np.nonzero(is_jump)[0][:max_points - len(titrant_concs)]
+        if len(jumps) == 0:
+            break
+        
+        new_concs = 0.5 * (titrant_concs[jumps] + titrant_concs[jumps + 1])
+        guess = 0.5 * (pHs[jumps] + pHs[jumps + 1])
+        new_pHs = system.solve_many(concentrations(new_concs), guess=guess, tol=tol)
+        
+        titrant_concs = np.insert(titrant_concs, jumps + 1, new_concs)
+        pHs = np.insert(pHs, jumps + 1, new_pHs)
+    
+    return titrant_concs, pHs
@@ -0,0 +1,303 @@
+#### Speciation - the mass balances of the components and the charge balance, solved together ####
+from utils.import_utils import lazy_import
+from pH.pH_calculator import Acid, Base, NonReactive
+
+np = lazy_import("numpy")
+spo = lazy_import("scipy.optimize")
+
+
+# name of the proton component - complexes use it for protonated (positive) and hydroxo (negative) species
+PROTON = "H^+"
+HYDROXIDE = "OH^-"
+
+# a newton step changes no free concentration by more than this many powers of 10
+MAX_LOG_STEP = 2.
+# the line search halves the step at most this many times
+MAX_LINE_SEARCH_HALVINGS = 30
+# log10 of the species concentrations are capped here, so a bad trial step can't overflow
+MAX_LOG_CONCENTRATION = 300.
+# the positive continued fraction sweeps stop when every balance is within this many powers of 10
+PCF_TOLERANCE = 1.
+PCF_MAX_SWEEPS = 50
+
+
+class Component():
+    """
+    A component whose total concentration is known, e.g. Cu^2+ or NH3 in a plating bath.
+
+    Args:
+        charge (int) - the charge of the free component
+        total (float) - the total concentration of the component in all the species it is part of
+    """
+    def __init__(self, charge, total):
+        self.charge = float(charge)
+        self.total = float(total)
+
+    def __repr__(self):
+        return f"Component: \n\tcharge={self.charge} \n\ttotal concentration={self.total}"
+
+
+class Complex():
+    """
+    A species formed from the free components - e.g. Cu(NH3)4^2+ is `Complex({"Cu": 1, "NH3": 4}, 13.0)`
+
+    Args:
+        stoichiometry (dict) - {component name: number of that component in the complex} - protons are `PROTON`,
+            with a negative number for hydroxo complexes, e.g. CuOH^+ is {"Cu": 1, PROTON: -1}
+        log_beta (float) - log10 of the overall formation constant from the free components
+    """
+    def __init__(self, stoichiometry, log_beta):
+        self.stoichiometry = dict(stoichiometry)
+        self.log_beta = float(log_beta)
+
+    def __repr__(self):
+        return f"Complex: \n\tstoichiometry={self.stoichiometry} \n\tlog_beta={self.log_beta}"
+
+
+# The protonated forms of an acid or base as (number of protons, log_beta, charge) - formed from the component
+def _protonated_forms(s):
+    if isinstance(s, Acid):
+        # the component is the fully deprotonated form - see `Acid.alpha`
+        n = len(s.Ka)
+        return [(p, s.log_cumulative_Ka[n - p] - s.log_cumulative_Ka[n], s.charge[n - p]) for p in range(1, n + 1)]
+
+    # the component is the form the base is added in - see `Base.alpha`
+    n = len(s.Kb)
+    return [(m, s.log_cumulative_Kb[m] - m * np.log10(s.Kw), s.charge[m]) for m in range(1, n + 1)]
+
+
+# Positive continued fraction (Carrayrou et al. 2002) - every free concentration is changed in turn until its own
+# balance holds, sum(positive terms) = sum(negative terms), which gets close to the solution from far away
+# where newton only moves about 0.4 powers of 10 a step
+def _positive_continued_fraction(x, log_beta, stoichiometry, totals):
+    x = x.copy()
+    log_concentrations = log_beta + stoichiometry @ x
+    
+    # only the species a component is part of change with it - the sums of the positive and negative terms and their
+    # derivatives are one product with these weights
+    columns = []
+    for k in range(len(x)):
+        species = np.nonzero(stoichiometry[:, k])[0]
+        coefficients = stoichiometry[species, k]
+        positive, negative = np.maximum(coefficients, 0.), np.maximum(-coefficients, 0.)
+        weights = np.array([positive, negative, positive * coefficients, negative * coefficients])
+        columns.append((species, coefficients, weights, max(-totals[k], 0.), max(totals[k], 0.)))
+    
+    for _ in range(PCF_MAX_SWEEPS):
+        largest_error = 0.
+        
+        for k, (species, coefficients, weights, positive_total, negative_total) in enumerate(columns):
+            concentrations = 10.**np.minimum(log_concentrations[species], MAX_LOG_CONCENTRATION)
+            positive, negative, positive_slope, negative_slope = (weights @ concentrations).tolist()
+            positive += positive_total
+            negative += negative_total
+            
+            error = np.log10(positive / negative)
+            largest_error = max(largest_error, abs(error))
+            
+            # one newton step on log10(positive / negative), which increases with x[k]
+            change = -error / (positive_slope / positive - negative_slope / negative)
+            
+            x[k] += change
+            log_concentrations[species] += coefficients * change
+        
+        if largest_error < PCF_TOLERANCE:
+            break
+    
+    return x
+
+
+class Speciation():
+    """
+    Components with known totals and the complexes they form - every species concentration follows from the free
+    concentrations of the components, log10[species] = log_beta + sum(stoichiometry * log10[free component]),
+    which are found from the mass balance of every component and the charge balance for the protons.
+
+    Args:
+        components (dict) - {name: Component, Acid, Base or NonReactive}
+            - an Acid is a component in its fully deprotonated form, with the protonated forms "H{p}{name}" added
+            - a Base is a component in the form it's added in, with the protonated forms "{name}H{m}" added
+            - NonReactive ions, like Na^+ from a salt, only take part in the charge balance
+        complexes (dict) - {name: Complex}
+        Kw (float) - waters ion product constant
+
+    Example:
+        >>>bath = Speciation({"Cu": Component(charge=2, total=0.01), "NH3": Base(pKb=4.75, charge=0, conc=0.1),
+        ...                   "SO4": NonReactive(charge=-2, conc=0.01)},
+        ...                  {"CuNH3": Complex({"Cu": 1, "NH3": 1}, 4.04), "Cu(NH3)2": Complex({"Cu": 1, "NH3": 2}, 7.47),
+        ...                   "Cu(NH3)3": Complex({"Cu": 1, "NH3": 3}, 10.27), "Cu(NH3)4": Complex({"Cu": 1, "NH3": 4}, 11.75)})
+        >>>round(bath.solve().pH, 2)
+        11.02
+    """
+    def __init__(self, components, complexes=None, Kw=10.**(-14)):
+        complexes = complexes or {}
+        self.Kw = Kw
+
+        names = [name for name, s in components.items() if not isinstance(s, NonReactive)]
+        if PROTON in names:
+            raise ValueError(f"{PROTON} is always a component - it can't be given")
+        self.component_names = names + [PROTON]
+        self.totals = np.array([float(np.asarray(components[name].total if isinstance(components[name], Component)
+                                                 else components[name].conc, dtype=float)) for name in names])
+
+        column = {name: i for i, name in enumerate(self.component_names)}
+        proton = column[PROTON]
+
+        # the tableau - one row for every species, free components first
+        species_names = []
+        rows = []
+        log_betas = []
+        charges = []
+
+        def add_species(name, stoichiometry, log_beta, charge):
+            row = np.zeros(len(self.component_names))
+            for component, coefficient in stoichiometry.items():
+                if component not in column:
+                    raise ValueError(f"{name} is made of {component}, which is not a component")
+                if coefficient < 0 and component != PROTON:
+                    raise ValueError(f"{name} has a negative number of {component} - only {PROTON} can be negative")
+                row[column[component]] += coefficient
+            species_names.append(name)
+            rows.append(row)
+            log_betas.append(log_beta)
+            charges.append(charge)
+
+        component_charges = {PROTON: 1.}
+        for name in names:
+            s = components[name]
+            charge = s.charge if isinstance(s, Component) else (s.charge[-1] if isinstance(s, Acid) else s.charge[0])
+            component_charges[name] = float(charge)
+            add_species(name, {name: 1}, 0., charge)
+
+        add_species(PROTON, {PROTON: 1}, 0., 1.)
+        add_species(HYDROXIDE, {PROTON: -1}, np.log10(Kw), -1.)
+
+        for name in names:
+            s = components[name]
+            if isinstance(s, Acid):
+                for p, log_beta, charge in _protonated_forms(s):
+                    add_species(f"H{p if p > 1 else ''}{name}", {name: 1, PROTON: p}, log_beta, charge)
+            elif isinstance(s, Base):
+                for m, log_beta, charge in _protonated_forms(s):
+                    add_species(f"{name}H{m if m > 1 else ''}", {name: 1, PROTON: m}, log_beta, charge)
+
+        for name, c in complexes.items():
+            charge = sum(component_charges.get(component, 0.) * coefficient for component, coefficient in c.stoichiometry.items())
+            add_species(name, c.stoichiometry, c.log_beta, charge)
+
+        self.species_names = species_names
+        self.stoichiometry = np.array(rows)
+        self.log_beta = np.array(log_betas, dtype=float)
+        self.charge = np.array(charges, dtype=float)
+        self._proton = proton
+
+        nonreactive = [s for s in components.values() if isinstance(s, NonReactive)]
+        self.fixed_charge = sum(float(s.conc * s.charge) for s in nonreactive)
+        
+        # every species charge is the sum of its component charges, so once every other mass balance holds the charge
+        # balance is a mass balance of the protons with this total
+        self.proton_total = -self.fixed_charge - sum(component_charges[name] * total for name, total in zip(names, self.totals))
+
+    def solve(self, pH=None, guess=None, tol=1e-10, maxiter=200):
+        """
+        Args:
+            pH (float) - if given the pH is fixed, e.g. a buffered bath, and the charge balance isn't used
+            guess (dict) - {component name: log10 of the free concentration} to start from - the totals and pH 7 by default
+            tol (float) - the largest relative error allowed in the mass and charge balances
+            maxiter (int) - maximum number of newton steps
+
+        Returns (OptimizeResult):
+            pH - the pH of the system
+            free - {component name: free concentration}
+            concentrations - {species name: concentration} for every species, including the free components
+            x - log10 of the free concentration of every component, in the order of `component_names`
+            fun - the error of each mass balance, relative to the sum of the concentrations in it - the protons'
+                balance is the charge balance - nit - newton steps, success - if every error is within `tol`
+        """
+        A = self.stoichiometry
+        totals = np.append(self.totals, self.proton_total)
+
+        # a component with a total of 0 has no species - the protons are always there
+        present = np.append(self.totals > 0, True)
+        is_species_present = ~(A[:, ~present] != 0).any(axis=1)
+
+        # the unknowns are the log10 free concentrations of the present components and the protons, unless the pH is fixed
+        unknown = present.copy()
+        if pH is not None:
+            unknown[self._proton] = False
+
+        x_all = np.full(len(totals), -np.inf)
+        x_all[present] = np.log10(np.where(totals > 0, totals, 1.))[present]
+        x_all[self._proton] = -7. if pH is None else -pH
+        for name, value in (guess or {}).items():
+            x_all[self.component_names.index(name)] = value
+        x_all[~present] = -np.inf
+
+        A_present = A[is_species_present]
+        A_unknown = A_present[:, unknown]
+        known = ~unknown & present
+        log_beta = self.log_beta[is_species_present] + A_present[:, known] @ x_all[known]
+        totals = totals[unknown]
+
+        def species_concentrations(x):
+            return 10.**np.minimum(log_beta + A_unknown @ x, MAX_LOG_CONCENTRATION)
+
+        # the mass balances are the gradient of this strictly convex function, so newton with a line search on it
+        # can't get stuck - sum(concentrations)/ln(10) - sum(totals * x)
+        def objective(x, concentrations):
+            return concentrations.sum() / np.log(10.) - totals @ x
+
+        x = _positive_continued_fraction(x_all[unknown], log_beta, A_unknown, totals)
+        concentrations = species_concentrations(x)
+
+        iteration = 0
+        for iteration in range(1, maxiter + 1):
+            gradient = A_unknown.T @ concentrations - totals
+            relative_errors = gradient / (np.abs(A_unknown).T @ concentrations)
+            if len(x) == 0 or np.abs(relative_errors).max() < tol:
+                break
+
+            # the jacobian of the mass balances - ln(10) * sum(stoichiometry * stoichiometry * concentration),
+            # scaled by its diagonal since the concentrations span many powers of 10
+            hessian = np.log(10.) * A_unknown.T @ (concentrations[:, None] * A_unknown)
+            scale = 1. / np.sqrt(np.diag(hessian))
+            try:
+                step = -scale * np.linalg.solve(hessian * scale[:, None] * scale, gradient * scale)
+            except np.linalg.LinAlgError:
+                step = -scale * np.linalg.lstsq(hessian * scale[:, None] * scale, gradient * scale, rcond=None)[0]
+
+            largest = np.abs(step).max()
+            if largest > MAX_LOG_STEP:
+                step *= MAX_LOG_STEP / largest
+
+            # backtracking line search - armijo condition on the objective, or, close to the solution where the
+            # objective changes less than its rounding error, a smaller error in the balances
+            value = objective(x, concentrations)
+            slope = gradient @ step
+            largest_error = np.abs(relative_errors).max()
+            t = 1.
+            for _ in range(MAX_LINE_SEARCH_HALVINGS):
+                trial_concentrations = species_concentrations(x + t * step)
+                if objective(x + t * step, trial_concentrations) <= value + 1e-4 * t * slope:
+                    break
+                trial_errors = (A_unknown.T @ trial_concentrations - totals) / (np.abs(A_unknown).T @ trial_concentrations)
+                if largest_error < 1e-3 and np.abs(trial_errors).max() < largest_error:
+                    break
+                t *= 0.5
+
+            x = x + t * step
+            concentrations = trial_concentrations
+
+        x_all[unknown] = x
+        all_concentrations = np.zeros(len(self.species_names))
+        all_concentrations[is_species_present] = concentrations
+
+        success = len(x) == 0 or bool(np.abs(relative_errors).max() < tol)
+        self.solution = spo.OptimizeResult(x=x_all, fun=relative_errors, nit=iteration, success=success,
+                                           pH=-x_all[self._proton],
+                                           free=dict(zip(self.component_names, 10.**x_all)),
+                                           concentrations=dict(zip(self.species_names, all_concentrations)))
+        return self.solution
+
+    def __repr__(self):
+        return f"Speciation: \n\tcomponents={self.component_names} \n\tspecies={len(self.species_names)}"
@@ -0,0 +1,55 @@
+#### Temperature dependence of the equillibrium constants - van't Hoff for the species and a correlation for Kw ####
+from utils.import_utils import lazy_import
+
+np = lazy_import("numpy")
+
+
+# the equillibrium constants of the species and Kw are given at this temperature - 25 C in K
+REFERENCE_TEMPERATURE = 298.15
+# in J/(mol K)
+GAS_CONSTANT = 8.314462618
+
+
+def water_pKw(temperature):
+    """
+    The Harned-Owen correlation, pKw = 4470.99/T - 6.0875 + 0.01706*T - within 0.01 of the measured values from 0 to 100 C
+
+    Args:
+        temperature (float or np.array) - in K
+
+    Returns (float or np.array):
+        -log10 of waters ion product constant
+
+    Example:
+        >>>round(water_pKw(298.15), 2), round(water_pKw(363.15), 2)
+        (13.99, 12.42)
+    """
+    return 4470.99 / temperature - 6.0875 + 0.01706 * temperature
+
+# Kw is scaled with the correlation, so a Kw given at 25 C stays exactly that at 25 C
+def log10_Kw_change(temperature):
+    """
+    Args:
+        temperature (float or np.array) - in K
+
+    Returns (float or np.array):
+        log10(Kw(temperature)) - log10(Kw(25 C)) - see `water_pKw`
+    """
+    return water_pKw(REFERENCE_TEMPERATURE) - water_pKw(temperature)
+
+def van_t_hoff_log10_change(dH, temperature):
+    """
+    The van't Hoff equation, assuming the enthalpy doesn't change with the temperature
+
+    Args:
+        dH (float or np.array) - the standard reaction enthalpy in J/mol
+        temperature (float or np.array) - in K
+
+    Returns (float or np.array):
+        log10(K(temperature)) - log10(K(25 C))
+
+    Example:
+        >>>round(van_t_hoff_log10_change(-500., 363.15), 4) # acetic acid
+        -0.0157
+    """
+    return -dH / (GAS_CONSTANT * np.log(10.)) * (1. / temperature - 1. / REFERENCE_TEMPERATURE)
@@ -0,0 +1,240 @@
+# Balances a stream of reactions from a JSONL, CSV or text file across worker processes
+#
+# Usage (from the root of the repository):
+#     python -m stoichiometry reactions.jsonl -o balanced.jsonl
+#     python -m stoichiometry reactions.csv --field equation --workers 64 --chunk-size 512 --unordered
+#     cat reactions.txt | python -m stoichiometry - --format text --solution 3
+#
+# Every input reaction gives one output line, {"index": 0, "reaction": "h2+o2=h2o", "balanced": "2H2 + O2 => 2H2O"},
+# or {"index": 1, "reaction": "a+b", "error": "ValueError: ..."} if it can't be balanced
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+from stoichiometry.balancer import ZERO_COEFFICIENT_ERROR, balance_reactions
+
+INPUT_FORMATS = ("jsonl", "csv", "text")
+
+# a JSONL line is a reaction string or an object with the reaction under `field`
+def _read_record(record, record_format, field):
+    if record_format != "jsonl":
+        return record
+
+    record = json.loads(record)
+    if isinstance(record, dict):
+        record = record[field]
+    if not isinstance(record, str):
+        raise TypeError(f"Expected a reaction string, got {type(record).__name__}")
+    return record
+
+# The reaction column of the CSV rows
+def _csv_records(reader, column):
+    for row in reader:
+        if len(row) == 0:
+            continue
+        yield row[column] if column < len(row) else None
+
+# The non-empty lines
+def _line_records(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield line
+
+# Reads the records lazily - JSONL lines are only decoded in the workers, so the reading process stays cheap
+def read_records(file, record_format, field="reaction"):
+    """
+    Args:
+        file (file) - open text file
+        record_format (str) - "jsonl", "csv" or "text" - see `INPUT_FORMATS`
+        field (str) - the JSONL key or CSV column holding the reaction
+
+    Returns (generator):
+        raw JSONL lines, or the reactions of CSV rows and text lines - None for a CSV row without the column - the
+        CSV header is read right away, and a ValueError is raised here if it has no column `field`
+    """
+    if record_format == "csv":
+        reader = csv.reader(file)
+        header = next(reader, [])
+        if field not in header:
+            raise ValueError(f"The CSV header has no column named {field}: {header}")
+        return _csv_records(reader, header.index(field))
+
+    return _line_records(file)
+
+# Runs in the worker processes - the output lines are encoded there as well
+def _balance_chunk(start, records, record_format, field, reaction_solution, exact):
+    reactions = []
+    errors = {}
+    for i, record in enumerate(records):
+        try:
+            if record is None:
+                raise KeyError(field)
+            reactions += [_read_record(record, record_format, field)]
+        except Exception as error:
+            errors[i] = error
+            reactions += [""]
+
+    lines = []
+    number_of_errors = 0
+    for i, (reaction, balanced) in enumerate(zip(reactions, balance_reactions(reactions, reaction_solution,
+                                                                               max(len(reactions), 1), exact))):
+        output = {"index": start + i, "reaction": reaction if i not in errors else records[i]}
+
+        # the zero coefficient error is yielded as a string
+        if balanced == ZERO_COEFFICIENT_ERROR:
+            balanced = ZeroDivisionError(balanced)
+        error = errors.get(i, balanced if isinstance(balanced, Exception) else None)
+        if error is not None:
+            output["error"] = f"{type(error).__name__}: {error}"
+            number_of_errors += 1
+        else:
+            output["balanced"] = balanced
+
+        lines += [json.dumps(output)]
+
+    return "".join(line + "\n" for line in lines), len(records), number_of_errors
+
+# Chunks of records with the index of their first record
+def _chunks(records, chunk_size):
+    records = iter(records)
+    start = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+def balance_stream(records, output, record_format="jsonl", field="reaction", reaction_solution=1, exact=False,
+                   workers=None, chunk_size=256, max_in_flight=None, ordered=True):
+    """
+    Args:
+        records (iterable) - see `read_records` - consumed lazily
+        output (file) - the JSONL lines are written here as soon as their chunk is done
+        record_format (str) - see `read_records`
+        field (str) - see `read_records`
+        reaction_solution - the environment the reactions are taking place in - see `balance_reaction`
+        exact (bool) - see `balance_reaction`
+        workers (int) - number of worker processes - 0 balances in this process, None uses every core
+        chunk_size (int) - number of reactions sent to a worker at a time
+        max_in_flight (int) - the most chunks submitted but not yet written - bounds the memory use, default 4 per worker
+        ordered (bool) - if False chunks are written as soon as they are done instead of in input order
+
+    Returns (dict):
+        reactions, errors, seconds and reactions_per_second
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    max_in_flight = max_in_flight or 4 * max(workers, 1)
+
+    start_time = time.perf_counter()
+    totals = {"reactions": 0, "errors": 0}
+
+    def write(result):
+        text, number_of_reactions, number_of_errors = result
+        output.write(text)
+        totals["reactions"] += number_of_reactions
+        totals["errors"] += number_of_errors
+
+    chunks = _chunks(records, chunk_size)
+
+    if workers == 0:
+        for start, chunk in chunks:
+            write(_balance_chunk(start, chunk, record_format, field, reaction_solution, exact))
+
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # ordered: the oldest chunk is always written first - unordered: whichever chunk is done
+            pending = deque() if ordered else set()
+
+            for start, chunk in chunks:
+                future = executor.submit(_balance_chunk, start, chunk, record_format, field, reaction_solution, exact)
+
+                if ordered:
+                    pending.append(future)
+                    while len(pending) >= max_in_flight or (pending and pending[0].done()):
+                        write(pending.popleft().result())
+                else:
+                    pending.add(future)
+                    if len(pending) >= max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write(future.result())
+
+            while pending:
+                if ordered:
+                    write(pending.popleft().result())
+                else:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write(future.result())
+
+    seconds = time.perf_counter() - start_time
+    return {"reactions": totals["reactions"], "errors": totals["errors"], "seconds": seconds,
+            "reactions_per_second": totals["reactions"] / seconds if seconds > 0 else 0.}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m stoichiometry",
+                                     description="Balances a JSONL, CSV or text file of reactions and writes the results as JSONL")
+    parser.add_argument("input", help="the input file - '-' reads from stdin")
+    parser.add_argument("-o", "--output", default="-", help="the output file - '-' writes to stdout")
+    parser.add_argument("--format", choices=INPUT_FORMATS, default=None,
+                        help="the input format - found from the file extension by default, jsonl for stdin")
+    parser.add_argument("--field", default="reaction", help="the JSONL key or CSV column holding the reaction")
+    parser.add_argument("--solution", type=int, choices=(1, 2, 3), default=1, help="1. neutral, 2. alkaline or 3. acidic")
+    parser.add_argument("--exact", action="store_true", help="python integers end to end - see `balance_reaction`")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes - 0 for none, default every core")
+    parser.add_argument("--chunk-size", type=int, default=256, help="number of reactions sent to a worker at a time")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="the most chunks being worked on at once - default 4 per worker")
+    parser.add_argument("--unordered", action="store_true", help="write the chunks as they finish instead of in input order")
+    parser.add_argument("--quiet", action="store_true", help="don't print the throughput summary")
+    args = parser.parse_args(argv)
+
+    # the arguments are checked before anything is read or written - errors while balancing aren't usage errors
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.workers is not None and args.workers < 0:
+        parser.error("--workers must be at least 0")
+
+    record_format = args.format
+    if record_format is None:
+        extension = os.path.splitext(args.input)[1].lower().lstrip(".")
+        record_format = {"csv": "csv", "txt": "text"}.get(extension, "jsonl")
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, newline="" if record_format == "csv" else None)
+    try:
+        records = read_records(input_file, record_format, args.field)
+    except ValueError as error:
+        if input_file is not sys.stdin:
+            input_file.close()
+        parser.error(str(error))
+
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    try:
+        summary = balance_stream(records, output_file, record_format, args.field, args.solution, args.exact,
+                                 args.workers, args.chunk_size, args.max_in_flight, not args.unordered)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    if not args.quiet:
+        print(f"balanced {summary['reactions']} reactions ({summary['errors']} errors) in {summary['seconds']:.2f} s"
+              f" - {summary['reactions_per_second']:.0f} reactions/s", file=sys.stderr)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,162 +1,111 @@
-import numpy as np
-from scipy.linalg import null_space
+from heapq import heappush, heappop
+from itertools import islice
 
-from global_vars import STATES_OF_MATTER
-from utils.math_utils import normalize_coefficients, GCDOfMultipleNums
-from utils.reaction_info_utils import (number_of_element, find_charge, is_reaction_solved, reaction_splitter, separate_states_of_matter,
-                                       element_finder)
-from utils.formatter_utils import (capitalizer, number_of_pluses_before_an_equal, remove_spaces, add_spaces)
+from utils.math_utils import (integer_null_space, stacked_integer_null_space, sparse_integer_null_space,
+                              minimal_null_space_combination)
+from utils.reaction_info_utils import (as_reaction, lookup_compound, is_reaction_solved, element_finder,
+                                       setup_chemical_composition_matrix, setup_sparse_composition_matrix)
+from utils.formatter_utils import capitalization_candidates
+from utils.coefficient_utils import integer_array
+from utils.import_utils import lazy_import
 
-def setup_chemical_composition_matrix(compound_list, element_list):
-    """
-    Args:
-        compound_list (list) - list of all the compounds in the reaction - with correct capitalization
-        element_list (list) - list of all the elements in the reaction - with correct capitalization
-        
-    Returns (np.array):
-        chemical coefficient matrix of the reaction - as described in https://arxiv.org/ftp/arxiv/papers/1110/1110.4321.pdf
-        
-    Example:
-        >>>setup_chemical_composition_matrix(["C6H12O6", "O2", "CO2", "H2O"], ["H", "C", "O"])
-        array([[12.,  0.,  0.,  2.],
-               [ 6.,  0.,  1.,  0.],
-               [ 6.,  2.,  2.,  1.]])
-        >>>compounds = ['Cr7N66H96C42O24', 'MnO4^-', 'H3O^+', 'Cr2O7^2-', 'Mn^2+', 'CO2', 'NO3^-', 'H2O']
-        >>>elements = element_finder(c)
-        >>>setup_chemical_composition_matrix(compounds, elements)
-        array([[ 7.,  0.,  0.,  2.,  0.,  0.,  0.,  0.],
-               [66.,  0.,  0.,  0.,  0.,  0.,  1.,  0.],
-               [96.,  0.,  3.,  0.,  0.,  0.,  0.,  2.],
-               [42.,  0.,  0.,  0.,  0.,  1.,  0.,  0.],
-               [24.,  4.,  1.,  7.,  0.,  2.,  3.,  1.],
-               [ 0.,  1.,  0.,  0.,  1.,  0.,  0.,  0.],
-               [ 0., -1.,  1., -2.,  2.,  0., -1.,  0.]])
-    """
-    ChemicalCompositionMatrix = np.zeros([len(element_list), len(compound_list)])
-    
-    for i in range(len(compound_list)):
-        for j in range(len(element_list)):
-            ChemicalCompositionMatrix[j][i] = number_of_element(compound_list[i], element_list[j])
+np = lazy_import("numpy")
+
+# returned by `balance_reaction` when a compound would get the coefficient 0
+ZERO_COEFFICIENT_ERROR = "Dividing by zero error at the - SolveReaction - function"
+
+# Picks the single balanced reaction out of a null space basis - a list of python integers if exact
+def _null_space_vector_from_basis(basis, exact=False):
+    if len(basis) > 1:
+        raise ValueError(f"The reaction is a combination of {len(basis)} independent reactions - see the modes of `balance_reaction`")
     
-    # if charge is present insert it
-    isChargePresent = False
-    for compound in compound_list:
-        if "^" in compound:
-            isChargePresent = True
-            break
+    if len(basis) == 0:
+        return [] if exact else np.array([], dtype=int)
     
-    if isChargePresent:
-        charge_vector = find_charge(compound_list)
-        ChemicalCompositionMatrix = np.concatenate((ChemicalCompositionMatrix, [charge_vector]))   
+    return list(basis[0]) if exact else integer_array(basis[0])
 
-    return ChemicalCompositionMatrix
-        
-        
-# the function is much simpler than when it returned a matrix
-def find_null_space_vector(compound_list, element_list):
+
+# the null space is found with exact integer arithmetic, so no rounding of the coefficients is needed
+def find_null_space_vector(compound_list, element_list, basis=False, exact=False):
     """
     Args:
         compound_list (list) - list of all the compounds in the reaction - with correct capitalization
         element_list (list) - list of all the elements in the reaction - with correct capitalization
+        basis (bool) - if True the whole integer basis of the null space is returned - one row for each
+            independent balanced reaction
+        exact (bool) - if True python integers are used from the composition matrix to the result, which is a list
         
-    Returns (np.array):
-        array describing the relation between the quantities of each compound in the balanced reaction
+    Returns (np.array or list):
+        the smallest integer vector describing the relation between the quantities of each compound in the balanced reaction
+        - empty if the reaction can't be balanced - the array is int64, or dtype=object if a value doesn't fit in int64
         
     Example:
         >>>compounds = ['Cr7N66H96C42O24', 'MnO4^-', 'H3O^+', 'Cr2O7^2-', 'Mn^2+', 'CO2', 'NO3^-', 'H2O']
         >>>elements = element_finder(c)
         >>>find_null_space_vector(compounds, elements)
-        array([-0.00173861, -0.20446019, -0.48646225,  0.00608512,  0.20446019,
-        0.0730215 ,  0.11474806,  0.81314651])
+        array([   10,  1176,  2798,   -35, -1176,  -420,  -660, -4677])
     """
-    ChemicalCompositionMatrix = setup_chemical_composition_matrix(compound_list, element_list)
+    ChemicalCompositionMatrix = setup_chemical_composition_matrix(compound_list, element_list, exact)
+    null_space_basis = integer_null_space(ChemicalCompositionMatrix)
+    
+    if basis:
+        if exact:
+            return null_space_basis
+        return integer_array(null_space_basis).reshape(len(null_space_basis), len(compound_list))
     
-    return null_space(ChemicalCompositionMatrix).flatten()
+    return _null_space_vector_from_basis(null_space_basis, exact)
 
 
 ###### The Reaction Balancer ######
-def balance_reaction(reaction, reaction_solution=1):
+
+# Formats a reaction that is already balanced - capitalization, spacing and states of matter
+def format_solved_reaction(reaction):
     """
     Args:
-        reaction (str) - unformatted or custom formatted reaction
-        reaction_solution - the environment the reaction is taking place in
-            1. neutral
-            2. alkaline
-            3. acidic
-            
+        reaction (str or Reaction) - reaction of any formatting or a parsed reaction - see `Reaction`
+        
     Returns (str):
-        Formatted and balanced reaction
+        The formatted reaction
         
     Example:
-        >>>balance_reaction("cr7n66h96c42o24+mno4^-=>cr2o7^2-+mn^2++co2+no3^-", 3)
-        '10Cr7N66H96C42O24 + 1176MnO4^- + 2798H^+ => 35Cr2O7^2- + 1176Mn^2+ + 420CO2 + 660NO3^- + 1879H2O'
+        >>>format_solved_reaction("na^+ + cl^- => nacl")
+        'Na^+ + Cl^- => NaCl'
     """
+    reaction = as_reaction(reaction)
     
-    reaction = remove_spaces(reaction)
-    reaction = add_spaces(reaction)
+    new_reaction = ""
     
-    # Is reaction already solved
-    if is_reaction_solved(reaction):
-        # return the formatted reaction then. NOTE: all this should probably be it's own function
-        
-        compound_list = [compound for compound in reaction_splitter(reaction)]
-        states_of_matter_list = ["" for _ in compound_list]
-        states_of_matter_in_reaction = False
-        
-        if any([(state_of_matter in reaction) for state_of_matter in STATES_OF_MATTER]):
-            compound_list = [compound for compound in reaction_splitter(reaction)]
-            compound_list, states_of_matter_list = separate_states_of_matter(compound_list)
-            states_of_matter_in_reaction = True
+    for i, compound in enumerate(reaction.compounds):
+        if i > 0 and reaction.is_product[i] and (not reaction.is_product[i-1]):
+            new_reaction += " => "
+        elif i > 0:
+            new_reaction += " + "
         
-        new_compound_list = []
-        for i, compound in enumerate(compound_list):
-            new_compound_list += [capitalizer(compound_list[i]) + states_of_matter_list[i]]
-            
-        compound_list = new_compound_list
-        
-        new_reaction = ""
-        
-        number_of_pluses_reactants = number_of_pluses_before_an_equal(reaction)
-        
-        # if there are only pluses
-        if len(compound_list) <= number_of_pluses_reactants:
-            for i, compound in enumerate(compound_list):
-                if (i + 1) == len(compound_list):
-                    new_reaction += compound
-                else:
-                    new_reaction += compound + " + "
-                    
-        else:
-            in_products = False
-            
-            for i, compound in enumerate(compound_list):
-                if (not in_products) and (number_of_pluses_reactants > 0):
-                    new_reaction += compound + " + "
-                    number_of_pluses_reactants -= 1
-                elif (not in_products) and (number_of_pluses_reactants == 0):
-                    new_reaction += compound + " => "
-                    in_products = True
-                elif in_products:
-                    if (i + 1) < len(compound_list):
-                        new_reaction += compound + " + "
-                    else:
-                        new_reaction += compound
+        new_reaction += compound.coefficient + reaction.species[i] + reaction.states[i]
+    
+    return new_reaction
+
+
+# Splits an unsolved reaction into capitalized compounds and adds the species of the solution
+def prepare_compounds(reaction, reaction_solution=1):
+    """
+    Args:
+        reaction (str or Reaction) - reaction of any formatting or a parsed reaction - see `Reaction`
+        reaction_solution - the environment the reaction is taking place in - see `balance_reaction`
         
+    Returns (tuple):
+        compound_list (list) - capitalized compounds, including H^+/OH^- and H2O for acidic/alkaline solutions
+        states_of_matter_list (list) - the states of matter of the compounds
         
-        return new_reaction
-    
-    
-    # lower case compound list
-    compound_list = [compound for compound in reaction_splitter(reaction)]
-    states_of_matter_list = ["" for _ in compound_list]
-    states_of_matter_in_reaction = False
-    
-    # are the states of matter indicated
-    if any([(state_of_matter in reaction) for state_of_matter in STATES_OF_MATTER]):
-        compound_list, states_of_matter_list = separate_states_of_matter(compound_list)
-        states_of_matter_in_reaction = True    
+    Example:
+        >>>prepare_compounds("mno4^- + fe^2+ => mn^2+ + fe^3+", 3)
+        (['MnO4^-', 'Fe^2+', 'Mn^2+', 'Fe^3+', 'H^+', 'H2O'], ['', '', '', '', '', ''])
+    """
+    reaction = as_reaction(reaction)
     
-    compound_list = [capitalizer(compound) for compound in compound_list]
+    # the coefficients of an unsolved reaction are ignored
+    compound_list = list(reaction.species)
+    states_of_matter_list = list(reaction.states)
         
     # acidic
     if reaction_solution == 3:
@@ -177,31 +126,77 @@ def balance_reaction(reaction, reaction_solution=1):
         
         # I just add "", since the user can add (aq) and (l) if they want to by adding H2O and H^+ themselves
         states_of_matter_list += ["", ""]
-            
     
-    element_list = element_finder(compound_list)    
-    null_space_vector = find_null_space_vector(compound_list, element_list)
+    return compound_list, states_of_matter_list
+
+
+# The composition matrix of the reaction is reused unless H^+/OH^- or H2O had to be added
+def composition_matrix_of_compounds(reaction, compound_list, exact=False):
+    """
+    Args:
+        reaction (Reaction) - the parsed reaction
+        compound_list (list) - the compounds from `prepare_compounds`
+        exact (bool) - if True the entries are python integers - see `setup_chemical_composition_matrix`
         
+    Returns (np.array):
+        the composition matrix of `compound_list` - see `setup_chemical_composition_matrix`
+    """
+    if len(compound_list) == len(reaction) and not exact:
+        return reaction.composition_matrix
+    
+    return setup_chemical_composition_matrix(compound_list, element_finder(compound_list), exact)
+
+
+# Checks the integer null space vector and orients it as reaction coefficients
+def coefficients_from_null_space_vector(null_space_vector, exact=False):
+    """
+    Args:
+        null_space_vector (np.array or list) - integer vector, see `find_null_space_vector`
+        exact (bool) - if True the coefficients are returned as a list of python integers
+        
+    Returns (np.array or list):
+        integer reaction coefficients - reactants positive and products negative
+        
+    Example:
+        >>>coefficients_from_null_space_vector(np.array([-1, -3, 2]))
+        array([ 1,  3, -2])
+    """
     absolute_null_space_vector = [abs(value) for value in null_space_vector]
     # an error is thrown here if the null space vector is empty - this might for example be caused by an unsolvable reaction
     min_abs = min(absolute_null_space_vector)
     if min_abs == 0:
-          return "Dividing by zero error at the - SolveReaction - function"
+        raise ZeroDivisionError(ZERO_COEFFICIENT_ERROR)
 
-    reaction_coefficients = np.array(null_space_vector)/min_abs
+    if exact:
+        reaction_coefficients = [int(value) for value in null_space_vector]
+        if reaction_coefficients[0] < 0:
+            reaction_coefficients = [-value for value in reaction_coefficients]
+        return reaction_coefficients
     
-    # normalize coefficients
-    reaction_coefficients = normalize_coefficients(reaction_coefficients)
-    reaction_coefficients = [round(value) for value in reaction_coefficients]    
-    reaction_coefficients = np.array(reaction_coefficients)/GCDOfMultipleNums([abs(value) for value in reaction_coefficients])
-    reaction_coefficients = np.array([round(value) for value in reaction_coefficients])
+    reaction_coefficients = integer_array(list(null_space_vector))
     
     # make sure reactants are positive and products negative
     if reaction_coefficients[0] < 0:
         reaction_coefficients = reaction_coefficients * (-1)
+    
+    return reaction_coefficients
+
 
-   
-    # insert coefficients to the molecule list and turn the molecule list back into a reaction
+# Inserts the coefficients into the compound list and turns it back into a reaction
+def assemble_balanced_reaction(compound_list, states_of_matter_list, reaction_coefficients):
+    """
+    Args:
+        compound_list (list) - capitalized compounds
+        states_of_matter_list (list) - the states of matter of the compounds
+        reaction_coefficients (np.array or list) - see `coefficients_from_null_space_vector`
+        
+    Returns (str):
+        The balanced reaction
+        
+    Example:
+        >>>assemble_balanced_reaction(["H2", "O2", "H2O"], ["", "", ""], np.array([2, 1, -2]))
+        '2H2 + O2 => 2H2O'
+    """
     reactant_list = []
     product_list = []
     for i in range(len(reaction_coefficients)):
@@ -240,3 +235,283 @@ def balance_reaction(reaction, reaction_solution=1):
     
     return stochiometric_reaction
 
+
+def balance_reaction(reaction, reaction_solution=1, mode="single", constraints=None, exact=False):
+    """
+    Args:
+        reaction (str or Reaction) - unformatted or custom formatted reaction, or a parsed reaction - see `Reaction`
+        reaction_solution - the environment the reaction is taking place in
+            1. neutral
+            2. alkaline
+            3. acidic
+        mode (str) - what to do with the null space of the composition matrix
+            "single" - there has to be exactly one balanced reaction
+            "basis" - every independent balanced reaction, one for each integer basis vector of the null space
+            "minimal" - the combination of the independent reactions with the smallest coefficients where every
+                compound takes part on the side it was written on - see `minimal_null_space_combination`
+        constraints (dict) - only for mode="minimal" - {compound: coefficient}, reactants positive and products negative
+        exact (bool) - if True the coefficients are python integers from the composition matrix to the output, for
+            polymers and proteins with huge coefficients - counts above 2^53 are always kept exact
+            
+    Returns (str or list):
+        Formatted and balanced reaction - a list of them for mode="basis" - `ZERO_COEFFICIENT_ERROR` for mode="single"
+        if a compound would get a coefficient of 0
+        
+    Example:
+        >>>balance_reaction("cr7n66h96c42o24+mno4^-=>cr2o7^2-+mn^2++co2+no3^-", 3)
+        '10Cr7N66H96C42O24 + 1176MnO4^- + 2798H^+ => 35Cr2O7^2- + 1176Mn^2+ + 420CO2 + 660NO3^- + 1879H2O'
+        >>>balance_reaction("h2o2 = h2o + o2 + h2", mode="basis")
+        ['2H2O2 => 2H2O + O2', 'H2O2 + H2 => 2H2O']
+        >>>balance_reaction("h2o2 = h2o + o2 + h2", mode="minimal")
+        '3H2O2 => 2H2O + 2O2 + H2'
+        >>>balance_reaction("h2o2 = h2o + o2 + h2", mode="minimal", constraints={"h2": -2})
+        '4H2O2 => 2H2O + 3O2 + 2H2'
+        >>>balance_reaction("c10000000000000000001h2 + o2 = co2 + h2o", exact=True)
+        '2C10000000000000000001H2 + 20000000000000000003O2 => 20000000000000000002CO2 + 2H2O'
+    """
+    if mode not in ("single", "basis", "minimal"):
+        raise ValueError(f"Unknown mode: {mode} - use 'single', 'basis' or 'minimal'")
+    
+    reaction = as_reaction(reaction)
+    
+    # Is reaction already solved
+    if mode == "single" and is_reaction_solved(reaction):
+        return format_solved_reaction(reaction)
+    
+    compound_list, states_of_matter_list = prepare_compounds(reaction, reaction_solution)
+    
+    matrix = composition_matrix_of_compounds(reaction, compound_list, exact)
+    basis = integer_null_space(matrix)
+    
+    if mode == "basis":
+        return [assemble_balanced_vector(compound_list, states_of_matter_list, vector) for vector in basis]
+    
+    if mode == "minimal":
+        # the constraints are given by compound, the search needs the columns
+        columns = {compound: i for i, compound in enumerate(compound_list)}
+        column_constraints = {}
+        for compound, coefficient in (constraints or {}).items():
+            capitalized = lookup_compound(compound).capitalized
+            if capitalized not in columns:
+                raise ValueError(f"{compound} is not a compound in the reaction")
+            column_constraints[columns[capitalized]] = coefficient
+        
+        # the compounds stay on the side they were written on - H^+/OH^- and H2O may go on either side
+        column_signs = {}
+        if reaction.has_arrow:
+            column_signs = {i: (-1 if is_product else 1) for i, is_product in enumerate(reaction.is_product)}
+        
+        vector = minimal_null_space_combination(basis, column_constraints, column_signs)
+        if vector is None:
+            raise ValueError("No combination of the independent reactions fulfils the constraints")
+        return assemble_balanced_reaction(compound_list, states_of_matter_list, vector)
+    
+    null_space_vector = _null_space_vector_from_basis(basis, exact)
+    
+    try:
+        reaction_coefficients = coefficients_from_null_space_vector(null_space_vector, exact)
+    except ZeroDivisionError as error:
+        return str(error)
+    
+    return assemble_balanced_reaction(compound_list, states_of_matter_list, reaction_coefficients)
+
+
+# Assembles a balanced reaction from only the compounds whose coefficient isn't 0
+def assemble_balanced_vector(compound_list, states_of_matter_list, vector):
+    """
+    Args:
+        compound_list (list) - capitalized compounds
+        states_of_matter_list (list) - the states of matter of the compounds
+        vector (list or dict) - integer null space vector - a dict holds only the non-zero entries, {column: coefficient}
+        
+    Returns (str):
+        The balanced reaction - see `assemble_balanced_reaction`
+        
+    Example:
+        >>>assemble_balanced_vector(["H2O2", "H2O", "O2", "H2"], ["", "", "", ""], [1, 0, -1, -1])
+        'H2O2 => O2 + H2'
+    """
+    if not isinstance(vector, dict):
+        vector = {column: value for column, value in enumerate(vector) if value != 0}
+    
+    columns = list(vector)
+    return assemble_balanced_reaction([compound_list[column] for column in columns],
+                                      [states_of_matter_list[column] for column in columns],
+                                      [vector[column] for column in columns])
+
+
+###### Sparse networks ######
+
+def balance_reaction_network(reaction, reaction_solution=1):
+    """
+    Args:
+        reaction (str or Reaction) - reaction or network of species, e.g. "ch4 + c2h6 + o2 + co2 + co + h2o" - the
+            reaction arrow is optional since the sides are found by the balancing
+        reaction_solution - the environment the reaction is taking place in - see `balance_reaction`
+        
+    Returns (list):
+        every independent balanced reaction between the species - one for each basis vector of the null space
+        of the sparse composition matrix, so no dense matrix is ever built
+        
+    Example:
+        >>>balance_reaction_network("ch4 + o2 + co2 + co + h2o")
+        ['O2 + 2CO => 2CO2', 'CH4 + 2O2 => CO2 + 2H2O']
+    """
+    reaction = as_reaction(reaction)
+    compound_list, states_of_matter_list = prepare_compounds(reaction, reaction_solution)
+    
+    matrix = setup_sparse_composition_matrix(compound_list, element_finder(compound_list))
+    
+    return [assemble_balanced_vector(compound_list, states_of_matter_list, vector)
+            for vector in sparse_integer_null_space(matrix)]
+
+
+###### Ambiguous capitalization ######
+
+# The k cheapest ways to pick one candidate from every list - candidate_lists[i] = [(value, cost), ...] sorted by cost
+def _cheapest_combinations(candidate_lists, k):
+    def total_cost(indices):
+        return sum(candidate_lists[i][index][1] for i, index in enumerate(indices))
+    
+    start = tuple(0 for _ in candidate_lists)
+    heap = [(total_cost(start), start)]
+    seen = {start}
+    combinations = []
+    
+    while heap and len(combinations) < k:
+        cost, indices = heappop(heap)
+        combinations.append(([candidate_lists[i][index][0] for i, index in enumerate(indices)], cost))
+        
+        for i in range(len(indices)):
+            if indices[i] + 1 < len(candidate_lists[i]):
+                neighbour = indices[:i] + (indices[i] + 1,) + indices[i+1:]
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    heappush(heap, (total_cost(neighbour), neighbour))
+    
+    return combinations
+
+def rank_reaction_parses(reaction, reaction_solution=1, k=3):
+    """
+    Args:
+        reaction (str or Reaction) - lowercase reaction - capitalized compounds are kept as they are
+        reaction_solution - the environment the reaction is taking place in - see `balance_reaction`
+        k (int) - the number of parses to try
+        
+    Returns (list):
+        up to k tuples of (capitalized reaction, balanced reaction or None) - the parses that
+        can be balanced come first, otherwise they are ordered by `segment_formula`'s cost
+        
+    Example:
+        >>>rank_reaction_parses("co + o2 = co2", k=2)
+        [('CO + O2 => CO2', '2CO + O2 => 2CO2'), ('CO + O2 => Co2', None)]
+    """
+    reaction = as_reaction(reaction)
+    candidate_lists = [capitalization_candidates(compound.formula, k) for compound in reaction.compounds]
+    
+    parses = []
+    for species, _ in _cheapest_combinations(candidate_lists, k):
+        parse = ""
+        for i, compound in enumerate(reaction.compounds):
+            if i > 0 and compound.is_product and (not reaction.compounds[i-1].is_product):
+                parse += " => "
+            elif i > 0:
+                parse += " + "
+            parse += compound.coefficient + species[i] + compound.state
+        
+        try:
+            balanced = balance_reaction(parse, reaction_solution)
+        except Exception:
+            balanced = None
+        
+        # the zero coefficient error is returned as a string
+        if balanced == ZERO_COEFFICIENT_ERROR:
+            balanced = None
+        
+        parses.append((parse, balanced))
+    
+    # sorted is stable, so the order of the costs is kept within each group
+    return sorted(parses, key=lambda parse: parse[1] is None)
+
+
+###### Batch balancing ######
+
+# Parses and solves a single chunk of reactions - the composition matrices are grouped by shape
+def _balance_reaction_chunk(reactions, reaction_solution, exact=False):
+    results = [None for _ in reactions]
+    pending = {}
+    
+    for i, reaction in enumerate(reactions):
+        try:
+            reaction = as_reaction(reaction)
+            
+            if is_reaction_solved(reaction):
+                results[i] = format_solved_reaction(reaction)
+                continue
+            
+            compound_list, states_of_matter_list = prepare_compounds(reaction, reaction_solution)
+            matrix = composition_matrix_of_compounds(reaction, compound_list, exact)
+            
+            # python integers can't be stacked into the int64 elimination
+            if matrix.dtype == object:
+                null_space_vector = _null_space_vector_from_basis(integer_null_space(matrix), exact)
+                reaction_coefficients = coefficients_from_null_space_vector(null_space_vector, exact)
+                results[i] = assemble_balanced_reaction(compound_list, states_of_matter_list, reaction_coefficients)
+                continue
+        # returned as a string, like `balance_reaction` does
+        except ZeroDivisionError as error:
+            results[i] = str(error)
+            continue
+        except Exception as error:
+            results[i] = error
+            continue
+        
+        pending.setdefault(matrix.shape, []).append((i, compound_list, states_of_matter_list, matrix))
+    
+    for shape, group in pending.items():
+        bases = stacked_integer_null_space(np.array([matrix for _, _, _, matrix in group]))
+        
+        for (i, compound_list, states_of_matter_list, matrix), basis in zip(group, bases):
+            try:
+                # the numbers grew too large for the stacked int64 elimination
+                if basis is None:
+                    basis = integer_null_space(matrix)
+                
+                reaction_coefficients = coefficients_from_null_space_vector(_null_space_vector_from_basis(basis))
+                results[i] = assemble_balanced_reaction(compound_list, states_of_matter_list, reaction_coefficients)
+            except ZeroDivisionError as error:
+                results[i] = str(error)
+            except Exception as error:
+                results[i] = error
+    
+    return results
+
+
+def balance_reactions(reactions, reaction_solution=1, chunk_size=1024, exact=False):
+    """
+    Args:
+        reactions (iterable) - unformatted or custom formatted reactions - consumed lazily
+        reaction_solution - the environment the reactions are taking place in - see `balance_reaction`
+        chunk_size (int) - number of reactions that are parsed and solved together
+        exact (bool) - if True every reaction is solved with python integers - see `balance_reaction`
+        
+    Yields (str or Exception):
+        The formatted and balanced reactions in input order - if a reaction cannot be balanced
+        the exception is yielded in its place instead of being raised, except that a reaction where a compound
+        would get a coefficient of 0 yields `ZERO_COEFFICIENT_ERROR`, the same string `balance_reaction` returns
+        
+    Example:
+        >>>list(balance_reactions(["h2+o2=h2o", "a+b", "fe+o2=>fe2o3"]))
+        ['2H2 + O2 => 2H2O', ValueError('min() arg is an empty sequence'), '4Fe + 3O2 => 2Fe2O3']
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    
+    reactions = iter(reactions)
+    
+    while True:
+        chunk = list(islice(reactions, chunk_size))
+        if len(chunk) == 0:
+            return
+        
+        yield from _balance_reaction_chunk(chunk, reaction_solution, exact)
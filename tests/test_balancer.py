@@ -0,0 +1,22 @@
+import pytest
+
+from stoichiometry.balancer import ZERO_COEFFICIENT_ERROR, balance_reaction, balance_reactions
+
+# H2 + H4 + ... + H38 = H40 - one element, so the null space has one dimension less than there are compounds
+HIGH_DIMENSIONAL_REACTION = " + ".join(f"h{2 * k}" for k in range(1, 20)) + " = h40"
+
+# Ne can only get a coefficient of 0
+ZERO_COEFFICIENT_REACTION = "h2 + o2 = h2o + ne"
+
+
+@pytest.mark.parametrize("exact", [False, True])
+def test_zero_coefficient_is_the_same_for_single_and_batch(exact):
+    assert balance_reaction(ZERO_COEFFICIENT_REACTION, exact=exact) == ZERO_COEFFICIENT_ERROR
+    assert list(balance_reactions(["h2 + o2 = h2o", ZERO_COEFFICIENT_REACTION], exact=exact)) == [
+        balance_reaction("h2 + o2 = h2o"), ZERO_COEFFICIENT_ERROR]
+
+def test_minimal_mode_rejects_a_high_dimensional_null_space():
+    assert len(balance_reaction(HIGH_DIMENSIONAL_REACTION, mode="basis")) == 19
+    
+    with pytest.raises(ValueError, match="19 dimensions"):
+        balance_reaction(HIGH_DIMENSIONAL_REACTION, mode="minimal")
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from utils.coefficient_utils import integer_array
+
+
+def test_integers_are_kept_exactly():
+    assert integer_array([2, 1, -2]).dtype == np.int64
+    assert integer_array(np.array([3, 4], dtype=np.int32)).dtype == np.int64
+    assert integer_array([2**63, 1]).tolist() == [2**63, 1]
+
+@pytest.mark.parametrize("values", [[1.5, 2], [2.0, 1], [2**63, 0.5], [1, "2"]])
+def test_non_integers_are_rejected(values):
+    with pytest.raises(TypeError, match="Expected integers"):
+        integer_array(values)
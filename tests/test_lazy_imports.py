@@ -0,0 +1,23 @@
+# Importing the packages must not load the heavy dependencies - they're only imported the first time they're used
+import json
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.import_time import HEAVY_DEPENDENCIES, IMPORT_BUDGETS_MS, REPOSITORY_ROOT
+
+# runs in a fresh interpreter, so nothing is imported beforehand
+LOADED_MODULES_SCRIPT = """
+import json, sys
+import {module}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+@pytest.mark.parametrize("module", list(IMPORT_BUDGETS_MS))
+def test_import_does_not_load_heavy_dependencies(module):
+    output = subprocess.run([sys.executable, "-c", LOADED_MODULES_SCRIPT.format(module=module)], cwd=REPOSITORY_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    loaded = {name.split(".")[0] for name in json.loads(output.strip().splitlines()[-1])}
+    
+    assert not loaded & set(HEAVY_DEPENDENCIES)
@@ -0,0 +1,19 @@
+import pytest
+
+from equillibrium.eq_const import equillibrium_constant
+from utils.lexer_utils import tokenize_reaction
+
+
+def test_double_arrow_is_the_reaction_arrow():
+    assert [token.text for token in tokenize_reaction("H2(g)+I2(g)<=>2HI(g)")] == \
+        ["H2", "(g)", "+", "I2", "(g)", "=>", "2", "HI", "(g)"]
+    assert equillibrium_constant("H2(g)+I2(g)<=>2HI(g)") == equillibrium_constant("H2(g)+I2(g)=>2HI(g)")
+
+@pytest.mark.parametrize("reaction", ["H2(g)+I2(g)<2HI(g)", "h2 + o2 = h2o!", "h2 % o2 = h2o"])
+def test_unknown_characters_are_rejected(reaction):
+    with pytest.raises(ValueError, match="Unexpected character"):
+        tokenize_reaction(reaction)
+
+def test_states_of_matter_may_hold_hyphens():
+    assert [token.text for token in tokenize_reaction("I2(aq) => I2(oktan-1-ol)")] == \
+        ["I2", "(aq)", "=>", "I2", "(oktan-1-ol)"]
@@ -0,0 +1,15 @@
+import numpy as np
+
+from utils.math_utils import integer_null_space, stacked_integer_null_space
+
+
+def test_a_matrix_without_rows_has_the_whole_space_as_null_space():
+    matrix = np.zeros((0, 3))
+    
+    assert integer_null_space(matrix) == [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    assert integer_null_space(matrix) == stacked_integer_null_space(matrix[None])[0]
+
+def test_single_and_stacked_null_spaces_agree():
+    matrices = np.array([[[2, 0, 2], [0, 2, 1]], [[1, 1, 0], [0, 1, 1]], [[1, 0, 0], [0, 0, 0]]])
+    
+    assert stacked_integer_null_space(matrices) == [integer_null_space(matrix) for matrix in matrices]
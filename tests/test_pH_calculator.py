@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from pH.pH_calculator import Acid, NonReactive, System
+
+
+def acetate_buffer(sodium):
+    return [Acid(pKa=4.76, charge=0, conc=0.1), NonReactive(charge=1, conc=sodium)]
+
+@pytest.mark.parametrize("activity", [None, "davies"])
+def test_changed_species_are_compiled_again(activity):
+    species = acetate_buffer(0.05)
+    s = System(species, activity=activity)
+    s.pHsolve()
+    compiled = s.compiled
+    
+    species[1].conc = 0.1
+    expected = System(acetate_buffer(0.1), activity=activity)
+    
+    assert s.pHsolve(tol=1e-10) == pytest.approx(expected.pHsolve(tol=1e-10), abs=1e-8)
+    assert s.compiled is not compiled
+    np.testing.assert_allclose(s.solve_many(s.compiled.conc[None]), expected.solve_many(expected.compiled.conc[None]))
+
+def test_unchanged_species_keep_the_compiled_arrays():
+    s = System(acetate_buffer(0.05))
+    compiled = s.compiled
+    s.pHsolve()
+    s.solve_many(np.array([[0.1, 0.05]]))
+    
+    assert s.compiled is compiled
+
+def test_changed_Kw_and_added_species_are_compiled_again():
+    s = System(acetate_buffer(0.05))
+    s.pHsolve()
+    
+    s.Kw = 10.**(-13.)
+    s.species.append(NonReactive(charge=-1, conc=0.01))
+    expected = System(acetate_buffer(0.05) + [NonReactive(charge=-1, conc=0.01)], Kw=10.**(-13.))
+    
+    assert s.pHsolve(tol=1e-10) == pytest.approx(expected.pHsolve(tol=1e-10), abs=1e-8)
@@ -0,0 +1,23 @@
+import numpy as np
+
+from pH.pH_calculator import Acid, NonReactive
+from pH.pH_titration import titration_curve
+
+
+def acetic_acid_titration(titrant_end_conc, titrant_start_conc=0.):
+    return titration_curve([Acid(pKa=4.76, charge=0, conc=0.1)], [NonReactive(charge=1, conc=0.)], titrant_end_conc,
+                           titrant_start_conc)
+
+def test_back_titration_is_refined_like_the_forward_one():
+    forward_concs, forward_pHs = acetic_acid_titration(0.2)
+    backward_concs, backward_pHs = acetic_acid_titration(0., titrant_start_conc=0.2)
+    
+    assert len(forward_concs) > 200
+    assert np.all(np.diff(backward_concs) < 0)
+    np.testing.assert_allclose(backward_concs, forward_concs[::-1], atol=1e-15)
+    np.testing.assert_allclose(backward_pHs, forward_pHs[::-1], atol=1e-9)
+
+def test_no_step_is_larger_than_the_max_pH_step():
+    _, pHs = acetic_acid_titration(0.2)
+    
+    assert np.abs(np.diff(pHs)).max() <= 0.05
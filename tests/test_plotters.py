@@ -0,0 +1,29 @@
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from pH.pH_calculator import Acid, NonReactive
+from pH.pH_plotters import bjerrum_plotter, titration_curve_plotter
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    plt.close("all")
+    yield
+    plt.close("all")
+
+def test_show_false_overlays_on_the_current_pyplot_figure():
+    assert bjerrum_plotter(Acid(pKa=4.76, charge=0, conc=1e-3), show=False) is None
+    assert bjerrum_plotter(Acid(pKa=[2.148, 7.198, 12.375], charge=0, conc=1e-3), show=False) is None
+    
+    assert len(plt.get_fignums()) == 1
+    assert len(plt.gca().lines) == 2 + 4
+
+def test_return_figure_is_detached_from_pyplot():
+    figure = titration_curve_plotter([Acid(pKa=4.76, charge=0, conc=1e-2)], [NonReactive(charge=1, conc=0.)], 2e-2,
+                                     return_figure=True)
+    
+    assert len(figure.axes[0].lines) == 1
+    assert plt.get_fignums() == []
@@ -0,0 +1,8 @@
+from utils import lexer_utils
+
+
+def test_separate_states_of_matter_is_still_importable_from_reaction_info_utils():
+    from utils.reaction_info_utils import separate_states_of_matter
+    
+    assert separate_states_of_matter is lexer_utils.separate_states_of_matter
+    assert separate_states_of_matter(["h2o(g)", "C6H12O6(aq)"]) == (["h2o", "C6H12O6"], ["(g)", "(aq)"])
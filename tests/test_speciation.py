@@ -0,0 +1,41 @@
+import pytest
+
+from pH.pH_calculator import Acid, Base, NonReactive, System
+from pH.speciation import Complex, Component, Speciation
+
+
+def copper_ammonia_bath():
+    return Speciation({"Cu": Component(charge=2, total=0.01), "NH3": Base(pKb=4.75, charge=0, conc=0.1),
+                       "SO4": NonReactive(charge=-2, conc=0.01)},
+                      {"CuNH3": Complex({"Cu": 1, "NH3": 1}, 4.04), "Cu(NH3)2": Complex({"Cu": 1, "NH3": 2}, 7.47),
+                       "Cu(NH3)3": Complex({"Cu": 1, "NH3": 3}, 10.27), "Cu(NH3)4": Complex({"Cu": 1, "NH3": 4}, 11.75)})
+
+def test_copper_ammonia_example():
+    solution = copper_ammonia_bath().solve()
+    concentrations = solution.concentrations
+    
+    assert solution.success
+    assert round(solution.pH, 2) == 11.02
+    copper = concentrations["Cu"] + sum(concentrations[name] for name in ("CuNH3", "Cu(NH3)2", "Cu(NH3)3", "Cu(NH3)4"))
+    assert copper == pytest.approx(0.01, rel=1e-9)
+
+def test_plain_acid_agrees_with_System():
+    phosphoric_acid = Acid(pKa=[2.148, 7.198, 12.375], charge=0, conc=0.05)
+    sodium = NonReactive(charge=1, conc=0.07)
+    
+    solution = Speciation({"PO4": phosphoric_acid, "Na": sodium}).solve()
+    
+    assert solution.success
+    assert solution.pH == pytest.approx(System([phosphoric_acid, sodium]).pHsolve(tol=1e-13), abs=1e-9)
+
+def test_fixed_pH():
+    acetic_acid = Acid(pKa=4.76, charge=0, conc=0.1)
+    
+    solution = Speciation({"Ac": acetic_acid}).solve(pH=5.76)
+    concentrations = solution.concentrations
+    
+    assert solution.success
+    assert solution.pH == 5.76
+    assert concentrations["Ac"] + concentrations["HAc"] == pytest.approx(0.1, rel=1e-9)
+    # one pH unit above the pKa there is 10 times more of the base
+    assert concentrations["Ac"] / concentrations["HAc"] == pytest.approx(10., rel=1e-9)
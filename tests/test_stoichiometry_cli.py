@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+
+import stoichiometry.__main__ as cli
+from stoichiometry.__main__ import balance_stream, main, read_records
+
+
+def stream(text, record_format, chunk_size=2, **kwargs):
+    output = io.StringIO()
+    summary = balance_stream(read_records(io.StringIO(text), record_format, **kwargs), output, record_format,
+                             workers=0, chunk_size=chunk_size, **kwargs)
+    return [json.loads(line) for line in output.getvalue().splitlines()], summary
+
+def test_jsonl_with_malformed_lines():
+    text = "\n".join(['"h2+o2=h2o"', '{"reaction": "fe+o2=>fe2o3"}', 'not json', '{"other": "h2+o2=h2o"}',
+                      '{"reaction": 5}', '', '"a+b"'])
+    lines, summary = stream(text, "jsonl")
+    
+    assert [line["index"] for line in lines] == list(range(6))
+    assert lines[0]["balanced"] == "2H2 + O2 => 2H2O"
+    assert lines[1] == {"index": 1, "reaction": "fe+o2=>fe2o3", "balanced": "4Fe + 3O2 => 2Fe2O3"}
+    assert lines[2]["error"].startswith("JSONDecodeError: ")
+    assert lines[2]["reaction"] == "not json"
+    assert lines[3]["error"] == "KeyError: 'reaction'"
+    assert lines[4]["error"] == "TypeError: Expected a reaction string, got int"
+    assert "error" in lines[5] and "balanced" not in lines[5]
+    assert (summary["reactions"], summary["errors"]) == (6, 4)
+
+def test_csv_with_a_custom_column_and_short_rows():
+    text = "id,equation\n1,h2+o2=h2o\n\n2\n3,na+cl2=nacl\n"
+    lines, summary = stream(text, "csv", field="equation")
+    
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert lines[0]["balanced"] == "2H2 + O2 => 2H2O"
+    assert lines[1]["error"] == "KeyError: 'equation'"
+    assert lines[2]["balanced"] == "2Na + Cl2 => 2NaCl"
+    assert summary["errors"] == 1
+
+def test_csv_without_the_column_is_rejected_before_streaming():
+    with pytest.raises(ValueError, match="no column named reaction"):
+        read_records(io.StringIO("a,b\n1,2\n"), "csv")
+
+def test_bad_arguments_are_usage_errors(tmp_path, capsys):
+    path = tmp_path / "reactions.csv"
+    path.write_text("a,b\nh2+o2=h2o,\n")
+    
+    for argv in ([str(path)], [str(path), "--field", "a", "--chunk-size", "0"]):
+        with pytest.raises(SystemExit) as exit_info:
+            main(argv + ["--quiet"])
+        assert exit_info.value.code == 2
+    assert "error:" in capsys.readouterr().err
+
+def test_unexpected_errors_are_not_usage_errors(tmp_path, monkeypatch):
+    path = tmp_path / "reactions.txt"
+    path.write_text("h2+o2=h2o\n")
+    
+    def failing_stream(*args, **kwargs):
+        raise ValueError("something broke")
+    monkeypatch.setattr(cli, "balance_stream", failing_stream)
+    
+    with pytest.raises(ValueError, match="something broke"):
+        main([str(path), "--workers", "0", "--quiet", "-o", str(tmp_path / "out.jsonl")])
@@ -0,0 +1,115 @@
+import math
+
+from utils.import_utils import lazy_import
+
+np = lazy_import("numpy")
+
+
+###### Greatest common divisor ######
+
+# One left fold with `math.gcd` over the values - zeros don't change the result and the result is never negative
+def gcd_of_values(values):
+    """
+    Args:
+        values (iterable) - integers - python integers of any size or numpy integers
+
+    Returns (int):
+        the greatest common divisor of all the values - 0 if every value is 0 or there are no values
+
+    Example:
+        >>>gcd_of_values([1000, -100, 0, 10])
+        10
+        >>>gcd_of_values(np.array([6, 9, 12]))
+        3
+    """
+    # numpy integers are reduced in numpy
+    if hasattr(values, "dtype") and values.dtype != object:
+        return int(np.gcd.reduce(values, axis=None)) if values.size > 0 else 0
+
+    return math.gcd(*values)
+
+
+###### Coefficient reduction ######
+
+def reduce_coefficients(coefficients):
+    """
+    Args:
+        coefficients (list or np.array) - integer coefficients, e.g. of a balanced reaction
+
+    Returns (list or np.array):
+        the coefficients divided by their greatest common divisor - the same type as the input, and a vector
+        of zeros is returned as it is
+
+    Example:
+        >>>reduce_coefficients([4, -2, 0, 6])
+        [2, -1, 0, 3]
+        >>>reduce_coefficients(np.array([5, 588, 1399]) * 3)
+        array([  5, 588, 1399])
+    """
+    content = gcd_of_values(coefficients)
+    if content <= 1:
+        return coefficients
+
+    if hasattr(coefficients, "dtype"):
+        return coefficients // content
+
+    return [value // content for value in coefficients]
+
+# Vectorized `reduce_coefficients` for a whole batch of coefficient rows
+def reduce_coefficient_rows(rows):
+    """
+    Args:
+        rows (np.array) - integer array of shape (k, N) - int64, or object for python integers
+
+    Returns (np.array):
+        every row divided by the greatest common divisor of its entries - rows of zeros are left as they are
+
+    Example:
+        >>>reduce_coefficient_rows(np.array([[4, -2, 6], [0, 0, 0], [3, 5, 7]]))
+        array([[ 2, -1,  3],
+               [ 0,  0,  0],
+               [ 3,  5,  7]])
+    """
+    rows = np.asarray(rows)
+    content = np.gcd.reduce(rows, axis=-1, keepdims=True)
+    if rows.dtype == object:
+        content = np.abs(content)
+    content[content == 0] = 1
+
+    return rows // content
+
+
+###### Integer arrays ######
+
+# int64 holds every integer with an absolute value below this
+INT64_BOUND = 2**63
+
+# `np.array` silently turns integers above int64 into floats - e.g. np.array([2**63, 1]) is float64
+def integer_array(values):
+    """
+    Args:
+        values (list) - python integers, or nested lists of them
+        
+    Returns (np.array):
+        int64 array if every value fits in int64, otherwise an object array of the python integers - no value is ever
+        rounded, so a value that isn't an integer, e.g. 1.5 or 2.0, is a TypeError
+        
+    Example:
+        >>>integer_array([2, 1, -2]).dtype
+        dtype('int64')
+        >>>integer_array([2**63, 1])
+        array([9223372036854775808, 1], dtype=object)
+    """
+    # numpy only picks int64 if every value fits
+    array = np.array(values)
+    if array.dtype == np.int64 or array.size == 0:
+        return array.astype(np.int64)
+    
+    # anything else may be python integers too large for int64, which numpy turns into floats
+    array = np.array(values, dtype=object)
+    for value in array.flat:
+        if not isinstance(value, (int, np.integer)):
+            raise TypeError(f"Expected integers, got {value!r} of type {type(value).__name__}")
+    if max(abs(value) for value in array.flat) < INT64_BOUND:
+        return array.astype(np.int64)
+    return array
@@ -1,36 +1,58 @@
-from global_vars import MODIFIEDPTABLENAMELOWER
+from functools import lru_cache
+
+from global_vars import MODIFIEDPTABLETRIE, PTABLETRIE, AMBIGUOUSPTABLENAME
+from utils.lexer_utils import (tokenize_reaction, format_tokens, compounds_from_tokens,
+                               separate_states_of_matter)
 
 ###### Automatic Capitalization ######
-def capitalizer_helper_func(alphabetic_piece):
-    alphabetic_piece_length = len(alphabetic_piece)
-    new_alphabetic_piece = ""
-    skip = False
-    
-    for i in range(alphabetic_piece_length):
-        if skip:
-            skip = False
+
+# Capitalizes a lowercase run in one pass - the longest symbol in the trie is taken at every position
+def segment_lowercase(text, trie=MODIFIEDPTABLETRIE):
+    """
+    Args:
+        text (str) - lowercase formula - characters that don't start a symbol are just upper cased
+        trie (dict) - symbol trie - see `build_symbol_trie` in `global_vars`
+        
+    Returns (str):
+        the capitalized formula
+        
+    Example:
+        >>>segment_lowercase("c6h12o6")
+        'C6H12O6'
+        >>>segment_lowercase("[cr(n2h4co)6]4")
+        '[Cr(N2H4CO)6]4'
+    """
+    pieces = []
+    i = 0
+    length = len(text)
+    
+    while i < length:
+        node = trie.get(text[i])
+        if node is None:
+            pieces.append(text[i].upper())
+            i += 1
             continue
         
-        if (i + 1) < alphabetic_piece_length:
-            
-            if alphabetic_piece[i:i+2] in MODIFIEDPTABLENAMELOWER:
-                skip = True
-                new_alphabetic_piece += alphabetic_piece[i].upper() + alphabetic_piece[i+1]
-                continue
-            
-            else:
-                new_alphabetic_piece += alphabetic_piece[i].upper()
-                continue
+        # walk down the trie and remember the longest symbol on the way
+        symbol = node.get("", text[i].upper())
+        end = i + 1
+        j = i + 1
+        while j < length:
+            node = node.get(text[j])
+            if node is None:
+                break
+            j += 1
+            if "" in node:
+                symbol = node[""]
+                end = j
         
-        # last character
-        else:
-            # only character
-            if (i == 0) or alphabetic_piece[i-1].islower():
-                new_alphabetic_piece += alphabetic_piece[i].upper()
-            else:
-                new_alphabetic_piece += alphabetic_piece[i]
+        pieces.append(symbol)
+        i = end
     
-    return new_alphabetic_piece
+    return "".join(pieces)
+
+def capitalizer_helper_func(alphabetic_piece):
+    return segment_lowercase(alphabetic_piece)
 
 def capitalizer(compound):
     """
@@ -55,33 +77,104 @@ def capitalizer(compound):
     if (compound == "e^-"):
         return compound
     
-    # constants
-    molecule_length = len(compound)
-    alphabetic_piece = ""
-    new_compound = ""
-    
-    # find non-numeric values
-    for i in range(molecule_length):
-        # non-alphabetic characters
-        if (not compound[i].isalpha()):
-            
-            # use capitalizer function
-            if len(alphabetic_piece) > 0:
-                new_compound += capitalizer_helper_func(alphabetic_piece)
-                alphabetic_piece = ""
-            new_compound += compound[i]
-            continue
+    return segment_lowercase(compound)
+
+
+###### Segmentation ######
+
+# Costs of the segmentation - every symbol costs 1, so fewer and longer symbols are preferred
+AMBIGUOUS_SYMBOL_PENALTY = 1.5
+UNKNOWN_LETTER_COST = 10.
+
+AMBIGUOUS_SYMBOLS = frozenset(AMBIGUOUSPTABLENAME)
+
+# The k cheapest segmentations of `text[i:]` for every i, as back pointers - ties are kept in the order they are found
+def _k_best_segmentations(text, k, trie):
+    length = len(text)
+    # best[i] = [(cost, piece, next position, rank in best[next position]), ...]
+    best = [None] * length + [[(0., "", length, 0)]]
+    
+    for i in range(length - 1, -1, -1):
+        # the pieces that can start at i - longest first, so ties go to the greedy longest symbol
+        pieces = []
+        node = trie.get(text[i])
+        if node is None:
+            cost = UNKNOWN_LETTER_COST if text[i].isalpha() else 0.
+            pieces.append((text[i].upper(), i + 1, cost))
+        else:
+            j = i
+            while node is not None:
+                j += 1
+                if "" in node:
+                    symbol = node[""]
+                    pieces.append((symbol, j, 1. + AMBIGUOUS_SYMBOL_PENALTY * (symbol in AMBIGUOUS_SYMBOLS)))
+                node = node.get(text[j]) if j < length else None
+            if not pieces:
+                pieces.append((text[i].upper(), i + 1, UNKNOWN_LETTER_COST))
+            pieces.reverse()
         
-        # is alphabetic
-        elif compound[i].isalpha():
-            alphabetic_piece += compound[i]
-            continue
+        candidates = [(cost + best[j][rank][0], piece, j, rank)
+                      for piece, j, cost in pieces for rank in range(len(best[j]))]
+        # sorted is stable, so equal costs keep the longest first order
+        best[i] = sorted(candidates, key=lambda candidate: candidate[0])[:k]
     
-    # if the last character is an alphabetic one
-    if len(alphabetic_piece) > 0:
-        new_compound += capitalizer_helper_func(alphabetic_piece)
+    return best
+
+# The k best capitalizations of a lowercase formula, best first
+@lru_cache(maxsize=4096)
+def segment_formula(text, k=1):
+    """
+    Args:
+        text (str) - lowercase formula, e.g. `co2` - characters that aren't letters are kept as they are
+        k (int) - the number of segmentations to return
+        
+    Returns (tuple):
+        up to k tuples of (capitalized formula, cost) - the cost is the number of symbols with a penalty for
+        the ambiguous symbols (Co, Po, Cf, No, Cn, Nh) and for letters that aren't part of any symbol
+        
+    Example:
+        >>>segment_formula("co2", 2)
+        (('CO2', 2.0), ('Co2', 2.5))
+        >>>segment_formula("hfe")
+        (('HFe', 2.0),)
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    
+    best = _k_best_segmentations(text, k, PTABLETRIE)
+    
+    segmentations = []
+    for rank in range(len(best[0])):
+        pieces = []
+        i = 0
+        cost = best[0][rank][0]
+        while i < len(text):
+            _, piece, i, rank = best[i][rank]
+            pieces.append(piece)
+        segmentations.append(("".join(pieces), cost))
+    
+    return tuple(segmentations)
+
+def capitalization_candidates(compound, k=3):
+    """
+    Args:
+        compound (str) - compound without coefficient and state of matter
+        k (int) - the maximum number of candidates
+        
+    Returns (list):
+        the k best capitalizations of the compound, best first, as (capitalized compound, cost) - see `segment_formula`
+        
+    Example:
+        >>>capitalization_candidates("cocl2")
+        [('COCl2', 3.0), ('CoCl2', 3.5), ('COCL2', 13.0)]
+        >>>capitalization_candidates("CoCl2")
+        [('CoCl2', 0.0)]
+    """
+    # the user already capitalized the compound
+    if any(c.isupper() for c in compound) or compound == "e^-":
+        return [(compound, 0.)]
     
-    return new_compound
+    return list(segment_formula(compound, k))
 
 
 ###### Latex formatting ######
@@ -210,78 +303,7 @@ def add_spaces(reaction):
         >>>add_spaces("[Cr(N2H4CO)6]4[Cr(CN)6]3(S)+MnO4^-(AQ)+H2O=Cr2O7^2-(AQ)+CO2(G)+NO3^-(AQ)+Mn^2+(AQ)+H^+")
         '[Cr(N2H4CO)6]4[Cr(CN)6]3(S) + MnO4^-(AQ) + H2O => Cr2O7^2-(AQ) + CO2(G) + NO3^-(AQ) + Mn^2+(AQ) + H^+'
     """
-    
-    new_reaction = ""
-    
-    for i in range(len(reaction)):        
-        if i > 0 and (i + 1) < len(reaction):
-            
-            # if not A^x+ and no spaces
-            if (i > 1) and reaction[i] == "+" and (not reaction[i-2] == "^") and (not reaction[i-1].isspace()) and (not reaction[i-1] == "^"):
-                new_reaction += " +"
-                
-                if not reaction[i+1].isspace():
-                    new_reaction += " "
-                continue
-            
-            # if A^++ or A^-+
-            if (i > 1) and reaction[i] == "+" and (reaction[i-1] == "+" or reaction[i-1] == "-"):
-                new_reaction += " +"
-                if not reaction[i+1].isspace():
-                    new_reaction += " "
-                continue
-            
-            # if + and then not a space make sure the next characters aren't the states of matter and then add a space
-            if reaction[i] == "+" and (not reaction[i+1].isspace()):
-                if reaction[i+1] == "(":
-                    new_reaction += reaction[i]
-                    continue
-                else:
-                    new_reaction += reaction[i] + " "
-                    continue
-                    
-        
-        # second to last character
-        if (i + 1) < len(reaction):
-            if reaction[i] == "=" and (not reaction[i+1] == ">"):
-                new_reaction += "=>"
-                continue
-            
-            
-            # This is based on the assumption that no charge will have more than 1 digit
-            elif reaction[i] == "+":
-                if i > 1:
-                    if (not reaction[i-2] == "^") and (not reaction[i-1] == "^"):
-                        new_reaction += " + "
-                        continue
-                elif i > 0:
-                    if (not reaction[i-1] == "^"):
-                        new_reaction += " + "
-                        continue          
-        
-        # last character
-        else:
-            if reaction[i] == "=":
-                new_reaction += "=>"
-                continue
-            elif reaction[i] == "+":
-                if i > 1:
-                    if (not reaction[i-2] == "^") and (not reaction[i-1] == "^"):
-                        new_reaction += " + "
-                        continue
-                elif i > 0:
-                    if (not reaction[i-1] == "^"):
-                        new_reaction += " + "
-                        continue   
-                
-        
-        # add the character at each loop unless continue has been used
-        new_reaction += reaction[i]
-    
-    new_reaction = new_reaction.replace("=>", " => ")
-    
-    # having to call RemoveSpaces each time each time AddSpaces is used is probably not optimal
-    return remove_spaces(new_reaction)
+    return format_tokens(tokenize_reaction(reaction))
 
 
 
@@ -321,79 +343,11 @@ def number_of_pluses_before_an_equal(reaction):
                 
     return number_of
 
-# Separates states of matter from compunds - note that this function is an exact copy of the one in `reaction_info_utils.py`
-def separate_states_of_matter(compound_list):
-    """
-    Args: 
-        compund_list (list) - list of compounds - can be capitalized or non-capitalized
-    
-    Returns (tuple):
-        new_compound_list (list) - compund list without states of matter
-        states_of_matter_list (list) - list of the states of matter
-            
-    Example:
-        >>>separate_states_of_matter(["h2o(g)", "C6H12O6(aq)", "CH3CH2(CHO)CH3(heptane)"])
-        (['h2o', 'C6H12O6', 'CH3CH2(CHO)CH3'], ['(g)', '(aq)', '(heptane)'])
-    """
-    
-    # Make sure there are no arrows in the reaction
-    t_list = []
-    for compound in compound_list:
-        t = compound.replace("=>", "")
-        t_list += [t.strip()]
-    
-    compound_list = t_list
-    
-
-    new_compound_list = []
-    states_of_matter_list = []
-    
-    # Essentially just reverses the compound string and checks for **normal parentheses** i.e. `(` and `)`
-    for compound in compound_list:
-        number_of_left = 0        
-        number_of_right = 0
-        
-        first = True
-        
-        number_of_char = 0
-        
-        for char in reversed(compound):
-            if first and (char != ")"):
-                break
-            elif first:
-                first = False
-                number_of_right += 1
-                number_of_char += 1
-                
-            elif number_of_right == number_of_left:
-                break
-                
-            elif char == ")":
-                number_of_right += 1
-                number_of_char += 1
-                
-            elif char == "(":
-                number_of_left += 1
-                number_of_char += 1
-                
-            else:
-                number_of_char += 1
-        
-        if number_of_char > 0:
-            new_compound_list += [compound[:-number_of_char]]
-            states_of_matter_list += [compound[-number_of_char:]]
-        else:
-            new_compound_list += [compound]
-            states_of_matter_list += [""]
-            
-    
-    return new_compound_list, states_of_matter_list
-
 # format full reaction
 def format_full_reaction(reaction):
     """
     Args:
-        reaction (str) - unformatted reaction
+        reaction (str or Reaction) - unformatted reaction or a parsed reaction - see `Reaction`
         
     Returns (str):
         Latex formatted reaction - with 
@@ -402,29 +356,22 @@ def format_full_reaction(reaction):
         >>>format_full_reaction("cr7n66h96c42o24+mno4^-+h2o=>cr2o7^2-+mn^2++co2+no3^-+h3o^+")
         'Cr_{7}N_{66}H_{96}C_{42}O_{24} + MnO_{4}^{-} + H_{2}O => Cr_{2}O_{7}^{2-} + Mn^{2+} + CO_{2} + NO_{3}^{-} + H_{3}O^{+}'
     """
-    # would probably be optimal if this formatter and the formatter used in the actual
-    # solver were the same, since possible errors would be more transparent for the user
+    # a parsed `Reaction` already holds its compounds
+    if isinstance(reaction, str):
+        compounds = compounds_from_tokens(tokenize_reaction(reaction))
+    else:
+        compounds = reaction.compounds
     
-    new_reaction = add_spaces(remove_spaces(reaction))
-
-    n_pluses = number_of_pluses_before_an_equal(new_reaction)
-    new_reac_compound_list = formatter_reaction_splitter(new_reaction)
-    new_reac_compound_list_wo_states, states_of_matter_list = separate_states_of_matter(new_reac_compound_list)
-        
     formatted_reaction = ""
     
-    for i, compound in enumerate(new_reac_compound_list_wo_states):
-        if n_pluses == 0 and "=>" in new_reaction and i > 0:
+    for i, compound in enumerate(compounds):
+        if i > 0 and compound.is_product and (not compounds[i-1].is_product):
             formatted_reaction += " => "
-            n_pluses -= 1
-        elif i > 0 and n_pluses > 0:
-            formatted_reaction += " + "
-            n_pluses -= 1
-        elif n_pluses < 0:
+        elif i > 0:
             formatted_reaction += " + "
         
-        formatted_reaction += capitalizer(format_sub_sup_reaction(compound)) 
-        formatted_reaction += states_of_matter_list[i]
+        formatted_reaction += capitalizer(format_sub_sup_reaction(compound.coefficient + compound.formula))
+        formatted_reaction += compound.state
         
     return formatted_reaction
     
@@ -0,0 +1,55 @@
+import importlib
+
+# Heavy dependencies (numpy, scipy, matplotlib) are only imported the first time they're used, so importing
+# the packages stays cheap for the calls that never need them
+class LazyModule():
+    """
+    Stands in for a module until one of its attributes is used - then the module is imported.
+    
+    Args:
+        name (str) - the full name of the module, e.g. "scipy.optimize"
+        
+    Example:
+        >>>np = LazyModule("numpy")
+        >>>np.arange(3)
+        array([0, 1, 2])
+    """
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+    
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attribute):
+        value = getattr(self._load(), attribute)
+        
+        # the attribute is kept on the stand-in, so later lookups don't go through `__getattr__`
+        self.__dict__[attribute] = value
+        return value
+    
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+        self.__dict__[attribute] = value
+    
+    def __dir__(self):
+        return dir(self._load())
+    
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"LazyModule: \n\tname={self._name} \n\t{state}"
+
+def lazy_import(name):
+    """
+    Args:
+        name (str) - the full name of the module
+        
+    Returns (LazyModule):
+        stand-in that imports the module the first time it's used
+        
+    Example:
+        >>>spo = lazy_import("scipy.optimize")
+    """
+    return LazyModule(name)
@@ -0,0 +1,217 @@
+import re
+from collections import namedtuple
+
+
+###### Tokens ######
+
+# Token kinds
+COEFFICIENT = "coefficient"
+FORMULA = "formula"
+CHARGE = "charge"
+STATE = "state"
+PLUS = "plus"
+ARROW = "arrow"
+
+Token = namedtuple("Token", ["kind", "text"])
+
+# One compound as read from the token stream - `formula` includes the charge, e.g. `MnO4^-`
+LexedCompound = namedtuple("LexedCompound", ["coefficient", "formula", "state", "is_product"])
+
+# a formula is letters, digits, brackets and `·`/`*` of hydrates - a parenthesized group may also hold `-`, `,` and `'`,
+# for states of matter like `(oktan-1-ol)`
+_FORMULA_PIECE = r"\([\w,'-]+\)|[()]|[A-Za-z0-9\[\]{}·*]+"
+# an arrow | a plus | a whole compound - a `+` right after `^` and the charge digits is the sign of the charge,
+# so is anything inside a latex charge `^{2+}`, and whitespace is only part of a compound if more of the compound follows it
+REACTION_PATTERN = re.compile(r"\s*(?:(<=>|=>?)|(\+)|((?:\^\{[^}]*\}|\^\d*[+-]?|" + _FORMULA_PIECE
+                              + r"|\s+(?=[A-Za-z0-9()\[\]{}·*^]))+))")
+CHARGE_SPLIT_PATTERN = re.compile(r"(\^\{[^}]*\}|\^\d*[+-]?)")
+_ARROW, _PLUS, _COMPOUND = 1, 2, 3
+
+
+###### States of matter ######
+
+# Splits the trailing parenthesized group, e.g. `(aq)`, off a compound
+def split_state_of_matter(compound):
+    """
+    Args:
+        compound (str) - compound with or without a state of matter
+
+    Returns (tuple):
+        compound (str) - the compound without the state of matter
+        state_of_matter (str) - the state of matter or "" if there is none
+
+    Example:
+        >>>split_state_of_matter("CH3CH2(CHO)CH3(heptane)")
+        ('CH3CH2(CHO)CH3', '(heptane)')
+        >>>split_state_of_matter("Ca(OH)2")
+        ('Ca(OH)2', '')
+    """
+    if not compound.endswith(")"):
+        return compound, ""
+
+    # walk backwards from the last `)` until the parentheses are balanced
+    depth = 0
+    for i in range(len(compound) - 1, -1, -1):
+        if compound[i] == ")":
+            depth += 1
+        elif compound[i] == "(":
+            depth -= 1
+            if depth == 0:
+                return compound[:i], compound[i:]
+
+    # unbalanced - everything is treated as the state of matter
+    return "", compound
+
+# Separates states of matter from compounds
+def separate_states_of_matter(compound_list):
+    """
+    Args:
+        compund_list (list) - list of compounds - can be capitalized or non-capitalized
+
+    Returns (tuple):
+        new_compound_list (list) - compund list without states of matter
+        states_of_matter_list (list) - list of the states of matter
+
+    Example:
+        >>>separate_states_of_matter(["h2o(g)", "C6H12O6(aq)", "CH3CH2(CHO)CH3(heptane)"])
+        (['h2o', 'C6H12O6', 'CH3CH2(CHO)CH3'], ['(g)', '(aq)', '(heptane)'])
+    """
+    new_compound_list = []
+    states_of_matter_list = []
+
+    for compound in compound_list:
+        # Make sure there are no arrows in the compound
+        compound, state_of_matter = split_state_of_matter(compound.replace("=>", "").strip())
+        new_compound_list += [compound]
+        states_of_matter_list += [state_of_matter]
+
+    return new_compound_list, states_of_matter_list
+
+
+###### Lexer ######
+
+# Emits the tokens of a single compound
+def _compound_tokens(compound):
+    # whitespace inside a compound is ignored, e.g. `h 2o` is `h2o`
+    compound = "".join(compound.split())
+    formula = compound.lstrip("0123456789")
+    
+    tokens = []
+    if len(formula) < len(compound):
+        tokens.append(Token(COEFFICIENT, compound[:len(compound) - len(formula)]))
+    
+    # formulas and charges alternate, e.g. ['MnO4', '^-', '(aq)']
+    pieces = CHARGE_SPLIT_PATTERN.split(formula)
+    pieces[-1], state_of_matter = split_state_of_matter(pieces[-1])
+    
+    for i, piece in enumerate(pieces):
+        if i % 2:
+            tokens.append(Token(CHARGE, piece))
+        elif piece:
+            tokens.append(Token(FORMULA, piece))
+    
+    if state_of_matter:
+        tokens.append(Token(STATE, state_of_matter))
+    
+    return tokens
+
+# Reads a reaction of any spacing into tokens in one pass
+def tokenize_reaction(reaction):
+    """
+    Args:
+        reaction (str) - reaction of any formatting - `=`, `=>` and `<=>` are all read as the reaction arrow
+
+    Returns (list):
+        list of `Token`s - the kinds are COEFFICIENT, FORMULA, CHARGE, STATE, PLUS and ARROW - a ValueError if the
+        reaction has a character that is none of these, e.g. `<` outside of `<=>`
+
+    Example:
+        >>>[token.text for token in tokenize_reaction("2h2+o2=2h2o(l)")]
+        ['2', 'h2', '+', 'o2', '=>', '2', 'h2o', '(l)']
+        >>>[token.kind for token in tokenize_reaction("mn^2++fe")]
+        ['formula', 'charge', 'plus', 'formula']
+    """
+    tokens = []
+    end = 0
+    
+    for match in REACTION_PATTERN.finditer(reaction):
+        if match.start() != end:
+            break
+        end = match.end()
+        group = match.lastindex
+        
+        if group == _COMPOUND:
+            tokens += _compound_tokens(match.group(_COMPOUND))
+        elif group == _ARROW:
+            tokens.append(Token(ARROW, "=>"))
+        elif group == _PLUS:
+            tokens.append(Token(PLUS, "+"))
+    
+    # the matches have to cover the whole reaction, so nothing is skipped or glued onto a formula
+    if reaction[end:].strip():
+        position = end + len(reaction[end:]) - len(reaction[end:].lstrip())
+        raise ValueError(f"Unexpected character {reaction[position]!r} at position {position} of the reaction: {reaction}")
+    
+    return tokens
+
+# Turns tokens back into a reaction with the standard spacing
+def format_tokens(tokens):
+    """
+    Args:
+        tokens (list) - see `tokenize_reaction`
+
+    Returns (str):
+        reaction with ` + ` between compounds and ` => ` as the reaction arrow
+
+    Example:
+        >>>format_tokens(tokenize_reaction("na^++cl^-=nacl"))
+        'na^+ + cl^- => nacl'
+    """
+    parts = []
+    for token in tokens:
+        if token.kind == PLUS:
+            parts.append(" + ")
+        elif token.kind == ARROW:
+            parts.append(" => ")
+        else:
+            parts.append(token.text)
+
+    return "".join(parts).strip()
+
+# Groups the tokens into compounds
+def compounds_from_tokens(tokens, separate_states=True):
+    """
+    Args:
+        tokens (list) - see `tokenize_reaction`
+        separate_states (bool) - if False the state of matter is left on the formula
+
+    Returns (list):
+        list of `LexedCompound`s - `is_product` is True for compounds after the reaction arrow
+
+    Example:
+        >>>compounds_from_tokens(tokenize_reaction("2na(s) + cl2(g) => 2nacl(s)"))[0]
+        LexedCompound(coefficient='2', formula='na', state='(s)', is_product=False)
+    """
+    compounds = []
+    coefficient = ""
+    formula = ""
+    state_of_matter = ""
+    is_product = False
+
+    for token in tokens + [Token(PLUS, "")]:
+        if token.kind == PLUS or token.kind == ARROW:
+            if coefficient or formula or state_of_matter:
+                if not separate_states:
+                    formula, state_of_matter = formula + state_of_matter, ""
+                compounds.append(LexedCompound(coefficient, formula, state_of_matter, is_product))
+            coefficient = formula = state_of_matter = ""
+            is_product = is_product or token.kind == ARROW
+
+        elif token.kind == COEFFICIENT:
+            coefficient = token.text
+        elif token.kind == STATE:
+            state_of_matter = token.text
+        else:
+            formula += token.text
+
+    return compounds
@@ -1,4 +1,9 @@
-import numpy as np
+import math
+
+from utils.coefficient_utils import gcd_of_values, reduce_coefficient_rows
+from utils.import_utils import lazy_import
+
+np = lazy_import("numpy")
 
 def gcd(a,b):
     """
@@ -7,7 +12,7 @@ def gcd(a,b):
         b (int) - second number
     
     Returns (int):
-        The gcd of a and b
+        The gcd of a and b - see `gcd_of_values`
         
     Example:
         >>> a = 2025
@@ -15,21 +20,9 @@ def gcd(a,b):
         >>> gcd(a,b)
         225
     """
-    # make sure b > a
-    if a > b:
-        t = a
-        a = b
-        b = t    
+    return gcd_of_values([a, b])
     
-    # if b is congruent to 0 mod a, then a is the gcd
-    if (b % a) == 0:
-        return a
-    
-    # if not, then take 1 step using euclids algorithm
-    else:
-        return gcd(a,b%a)
-    
-# Uses the 'gcd' function to find gcd of multiple numbers
+# Finds the gcd of multiple numbers - see `gcd_of_values`
 def GCDOfMultipleNums(num_list):
     """
     Args:
@@ -43,115 +36,452 @@ def GCDOfMultipleNums(num_list):
         >>> GCDOfMultipleNums(num_list)
         10
     """
-    gcd_list = []
-    for i in range(len(num_list) - 1):
-        for j in range(len(num_list) - i):
-            gcd_list += [gcd(num_list[i], num_list[i+j])]
+    return gcd_of_values(num_list)
+
+
+###### Exact null space ######
+
+# the gcd of a whole list - zeros are ignored and the result is always non-negative
+# (the same fold as `gcd_of_values`, without the numpy check, since it runs for every row operation)
+def _content(values):
+    return math.gcd(*values)
+
+# Makes sure the matrix only contains integers - the chemical composition matrix is stored as floats
+def integer_matrix(matrix):
+    """
+    Args:
+        matrix (np.array or list) - matrix with integer valued entries
+        
+    Returns (list):
+        the matrix as a list of rows of python integers
+        
+    Example:
+        >>>integer_matrix(np.array([[2., 0., 2.], [0., 2., 1.]]))
+        [[2, 0, 2], [0, 2, 1]]
+    """
+    # plain python numbers are a lot faster to work with than numpy scalars
+    if hasattr(matrix, "tolist"):
+        matrix = matrix.tolist()
+    
+    rows = []
+    for row in matrix:
+        new_row = [int(value) for value in row]
+        if new_row != row:
+            raise ValueError(f"The matrix has a non-integer entry in the row: {row}")
+        rows += [new_row]
+    
+    return rows
+
+# Fraction-free Gauss-Jordan elimination - every row is divided by its content so the numbers stay small
+def integer_row_reduce(matrix):
+    """
+    Args:
+        matrix (list) - list of rows of integers
+        
+    Returns (tuple):
+        rows (list) - the non-zero rows of the integer reduced row echelon form
+        pivot_columns (list) - the pivot column of each row
+        
+    Example:
+        >>>integer_row_reduce([[2, 0, 2], [0, 2, 1]])
+        ([[1, 0, 1], [0, 2, 1]], [0, 1])
+    """
+    rows = []
+    for row in matrix:
+        if any(row):
+            content = _content(row)
+            rows += [[value // content for value in row]]
+    
+    number_of_columns = len(matrix[0]) if len(matrix) > 0 else 0
+    pivot_columns = []
+    pivot_row = 0
+    
+    for column in range(number_of_columns):
+        # the smallest non-zero pivot keeps the numbers small
+        candidates = [r for r in range(pivot_row, len(rows)) if rows[r][column] != 0]
+        if len(candidates) == 0:
+            continue
+        best = min(candidates, key=lambda r: abs(rows[r][column]))
+        rows[pivot_row], rows[best] = rows[best], rows[pivot_row]
+        
+        pivot = rows[pivot_row]
+        p = pivot[column]
+        
+        for r in range(len(rows)):
+            if r == pivot_row or rows[r][column] == 0:
+                continue
+            factor = rows[r][column]
+            new_row = [p * a - factor * b for a, b in zip(rows[r], pivot)]
+            content = _content(new_row)
+            if content > 1:
+                new_row = [value // content for value in new_row]
+            rows[r] = new_row
+        
+        pivot_columns += [column]
+        pivot_row += 1
+        if pivot_row == len(rows):
+            break
+    
+    return rows[:pivot_row], pivot_columns
+
+# Reads the null space basis off the integer reduced row echelon form - see `integer_row_reduce`
+def _null_space_from_reduced_rows(rows, pivot_columns, number_of_columns):
+    # positive pivots
+    for i, column in enumerate(pivot_columns):
+        if rows[i][column] < 0:
+            rows[i] = [-value for value in rows[i]]
+    
+    free_columns = [column for column in range(number_of_columns) if column not in pivot_columns]
+    
+    # the lcm of the pivots makes every component of the null space vectors an integer
+    pivot_lcm = 1
+    for i, column in enumerate(pivot_columns):
+        pivot_lcm = pivot_lcm * rows[i][column] // math.gcd(pivot_lcm, rows[i][column])
+    
+    basis = []
+    for free_column in free_columns:
+        vector = [0 for _ in range(number_of_columns)]
+        vector[free_column] = pivot_lcm
+        for i, column in enumerate(pivot_columns):
+            vector[column] = -rows[i][free_column] * (pivot_lcm // rows[i][column])
+        
+        content = _content(vector)
+        vector = [value // content for value in vector]
+        if next(value for value in vector if value != 0) < 0:
+            vector = [-value for value in vector]
+        basis += [vector]
+    
+    return basis
+
+def integer_null_space(matrix):
+    """
+    Args:
+        matrix (np.array or list) - integer valued matrix - e.g. a chemical composition matrix
+        
+    Returns (list):
+        basis of the null space - one list of python integers for each basis vector, where every vector is
+        the smallest integer vector in its direction with its first non-zero entry positive - a matrix without rows
+        has the whole space as its null space, like in `stacked_integer_null_space`
+        
+    Example:
+        >>>integer_null_space(np.array([[2., 0., 2.], [0., 2., 1.]]))
+        [[2, 1, -2]]
+        >>>integer_null_space(np.zeros((0, 2)))
+        [[1, 0], [0, 1]]
+    """
+    integer_rows = integer_matrix(matrix)
+    if len(integer_rows) == 0:
+        # the number of columns is only known from the shape of an array
+        number_of_columns = matrix.shape[1] if getattr(matrix, "ndim", 0) == 2 else 0
+        return [[int(i == j) for j in range(number_of_columns)] for i in range(number_of_columns)]
+    
+    rows, pivot_columns = integer_row_reduce(integer_rows)
+    
+    return _null_space_from_reduced_rows(rows, pivot_columns, len(integer_rows[0]))
+
+# the entries of a stacked elimination are kept below this bound, so `p * a - f * b` can't overflow int64
+STACKED_ELIMINATION_BOUND = 2**30
+
+# Same elimination as `integer_row_reduce`, but for a whole stack of matrices at once in int64 numpy arrays
+def stacked_integer_null_space(matrices):
+    """
+    Args:
+        matrices (np.array) - integer valued array of shape (k, M, N) - e.g. k chemical composition matrices of the same shape
+        
+    Returns (list):
+        the null space basis of each matrix - see `integer_null_space` - the entry is `None` for the matrices whose
+        numbers grew too large for int64, those should be solved with `integer_null_space`
+        
+    Example:
+        >>>stacked_integer_null_space(np.array([[[2., 0., 2.], [0., 2., 1.]], [[1., 1., 0.], [0., 1., 1.]]]))
+        [[[2, 1, -2]], [[1, -1, 1]]]
+    """
+    matrices = np.asarray(matrices)
+    A = matrices.astype(np.int64)
+    if not np.array_equal(A, matrices):
+        raise ValueError("The matrices have non-integer entries")
+    
+    k, M, N = A.shape
+    row_indices = np.arange(M)
+    pivot_row = np.zeros(k, dtype=np.int64)
+    pivot_columns = np.full((k, M), -1, dtype=np.int64)
+    is_exact = np.abs(A).max(axis=(1, 2), initial=0) < STACKED_ELIMINATION_BOUND
+    
+    for column in range(N):
+        available = (row_indices[None, :] >= pivot_row[:, None]) & (A[:, :, column] != 0)
+        has_pivot = available.any(axis=1) & is_exact
+        if not has_pivot.any():
+            continue
+        
+        h = np.nonzero(has_pivot)[0]
+        current_row = pivot_row[h]
+        
+        # the smallest non-zero pivot keeps the numbers small
+        score = np.where(available[h], np.abs(A[h, :, column]), np.iinfo(np.int64).max)
+        best = score.argmin(axis=1)
+        swap = A[h, best].copy()
+        A[h, best] = A[h, current_row]
+        A[h, current_row] = swap
+        
+        pivot = A[h, current_row]
+        factors = A[h, :, column].copy()
+        factors[np.arange(len(h)), current_row] = 0
+        
+        reduced = pivot[:, column, None, None] * A[h] - factors[:, :, None] * pivot[:, None, :]
+        reduced = np.where(factors[:, :, None] != 0, reduced, A[h])
+        A[h] = reduce_coefficient_rows(reduced)
+        
+        pivot_columns[h, current_row] = column
+        pivot_row[h] += 1
+        is_exact[h] = np.abs(A[h]).max(axis=(1, 2)) < STACKED_ELIMINATION_BOUND
+    
+    bases = []
+    for i in range(k):
+        if not is_exact[i]:
+            bases += [None]
+            continue
+        
+        rank = int(pivot_row[i])
+        rows = A[i, :rank].tolist()
+        columns = pivot_columns[i, :rank].tolist()
+        bases += [_null_space_from_reduced_rows(rows, columns, N)]
     
-    return min(gcd_list)
+    return bases
 
 
-# Note: there is definitly a better way to do this - this is just a horrible solution - ...         but it works
-# Make the coefficient integer valued
-def normalize_coefficients(coefficients):
+###### Sparse exact null space ######
+
+# Turns a scipy sparse matrix, a numpy array or a list of rows into rows of {column: integer}
+def sparse_integer_rows(matrix):
+    """
+    Args:
+        matrix (scipy.sparse matrix, np.array or list) - integer valued matrix
+        
+    Returns (tuple):
+        rows (list) - one dict of the non-zero entries, {column: python integer}, for each row
+        number_of_columns (int) - the number of columns of the matrix
+        
+    Example:
+        >>>sparse_integer_rows(scipy.sparse.csr_matrix([[2, 0, 2], [0, 2, 1]]))
+        ([{0: 2, 2: 2}, {1: 2, 2: 1}], 3)
+    """
+    if hasattr(matrix, "tocoo"):
+        coo = matrix.tocoo()
+        number_of_rows, number_of_columns = coo.shape
+        rows = [{} for _ in range(number_of_rows)]
+        for r, c, value in zip(coo.row.tolist(), coo.col.tolist(), coo.data.tolist()):
+            if value != int(value):
+                raise ValueError(f"The matrix has a non-integer entry in the row: {r}")
+            if value != 0:
+                rows[r][c] = rows[r].get(c, 0) + int(value)
+        return rows, number_of_columns
+    
+    dense_rows = integer_matrix(matrix)
+    number_of_columns = len(dense_rows[0]) if len(dense_rows) > 0 else 0
+    return [{c: value for c, value in enumerate(row) if value != 0} for row in dense_rows], number_of_columns
+
+# Same elimination as `integer_row_reduce`, but every row is a dict of its non-zero entries
+def sparse_integer_row_reduce(rows):
     """
     Args:
-        coefficients (list or np.array) - list of coefficients from the `find_null_space_vector` function
+        rows (list) - dicts of the non-zero entries of every row - see `sparse_integer_rows`
         
-    Returns (np.array):
-        numpy array of integerized coefficients
+    Returns (tuple):
+        rows (list) - the non-zero rows of the integer reduced row echelon form as dicts
+        pivot_columns (list) - the pivot column of each row
         
     Example:
-        >>>compounds = ['Cr7N66H96C42O24', 'MnO4^-', 'H3O^+', 'Cr2O7^2-', 'Mn^2+', 'CO2', 'NO3^-', 'H2O']
-        >>>elements = element_finder(c)
-        >>>nv = find_null_space_vector(compounds, elements); nv
-        array([-0.00173861, -0.20446019, -0.48646225,  0.00608512,  0.20446019,
-        0.0730215 ,  0.11474806,  0.81314651])
-        >>>normalize_coefficients(nv / min([abs(v) for v in nv])) # the `/min` part is important
-        array([  -10., -1176., -2798.,    35.,  1176.,   420.,   660.,  4677.])
-        """
-    
-    string_coefficients = [str(coef) for coef in coefficients]
-    new_coefficients = np.array([coef for coef in coefficients])
-    string_decimals = [string_coef.split(".")[1] for string_coef in string_coefficients]
-    repeat = False
-    
-    for i, coef in enumerate(string_coefficients):
-        if not ((coef.index(".") + 1) > len(coef)):
-            if coef[coef.index(".") + 1] != "0" and coef[coef.index(".") + 1] != "9":
-                new_coefficients = new_coefficients * 10
-                repeat = True
-                break
-        
-    if repeat:
-        new_coefficients = normalize_coefficients(new_coefficients)
-        
-    # repeated 0 case
-    for i, decimals in enumerate(string_decimals):
-        if decimals != "":
-            if 0 < len(decimals):
-                if decimals[0] == "0":
-                    
-                    if 1 < len(decimals):
-                        if decimals[1] == "0":
-                        
-                            if 2 < len(decimals):
-                                if decimals[2] == "0":
-                                    
-                                    new_coefficients[i] = float(round(new_coefficients[i]))
-                            
-                                # there are more than 3 decimals: 00x????
-                                else:
-                                    new_coefficients = new_coefficients * 1000
-                                    repeat = True
-                                    break
-                        
-                        # there are 2 decimals: 0x
-                        else:
-                            new_coefficients = new_coefficients * 100
-                            repeat = True
-                            break
-    
-    if repeat:
-        new_coefficients = normalize_coefficients(new_coefficients)
-    
-    # repeated 9 case
-    for i, decimals in enumerate(string_decimals):
-        if decimals != "":
-            if 0 < len(decimals):
-                if decimals[0] == "9":
-                    
-                    if 1 < len(decimals):
-                        if decimals[1] == "9":
-                        
-                            if 2 < len(decimals):
-                                if decimals[2] == "9":
-                                    
-                                    # there are three nines in a row 999????
-                                    new_coefficients[i] = float(round(new_coefficients[i]))
-                            
-                                # there are more than 3 decimals: 99x????
-                                else:
-                                    new_coefficients = new_coefficients * 1000
-                                    repeat = True
-                                    break
-                        
-                        # there are 2 decimals: 9x
-                        else:
-                            new_coefficients = new_coefficients * 100
-                            repeat = True
-                            break 
-                    
-                    # there is a single 9's decimal
+        >>>sparse_integer_row_reduce([{0: 2, 2: 2}, {1: 2, 2: 1}])
+        ([{0: 1, 2: 1}, {1: 2, 2: 1}], [0, 1])
+    """
+    remaining = []
+    for row in rows:
+        row = {c: value for c, value in row.items() if value != 0}
+        if row:
+            content = _content(row.values())
+            remaining += [{c: value // content for c, value in row.items()}]
+    
+    reduced = []
+    pivot_columns = []
+    
+    # the pivot columns are taken from left to right like the dense elimination, so the bases are the same
+    columns = sorted(set(c for row in remaining for c in row))
+    for column in columns:
+        candidates = [row for row in remaining if column in row]
+        if len(candidates) == 0:
+            continue
+        
+        # the smallest non-zero pivot keeps the numbers small
+        pivot = min(candidates, key=lambda row: abs(row[column]))
+        remaining.remove(pivot)
+        p = pivot[column]
+        
+        for group in (remaining, reduced):
+            for i, row in enumerate(group):
+                factor = row.get(column, 0)
+                if factor == 0:
+                    continue
+                
+                new_row = {c: p * value for c, value in row.items()}
+                for c, value in pivot.items():
+                    new_value = new_row.get(c, 0) - factor * value
+                    if new_value == 0:
+                        new_row.pop(c, None)
                     else:
-                        new_coefficients = new_coefficients * 10
-                        repeat = True
-                        break
-         
-    if repeat:
-        new_coefficients = normalize_coefficients(new_coefficients)
+                        new_row[c] = new_value
+                
+                if new_row:
+                    content = _content(new_row.values())
+                    if content > 1:
+                        new_row = {c: value // content for c, value in new_row.items()}
+                group[i] = new_row
+        
+        remaining = [row for row in remaining if row]
+        reduced += [pivot]
+        pivot_columns += [column]
+        if len(remaining) == 0:
+            break
     
+    return reduced, pivot_columns
+
+def sparse_integer_null_space(matrix):
+    """
+    Args:
+        matrix (scipy.sparse matrix, np.array or list) - integer valued matrix - e.g. a sparse chemical composition matrix
+        
+    Returns (list):
+        basis of the null space - one dict, {column: python integer}, of the non-zero entries of each basis vector,
+        ordered by the free column of the vector - the vectors are the same as the ones from `integer_null_space`
+        
+    Example:
+        >>>sparse_integer_null_space(scipy.sparse.csr_matrix([[2, 0, 2], [0, 2, 1]]))
+        [{0: 2, 1: 1, 2: -2}]
+    """
+    rows, number_of_columns = sparse_integer_rows(matrix)
+    rows, pivot_columns = sparse_integer_row_reduce(rows)
+    
+    # positive pivots
+    for i, column in enumerate(pivot_columns):
+        if rows[i][column] < 0:
+            rows[i] = {c: -value for c, value in rows[i].items()}
     
+    # the rows each free column shows up in
+    free_column_rows = {}
+    for i, row in enumerate(rows):
+        for c in row:
+            if c != pivot_columns[i]:
+                free_column_rows.setdefault(c, []).append(i)
     
-    return np.array([coef for coef in new_coefficients])
+    pivot_column_set = set(pivot_columns)
+    basis = []
+    for free_column in range(number_of_columns):
+        if free_column in pivot_column_set:
+            continue
+        
+        # only the pivots of the rows the free column shows up in are needed to make the vector integer
+        pivot_lcm = 1
+        for i in free_column_rows.get(free_column, []):
+            p = rows[i][pivot_columns[i]]
+            pivot_lcm = pivot_lcm * p // math.gcd(pivot_lcm, p)
+        
+        vector = {free_column: pivot_lcm}
+        for i in free_column_rows.get(free_column, []):
+            vector[pivot_columns[i]] = -rows[i][free_column] * (pivot_lcm // rows[i][pivot_columns[i]])
+        
+        content = _content(vector.values())
+        vector = {c: vector[c] // content for c in sorted(vector)}
+        if next(iter(vector.values())) < 0:
+            vector = {c: -value for c, value in vector.items()}
+        basis += [vector]
+    
+    return basis
+
 
+###### Lattice search ######
+
+# every basis vector is multiplied by an integer in [-LATTICE_SEARCH_BOUND, LATTICE_SEARCH_BOUND]
+LATTICE_SEARCH_BOUND = 6
+# the search box is made smaller if it would hold more numbers than this
+LATTICE_SEARCH_MAX_ENTRIES = 10**7
+
+def minimal_null_space_combination(basis, constraints=None, signs=None, bound=LATTICE_SEARCH_BOUND, require_nonzero=True):
+    """
+    Args:
+        basis (list) - integer basis of a null space - see `integer_null_space`
+        constraints (dict) - {index: value} - entries the combination must have, the sign included
+        signs (dict) - {index: 1 or -1} - the signs some entries must have, e.g. the side of the reaction a compound is on
+        bound (int) - the largest multiplier of a basis vector that is tried
+        require_nonzero (bool) - if True every entry of the combination must be non-zero - i.e. every compound takes part
+        
+    Returns (list or None):
+        the smallest integer combination of the basis vectors, by the sum of the absolute values, that fulfils the
+        constraints - its first non-zero entry is positive unless a constraint says otherwise - None if there is none
+        within the bound - a ValueError if even a bound of 1 gives more than `LATTICE_SEARCH_MAX_ENTRIES` entries
+        
+    Example:
+        >>>minimal_null_space_combination([[1, 0, -1, 1], [0, 1, 1, -2]])
+        [1, -1, -2, 3]
+        >>>minimal_null_space_combination([[1, 0, -1, 1], [0, 1, 1, -2]], constraints={0: 2})
+        [2, -1, -3, 4]
+        >>>minimal_null_space_combination([[1, 0, -1, 1], [0, 1, 1, -2]], signs={0: 1, 1: 1, 2: -1})
+        [3, 1, -2, 1]
+    """
+    if len(basis) == 0:
+        return None
+    
+    constraints = constraints or {}
+    signs = signs or {}
+    d = len(basis)
+    N = len(basis[0])
+    
+    # shrink the search box until it fits in memory - even the smallest box has 3^d rows
+    while bound > 1 and (2 * bound + 1)**d * N > LATTICE_SEARCH_MAX_ENTRIES:
+        bound -= 1
+    if (2 * bound + 1)**d * N > LATTICE_SEARCH_MAX_ENTRIES:
+        raise ValueError(f"The null space has {d} dimensions, too many to search for the minimal combination")
+    
+    # python integers are used if int64 could overflow
+    largest = max(abs(value) for vector in basis for value in vector)
+    dtype = np.int64 if largest * bound * d < 2**62 else object
+    B = np.array(basis, dtype=dtype)
+    
+    steps = np.arange(-bound, bound + 1)
+    multipliers = np.stack(np.meshgrid(*[steps for _ in range(d)], indexing="ij"), axis=-1).reshape(-1, d)
+    # v and -v are the same reaction, so only the multipliers whose first non-zero entry is positive are needed
+    first = multipliers[np.arange(len(multipliers)), (multipliers != 0).argmax(axis=1)]
+    multipliers = multipliers[first > 0].astype(dtype)
+    
+    V = reduce_coefficient_rows(multipliers @ B)
+    V = V[(V != 0).any(axis=1)]
+    
+    # orient the vectors - by the first constraint or by the first non-zero entry
+    if len(constraints) > 0:
+        index, value = next(iter(constraints.items()))
+        column = V[:, index]
+        possible = (column != 0)
+        possible[possible] = (value % column[possible]) == 0
+        V = V[possible] * (value // column[possible])[:, None]
+        for index, value in constraints.items():
+            V = V[V[:, index] == value]
+    elif len(signs) > 0:
+        index, sign = next(iter(signs.items()))
+        V = V[V[:, index] != 0]
+        V = V * (np.sign(V[:, index]) * sign)[:, None]
+    else:
+        first = V[np.arange(len(V)), (V != 0).argmax(axis=1)]
+        V = V * np.where(first < 0, -1, 1)[:, None]
+    
+    for index, sign in signs.items():
+        V = V[np.sign(V[:, index]) == sign]
+    
+    if require_nonzero:
+        V = V[(V != 0).all(axis=1)]
+    
+    if len(V) == 0:
+        return None
+    
+    # smallest sum of coefficients - ties go to the smallest largest coefficient
+    absolute = np.abs(V)
+    best = np.lexsort((absolute.max(axis=1), absolute.sum(axis=1)))[0]
+    
+    return [int(value) for value in V[best]]
@@ -1,12 +1,105 @@
-import matplotlib
-import matplotlib.pyplot as plt
+import io
 
-# for plotting text with latex formatting
-def latex_plotter(text, fontsize=18, figsize=(14, 1)):
-    # creates the plot
-    plt.figure(figsize=figsize)
-    plt.text(-0.15, 0.95, "$" + text + "$", fontsize = fontsize, ha="left", va="top")
-    plt.axis("off")
-    plt.show()
+# matplotlib is only imported when something is plotted, and pyplot only when the plot is drawn on a pyplot figure
+
+# The figure and axes to plot on
+def figure_and_axes(ax=None, fmt=None, figsize=None, return_figure=False):
+    """
+    Args:
+        ax (matplotlib.axes.Axes) - plot on these axes if given
+        fmt (str) - the plot is rendered to bytes - pyplot is never used then
+        figsize (tuple) - the size of a new figure - a new pyplot figure is only made if this is given
+        return_figure (bool) - plot on a new figure that pyplot doesn't know about, so it can be returned
+        
+    Returns (tuple):
+        figure (matplotlib.figure.Figure) - the figure
+        ax (matplotlib.axes.Axes) - the axes to plot on
+    """
+    if ax is not None:
+        return ax.figure, ax
+    
+    if fmt is None and not return_figure:
+        import matplotlib.pyplot as plt
+        if figsize is not None:
+            plt.figure(figsize=figsize)
+        ax = plt.gca()
+        return ax.figure, ax
+    
+    # not known to pyplot, so it's garbage collected like any other object
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=figsize)
+    
+    return figure, figure.add_subplot()
 
+# Shows, renders or returns the figure
+def finish_figure(figure, show=True, fmt=None, dpi=None, return_figure=False):
+    """
+    Args:
+        figure (matplotlib.figure.Figure) - the finished figure
+        show (bool) - do plt.show() - ignored if `fmt` is given or `return_figure` is True
+        fmt (str) - render the figure to bytes in this format, e.g. "png" or "svg"
+        dpi (float) - resolution of the rendered figure
+        return_figure (bool) - return the figure instead of showing it
+        
+    Returns:
+        bytes - if `fmt` is given
+        matplotlib.figure.Figure - if `return_figure` is True
+        None - otherwise - the figure is shown, or left on pyplot to be shown later
+    """
+    if fmt is not None:
+        return figure_to_bytes(figure, fmt, dpi)
+    
+    if return_figure:
+        return figure
+    
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show()
+    
+    return None
 
+# Renders a figure without pyplot or any display
+def figure_to_bytes(figure, fmt="png", dpi=None):
+    """
+    Args:
+        figure (matplotlib.figure.Figure) - the figure to render
+        fmt (str) - the format, e.g. "png" or "svg"
+        dpi (float) - resolution of the rendered figure
+        
+    Returns (bytes):
+        the rendered figure
+        
+    Example:
+        >>>figure_to_bytes(latex_plotter(r"H_{2}O", return_figure=True))[:8]
+        b'\x89PNG\r\n\x1a\n'
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    if figure.canvas is None or not isinstance(figure.canvas, FigureCanvasAgg):
+        FigureCanvasAgg(figure)
+    
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=fmt, dpi=dpi)
+    
+    return buffer.getvalue()
+
+# for plotting text with latex formatting
+def latex_plotter(text, fontsize=18, figsize=(14, 1), show=True, fmt=None, return_figure=False):
+    """
+    Args:
+        text (str) - latex formatted text - e.g. from `format_full_reaction`
+        fontsize (int) - size of the text
+        figsize (tuple) - size of the figure
+        show (bool) - whether to do plt.show() immediately - if `False` the plot is left on a new pyplot figure
+        fmt (str) - render the plot to bytes in this format, e.g. "png" or "svg", and return them
+        return_figure (bool) - return the figure without using pyplot
+        
+    Returns:
+        see `finish_figure`
+    """
+    # creates the plot
+    figure, ax = figure_and_axes(fmt=fmt, figsize=figsize, return_figure=return_figure)
+    ax.text(-0.15, 0.95, "$" + text + "$", fontsize = fontsize, ha="left", va="top")
+    ax.axis("off")
+    
+    return finish_figure(figure, show, fmt, return_figure=return_figure)
@@ -1,5 +1,16 @@
-from global_vars import STATES_OF_MATTER, END_PARENTHESES_TYPES, START_PARENTHESES_TYPES
+import re
+from collections import OrderedDict, namedtuple
+from threading import Lock
+
+from global_vars import START_PARENTHESES_TYPES
 from utils.formatter_utils import capitalizer
+# separate_states_of_matter is imported from here by older code
+from utils.lexer_utils import (ARROW, tokenize_reaction, format_tokens, compounds_from_tokens,
+                               separate_states_of_matter)
+from utils.import_utils import lazy_import
+
+np = lazy_import("numpy")
+sps = lazy_import("scipy.sparse")
 
 ###### States of matter ######
 
@@ -50,75 +61,6 @@ def states_of_matter_in_reaction(compound_list):
     return False  
 
 
-# Separates states of matter from compunds
-def separate_states_of_matter(compound_list):
-    """
-    Args: 
-        compund_list (list) - list of compounds - can be capitalized or non-capitalized
-    
-    Returns (tuple):
-        new_compound_list (list) - compund list without states of matter
-        states_of_matter_list (list) - list of the states of matter
-            
-    Example:
-        >>>separate_states_of_matter(["h2o(g)", "C6H12O6(aq)", "CH3CH2(CHO)CH3(heptane)"])
-        (['h2o', 'C6H12O6', 'CH3CH2(CHO)CH3'], ['(g)', '(aq)', '(heptane)'])
-    """
-    
-    # Make sure there are no arrows in the reaction
-    t_list = []
-    for compound in compound_list:
-        t = compound.replace("=>", "")
-        t_list += [t.strip()]
-    
-    compound_list = t_list
-    
-
-    new_compound_list = []
-    states_of_matter_list = []
-    
-    # Essentially just reverses the compound string and checks for **normal parentheses** i.e. `(` and `)`
-    for compound in compound_list:
-        number_of_left = 0        
-        number_of_right = 0
-        
-        first = True
-        
-        number_of_char = 0
-        
-        for char in reversed(compound):
-            if first and (char != ")"):
-                break
-            elif first:
-                first = False
-                number_of_right += 1
-                number_of_char += 1
-                
-            elif number_of_right == number_of_left:
-                break
-                
-            elif char == ")":
-                number_of_right += 1
-                number_of_char += 1
-                
-            elif char == "(":
-                number_of_left += 1
-                number_of_char += 1
-                
-            else:
-                number_of_char += 1
-        
-        if number_of_char > 0:
-            new_compound_list += [compound[:-number_of_char]]
-            states_of_matter_list += [compound[-number_of_char:]]
-        else:
-            new_compound_list += [compound]
-            states_of_matter_list += [""]
-            
-    
-    return new_compound_list, states_of_matter_list
-
-
 ###### Coefficients ######
 
 def separate_coefficients(compound_list):
@@ -176,44 +118,75 @@ def element_finder(compound_list):
     
     list_of_elements = []
     for compound in compound_list:
-        for i, character in enumerate(compound):
-            
-            # last character special case
-            if (i + 1) == len(compound):
-                if compound[i].isalpha():
-                    if compound[i].islower():
-                        continue
-                    else:
-                        list_of_elements += [character]
-                        continue
-                else:
-                    continue
-            
-            # skip lowercase letters
-            if compound[i].isalpha():
-                if compound[i].islower():
-                    continue
-            
-            # main loop
-            
-            # is it a letter
-            if character.isalpha():
-                # is the next character a letter
-                if compound[i + 1].isalpha():
-                    # is this character uppercase and the other one lower case
-                    if compound[i].isupper() and compound[i+1].islower():
-                        list_of_elements += [compound[i] + compound[i+1]]
-                    else:
-                        list_of_elements += [compound[i]]
-                        
-                else:
-                    list_of_elements += [compound[i]]
+        list_of_elements += list(lookup_compound(compound).element_counts)
                         
     # remove duplicates
     list_of_elements = list( dict.fromkeys(list_of_elements) )
     
     return list_of_elements
 
+###### Compound parsing ######
+
+# one token per element with its count, per parenthesis (closing ones with their multiplier) and the start of the charge
+COMPOUND_TOKEN_PATTERN = re.compile(r"([A-Z][a-z]?)(\d*)|([\(\[\{])|([\)\]\}])(\d*)|(\^)")
+# the charge is written as `^2-`, `^-` or `^+2`
+CHARGE_PATTERN = re.compile(r"(\d*)([+-])(\d*)")
+
+def parse_compound(compound):
+    """
+    Args:
+        compound (str) - capitalized compound without coefficient and state of matter
+        
+    Returns (tuple):
+        element_counts (dict) - the number of each element in the compound - in the order the elements first appear
+        charge (int) - the charge of the compound
+        
+    Example:
+        >>>parse_compound("[Cr(N2H4CO)6]4[Cr(CN)6]3")
+        ({'Cr': 7, 'N': 66, 'H': 96, 'C': 42, 'O': 24}, 0)
+        >>>parse_compound("Cr2O7^2-")
+        ({'Cr': 2, 'O': 7}, -2)
+    """
+    # the innermost parenthesis is last
+    group_stack = [{}]
+    charge = 0
+    
+    for match in COMPOUND_TOKEN_PATTERN.finditer(compound):
+        element, count, start_parenthesis, end_parenthesis, multiplier, charge_start = match.groups()
+        
+        if element is not None:
+            counts = group_stack[-1]
+            counts[element] = counts.get(element, 0) + (int(count) if count else 1)
+        
+        elif start_parenthesis is not None:
+            group_stack.append({})
+        
+        # closing parentheses without an opening one are ignored
+        elif end_parenthesis is not None and len(group_stack) > 1:
+            multiplier = int(multiplier) if multiplier else 1
+            group = group_stack.pop()
+            counts = group_stack[-1]
+            for element, count in group.items():
+                counts[element] = counts.get(element, 0) + count * multiplier
+        
+        elif charge_start is not None:
+            charge_match = CHARGE_PATTERN.match(compound, match.end())
+            if charge_match is not None:
+                digits_before, sign, digits_after = charge_match.groups()
+                charge = int(digits_before or digits_after or 1)
+                if sign == "-":
+                    charge = -charge
+            break
+    
+    # parentheses that are never closed
+    while len(group_stack) > 1:
+        group = group_stack.pop()
+        counts = group_stack[-1]
+        for element, count in group.items():
+            counts[element] = counts.get(element, 0) + count
+    
+    return group_stack[0], charge
+
 def number_of_element(compound, element):
     """
     Args:
@@ -227,165 +200,326 @@ def number_of_element(compound, element):
         >>>number_of_element("C6H12O6", "C")
         6
     """
-    if not element in compound:
-        return 0
-    
-    number_of = 0
-    
-    # for compounds with parentheses
-    multiplier_list = [1]
-    multiplier = 1
-    number = ""
-    
-    # note that we're traversing the list backwards, since it makes working with parentheses easier
+    return parse_compound(compound)[0].get(element, 0)
+
+###### Compound cache ######
+
+ParsedCompound = namedtuple("ParsedCompound", ["capitalized", "element_counts", "charge"])
+
+class CompoundCache():
+    """
+    Process wide least recently used cache of parsed compounds - the same species (H2O, H^+, OH^-, ...) shows up
+    in almost every reaction, so they are only capitalized and parsed once.
     
-    # two letter element
-    if len(element) == 2:
-        for i, character in enumerate(reversed(compound)):
-            
-            # collect all the numbers
-            if character.isnumeric():
-                number += character
-                continue
-            
-            # parentheses handling
-            if (character in END_PARENTHESES_TYPES):
-                if len(number) > 0:
-                    t_num = ""
-                    for num in reversed(number):
-                        t_num += num
-                    multiplier_list += [eval(t_num)]
-                    number = ""
-                    continue
-                else:
-                    multiplier_list += [1]
-                    continue
-            
-            if (character in START_PARENTHESES_TYPES):
-                multiplier_list.pop()
-                continue
-            
-            # now to the element counting
-            if (i + 1) < len(compound):
-                if (compound[-(i+1)] == element[-1]) and (compound[-(i+2)] == element[0]):
-                    if len(number) > 0:
-                        # some stuff cause 'reversed' is weird
-                        for m in multiplier_list:
-                            multiplier = multiplier * m
-                        t_num = ""
-                        for num in reversed(number):
-                            t_num += num
-                        number_of += eval(t_num) * multiplier 
-                        
-                        number = ""
-                        multiplier = 1
-                    
-                    else:
-                        for m in multiplier_list:
-                            multiplier = multiplier * m
-                        number_of += 1 * multiplier 
-                        multiplier = 1
-                
-                # not the element we're searcing for
-                else:
-                    number = ""
-                    
-                continue
+    Args:
+        maxsize (int) - the maximum number of compounds kept in the cache - 0 disables the cache
+    """
+    def __init__(self, maxsize=4096):
+        if maxsize < 0:
+            raise ValueError("maxsize must be a non-negative integer")
+        
+        self.maxsize = maxsize
+        self._compounds = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, compound):
+        """
+        Args:
+            compound (str) - raw compound token - capitalized or non-capitalized, without state of matter
             
-            else:
-                continue
+        Returns (ParsedCompound):
+            the capitalized compound, its element counts and its charge - the element counts are shared, so don't change them
             
-    # single letter element
-    if len(element) == 1:
+        Example:
+            >>>COMPOUND_CACHE.get("mno4^-")
+            ParsedCompound(capitalized='MnO4^-', element_counts={'Mn': 1, 'O': 4}, charge=-1)
+        """
+        with self._lock:
+            parsed = self._compounds.get(compound)
+            if parsed is not None:
+                self._compounds.move_to_end(compound)
+                self.hits += 1
+                return parsed
+            self.misses += 1
         
-        skip = False
+        capitalized = capitalizer(compound)
+        element_counts, charge = parse_compound(capitalized)
+        parsed = ParsedCompound(capitalized, element_counts, charge)
         
-        for i, character in enumerate(reversed(compound)):            
-            
-            if character.islower():
-                skip = True
-                number = ""
-                continue
-            
-            elif skip:
-                skip = False
-                continue
-            
-            # collect all the numbers
-            elif character.isnumeric():
-                number += character
-                continue
-            
-            # parentheses handling
-            elif (character in END_PARENTHESES_TYPES):
-                if len(number) > 0:
-                    t_num = ""
-                    for num in reversed(number):
-                        t_num += num
-                    multiplier_list += [eval(t_num)]
-                    number = ""
-                    continue
-                else:
-                    multiplier_list += [1]
-                    continue
-            
-            elif (character in START_PARENTHESES_TYPES):
-                multiplier_list.pop()
-                continue
-            
-            # now to the element counting
-            if (compound[-(i+1)] == element[-1]):
-                if len(number) > 0:
-                    # some stuff cause 'reversed' is weird
-                    for m in multiplier_list:
-                        multiplier = multiplier * m
-                    t_num = ""
-                    for num in reversed(number):
-                        t_num += num
-                    number_of += eval(t_num) * multiplier 
-                        
-                    number = ""
-                    multiplier = 1
-                    
-                else:
-                    for m in multiplier_list:
-                        multiplier = multiplier * m
-                    number_of += 1 * multiplier 
-                    multiplier = 1
-                
-                continue
-            # not the element we're searcing for
-            else:
-                number = ""
-                continue
+        with self._lock:
+            if self.maxsize > 0:
+                self._compounds[compound] = parsed
+                self._evict(self.maxsize)
+        
+        return parsed
+    
+    def _evict(self, maxsize):
+        while len(self._compounds) > maxsize:
+            self._compounds.popitem(last=False)
+            self.evictions += 1
+    
+    def resize(self, maxsize):
+        """
+        Args:
+            maxsize (int) - the new maximum number of compounds - the least recently used are evicted if the cache is too big
+        """
+        if maxsize < 0:
+            raise ValueError("maxsize must be a non-negative integer")
+        
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict(maxsize)
+    
+    def clear(self):
+        """
+        Removes every compound and resets the statistics
+        """
+        with self._lock:
+            self._compounds.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+    
+    def info(self):
+        """
+        Returns (dict):
+            hits, misses, evictions, the current size and the maximum size of the cache
             
+        Example:
+            >>>COMPOUND_CACHE.info()
+            {'hits': 2, 'misses': 1, 'evictions': 0, 'size': 1, 'maxsize': 4096}
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._compounds), "maxsize": self.maxsize}
+    
+    def __len__(self):
+        return len(self._compounds)
+    
+    def __repr__(self):
+        return f"CompoundCache: \n\tsize={len(self)} \n\tmaxsize={self.maxsize} \n\thits={self.hits} \n\tmisses={self.misses}"
+
+
+COMPOUND_CACHE = CompoundCache()
+
+def lookup_compound(compound):
+    """
+    Args:
+        compound (str) - raw compound token - capitalized or non-capitalized, without state of matter
         
-    return number_of
+    Returns (ParsedCompound):
+        the capitalized compound, its element counts and its charge - see `CompoundCache.get`
+        
+    Example:
+        >>>lookup_compound("h2o")
+        ParsedCompound(capitalized='H2O', element_counts={'H': 2, 'O': 1}, charge=0)
+    """
+    return COMPOUND_CACHE.get(compound)
+
+def compound_cache_info():
+    """
+    Returns (dict):
+        statistics of the process wide compound cache - see `CompoundCache.info`
+    """
+    return COMPOUND_CACHE.info()
+
+def set_compound_cache_size(maxsize):
+    """
+    Args:
+        maxsize (int) - the maximum number of compounds in the process wide compound cache - 0 disables it
+    """
+    COMPOUND_CACHE.resize(maxsize)
+
+def clear_compound_cache():
+    """
+    Empties the process wide compound cache and resets its statistics
+    """
+    COMPOUND_CACHE.clear()
 
 ###### Charge ######
 def find_charge(compound_list):
-    chargeList = []
+    """
+    Args:
+        compound_list (list) - list of capitalized compounds
+        
+    Returns (list):
+        the charge of each compound
+        
+    Example:
+        >>>find_charge(["MnO4^-", "H2O", "Cr2O7^2-"])
+        [-1, 0, -2]
+    """
+    return [parse_compound(compound)[1] for compound in compound_list]
+
+
+
+###### Composition matrix ######
+
+# float64 holds every integer with an absolute value up to this exactly
+FLOAT_EXACT_BOUND = 2**53
+
+def setup_chemical_composition_matrix(compound_list, element_list, exact=False):
+    """
+    Args:
+        compound_list (list) - list of all the compounds in the reaction - with correct capitalization
+        element_list (list) - list of all the elements in the reaction - with correct capitalization
+        exact (bool) - if True the entries are python integers (dtype=object) - this is also done automatically
+            if a count or charge is above `FLOAT_EXACT_BOUND`, since float64 would round it
+        
+    Returns (np.array):
+        chemical coefficient matrix of the reaction - as described in https://arxiv.org/ftp/arxiv/papers/1110/1110.4321.pdf
+        
+    Example:
+        >>>setup_chemical_composition_matrix(["C6H12O6", "O2", "CO2", "H2O"], ["H", "C", "O"])
+        array([[12.,  0.,  0.,  2.],
+               [ 6.,  0.,  1.,  0.],
+               [ 6.,  2.,  2.,  1.]])
+        >>>compounds = ['Cr7N66H96C42O24', 'MnO4^-', 'H3O^+', 'Cr2O7^2-', 'Mn^2+', 'CO2', 'NO3^-', 'H2O']
+        >>>elements = element_finder(compounds)
+        >>>setup_chemical_composition_matrix(compounds, elements)
+        array([[ 7.,  0.,  0.,  2.,  0.,  0.,  0.,  0.],
+               [66.,  0.,  0.,  0.,  0.,  0.,  1.,  0.],
+               [96.,  0.,  3.,  0.,  0.,  0.,  0.,  2.],
+               [42.,  0.,  0.,  0.,  0.,  1.,  0.,  0.],
+               [24.,  4.,  1.,  7.,  0.,  2.,  3.,  1.],
+               [ 0.,  1.,  0.,  0.,  1.,  0.,  0.,  0.],
+               [ 0., -1.,  1., -2.,  2.,  0., -1.,  0.]])
+    """
+    # every compound is only parsed once
+    parsed_compounds = [lookup_compound(compound) for compound in compound_list]
+    
+    rows = [[parsed.element_counts.get(element, 0) for parsed in parsed_compounds] for element in element_list]
     
+    # if charge is present insert it
+    isChargePresent = False
     for compound in compound_list:
-        isChargePresent = "^" in compound
-        
-        if isChargePresent:
-            index = compound.find("^")
-            if (index + 1) < len(compound):
-                if compound[index + 1] == "+":
-                    chargeList.append(1)
-                elif compound[index + 1] == "-":
-                    chargeList.append(-1)
-                else:
-                    if (index + 2) < len(compound):
-                        if compound[index + 2] == "+":
-                            chargeList.append(int(compound[index + 1]))
-                        elif compound[index +2] == "-":
-                            chargeList.append(-int(compound[index + 1]))
-        else:
-            chargeList.append(0)
-                
-    return chargeList
+        if "^" in compound:
+            isChargePresent = True
+            break
+    
+    if isChargePresent:
+        rows += [[parsed.charge for parsed in parsed_compounds]]
+    
+    if not exact:
+        exact = any(abs(value) > FLOAT_EXACT_BOUND for row in rows for value in row)
+    
+    ChemicalCompositionMatrix = np.array(rows, dtype=object if exact else float).reshape(len(rows), len(compound_list))
+
+    return ChemicalCompositionMatrix
+
+
+# Same matrix as `setup_chemical_composition_matrix`, but only the non-zero entries are stored
+def setup_sparse_composition_matrix(compound_list, element_list):
+    """
+    Args:
+        compound_list (list) - list of all the compounds in the reaction - with correct capitalization
+        element_list (list) - list of all the elements in the reaction - with correct capitalization
+        
+    Returns (scipy.sparse.csr_matrix):
+        integer chemical composition matrix of the reaction - a network with thousands of species only has
+        a few elements in each species, so this stays small where the dense matrix wouldn't
+        
+    Example:
+        >>>setup_sparse_composition_matrix(["C6H12O6", "O2", "CO2", "H2O"], ["H", "C", "O"]).toarray()
+        array([[12,  0,  0,  2],
+               [ 6,  0,  1,  0],
+               [ 6,  2,  2,  1]])
+    """
+    element_index = {element: i for i, element in enumerate(element_list)}
+    parsed_compounds = [lookup_compound(compound) for compound in compound_list]
+    
+    row_indices = []
+    column_indices = []
+    data = []
+    for column, parsed in enumerate(parsed_compounds):
+        for element, count in parsed.element_counts.items():
+            if element in element_index and count != 0:
+                row_indices += [element_index[element]]
+                column_indices += [column]
+                data += [count]
+    
+    number_of_rows = len(element_list)
+    
+    # if charge is present insert it
+    if any("^" in compound for compound in compound_list):
+        for column, parsed in enumerate(parsed_compounds):
+            if parsed.charge != 0:
+                row_indices += [number_of_rows]
+                column_indices += [column]
+                data += [parsed.charge]
+        number_of_rows += 1
+    
+    return sps.coo_matrix((np.array(data, dtype=np.int64), (row_indices, column_indices)),
+                          shape=(number_of_rows, len(compound_list))).tocsr()
+
+
+###### Reaction ######
+
+class Reaction():
+    """
+    A reaction that is tokenized, capitalized and parsed once, so it can be checked, balanced,
+    formatted and turned into an equillibrium constant without being split again.
+    
+    Args:
+        reaction (str) - reaction of any formatting - see `tokenize_reaction`
+        
+    Example:
+        >>>reaction = Reaction("2h2(g) + o2(g) = 2h2o(l)")
+        >>>reaction.species, reaction.coefficients, reaction.states
+        (('H2', 'O2', 'H2O'), (2, 1, 2), ('(g)', '(g)', '(l)'))
+    """
+    __slots__ = ("text", "compounds", "species", "coefficients", "states", "charges", "is_product",
+                 "has_arrow", "elements", "parsed", "_composition_matrix")
+    
+    def __init__(self, reaction):
+        tokens = tokenize_reaction(reaction)
+        
+        # the reaction with standard spacing and the compounds as they were written
+        self.text = format_tokens(tokens)
+        self.compounds = compounds_from_tokens(tokens)
+        self.has_arrow = any(token.kind == ARROW for token in tokens)
+        
+        self.parsed = tuple(lookup_compound(compound.formula) for compound in self.compounds)
+        self.species = tuple(parsed.capitalized for parsed in self.parsed)
+        self.coefficients = tuple(int(compound.coefficient or 1) for compound in self.compounds)
+        self.states = tuple(compound.state for compound in self.compounds)
+        self.charges = tuple(parsed.charge for parsed in self.parsed)
+        self.is_product = tuple(compound.is_product for compound in self.compounds)
+        self.elements = element_finder(self.species)
+        
+        self._composition_matrix = None
+    
+    @property
+    def composition_matrix(self):
+        """
+        Returns (np.array):
+            the composition matrix of the species - see `setup_chemical_composition_matrix` - built on first use
+        """
+        if self._composition_matrix is None:
+            self._composition_matrix = setup_chemical_composition_matrix(self.species, self.elements)
+        return self._composition_matrix
+    
+    def __len__(self):
+        return len(self.species)
+    
+    def __repr__(self):
+        return f"Reaction: \n\t{self.text}"
+
+# Lets every entry point take either a string or an already parsed reaction
+def as_reaction(reaction):
+    """
+    Args:
+        reaction (str or Reaction) - reaction of any formatting or an already parsed reaction
+        
+    Returns (Reaction):
+        the parsed reaction - a `Reaction` is returned as it is
+    """
+    if isinstance(reaction, Reaction):
+        return reaction
+    return Reaction(reaction)
 
 
 
@@ -404,15 +538,14 @@ def reaction_splitter(reaction):
         >>>reaction_splitter("c6h12o6 + 6o2 => 6h2o + 6co2")
         ['c6h12o6', '6o2', '6h2o', '6co2']
     """
-    reaction = reaction.replace(" => ", " + ")
-    compounds = reaction.split(" + ")
-    return [compound.strip() for compound in compounds]
+    return [compound.coefficient + compound.formula + compound.state
+            for compound in compounds_from_tokens(tokenize_reaction(reaction))]
 
 # Checks if the reaction has already been solved
 def is_reaction_solved(reaction):
     """
     Args:
-        reaction (str) - correct spacing and reaction arrow, `=>`, is required
+        reaction (str or Reaction) - reaction of any formatting with a reaction arrow, `=` or `=>`, or a parsed reaction
         
     Returns:
         True - reaction has already been solved
@@ -424,11 +557,10 @@ def is_reaction_solved(reaction):
         >>>is_reaction_solved("na^+ + cl^- => nacl")
         True
     """
+    reaction = as_reaction(reaction)
     
     # make sure we have an arrow to separate after
-    if "= " in reaction:
-        reaction = reaction.replace("=", " => ")
-    elif not "=" in reaction:
+    if not reaction.has_arrow:
         
         """
         There is no arrow in the reaction, so it cannot be split into reactants and products
@@ -439,58 +571,26 @@ def is_reaction_solved(reaction):
         """
         # For now we just return False
         return False
-        
-    
-    reactants = reaction.split(" => ")[0]
-    products = reaction.split(" => ")[1]
     
-    # reactants
-    compound_list_reactants = [compound for compound in reaction_splitter(reactants)]
-    
-    # products
-    compound_list_products = [compound for compound in reaction_splitter(products)]
-    
-        
-    # are the states of matter indicated
-    if any([(state_of_matter in reaction) for state_of_matter in STATES_OF_MATTER]):
-        compound_list_reactants, _ = separate_states_of_matter(compound_list_reactants)
-        
-    # are the states of matter indicated
-    if any([(state_of_matter in reaction) for state_of_matter in STATES_OF_MATTER]):
-        compound_list_products, _ = separate_states_of_matter(compound_list_products)        
-
-    
-    compound_list_reactants = [capitalizer(compound) for compound in compound_list_reactants]
-    compound_list_products = [capitalizer(compound) for compound in compound_list_products]
-    
-    element_list = element_finder(compound_list_reactants + compound_list_products)
-
-    
-    compound_list_reactants, coefficients_reactants = separate_coefficients(compound_list_reactants)
-    compound_list_products, coefficients_products = separate_coefficients(compound_list_products)
-        
-    coefficients_reactants = [eval(value) for value in coefficients_reactants]
-    coefficients_products = [eval(value) for value in coefficients_products]
+    parsed_reactants = [parsed for parsed, is_product in zip(reaction.parsed, reaction.is_product) if not is_product]
+    parsed_products = [parsed for parsed, is_product in zip(reaction.parsed, reaction.is_product) if is_product]
     
+    coefficients_reactants = [coefficient for coefficient, is_product in zip(reaction.coefficients, reaction.is_product) if not is_product]
+    coefficients_products = [coefficient for coefficient, is_product in zip(reaction.coefficients, reaction.is_product) if is_product]
     
+    element_list = reaction.elements
     
     # reactants
-    number_of_list_reactants_temporary = []
     number_of_list_reactants_total = []
     for element in element_list:
-        for i, compound in enumerate(compound_list_reactants):
-            number_of_list_reactants_temporary += [number_of_element(compound, element) * coefficients_reactants[i]]
-        number_of_list_reactants_total += [sum([value for value in number_of_list_reactants_temporary])]
-        number_of_list_reactants_temporary = []
+        number_of_list_reactants_total += [sum([parsed.element_counts.get(element, 0) * coefficients_reactants[i]
+                                                for i, parsed in enumerate(parsed_reactants)])]
     
     # products
-    number_of_list_products_temporary = []
     number_of_list_products_total = []
     for element in element_list:
-        for i, compound in enumerate(compound_list_products):
-            number_of_list_products_temporary += [number_of_element(compound, element) * coefficients_products[i]]
-        number_of_list_products_total += [sum([value for value in number_of_list_products_temporary])]
-        number_of_list_products_temporary = []
+        number_of_list_products_total += [sum([parsed.element_counts.get(element, 0) * coefficients_products[i]
+                                               for i, parsed in enumerate(parsed_products)])]
    
     # does it match
     if len(number_of_list_reactants_total) == len(number_of_list_products_total):
@@ -500,9 +600,9 @@ def is_reaction_solved(reaction):
     else:
         return False
     
-    if "^" in reaction:
-        total_charge_reactants = sum(find_charge(compound_list_reactants))
-        total_charge_products = sum(find_charge(compound_list_products))
+    if "^" in reaction.text:
+        total_charge_reactants = sum([parsed.charge for parsed in parsed_reactants])
+        total_charge_products = sum([parsed.charge for parsed in parsed_products])
         if total_charge_reactants != total_charge_products:
             return False
         